@@ -1,17 +1,93 @@
-from typing import Annotated
+from typing import Annotated, Any, Callable
 import os
 from fastapi import Depends
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import (
     create_engine,
-    SQLModel,
     Session,
 )
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.pool import InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/mydatabase")
 
+# Set DATABASE_ASYNC=true to serve the catalog, order and payment routes
+# from the async engine instead of the sync threadpool.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Apply pending schema migrations when the app starts. Turn off to run
+# `python -m app.db.migrations upgrade` as a separate deploy step instead.
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+
+def to_async_url(url: str) -> str:
+    """Maps a sync driver URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Pool sizing is per engine, i.e. per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# "false", "true" (statements) or "debug" (statements and result rows)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower()
+
+
+def _echo_setting():
+    if DB_ECHO == "debug":
+        return "debug"
+    return DB_ECHO in ("1", "true", "yes")
+
+
+def engine_options(url: str) -> dict:
+    """
+    Builds create_engine keyword arguments from the DB_* settings.
+
+    In-memory SQLite runs on a single shared connection, so pool sizing
+    only applies to real server or file databases.
+    """
+    options = {"echo": _echo_setting(), "pool_pre_ping": DB_POOL_PRE_PING}
+    if ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+aiosqlite:"):
+        return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def make_engine(url: str = DATABASE_URL):
+    """Creates the sync engine with an instrumented, settings-driven pool."""
+    options = engine_options(url)
+    if "pool_size" in options:
+        options["poolclass"] = InstrumentedQueuePool
+    return create_engine(url, **options)
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL):
+    """Creates the async engine with an instrumented, settings-driven pool."""
+    options = engine_options(url)
+    if "pool_size" in options:
+        options["poolclass"] = InstrumentedAsyncAdaptedQueuePool
+    return create_async_engine(url, **options)
+
+
 # Create the engine
-engine = create_engine(DATABASE_URL, echo=True)
+engine = make_engine()
 
 # Make a session factory
 SessionLocal = sessionmaker(
@@ -21,6 +97,18 @@ SessionLocal = sessionmaker(
     autoflush=False,
 )
 
+# The async engine is only built in async mode so the asyncio driver
+# stays an optional install for sync deployments.
+async_engine = make_async_engine() if DATABASE_ASYNC else None
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+) if DATABASE_ASYNC else None
+
+
 def get_session():
     """
     FastAPI dependency that provides a SQLModel session.
@@ -33,13 +121,35 @@ def get_session():
         db.close()
 
 
+async def get_async_session():
+    """
+    FastAPI dependency that provides an AsyncSession bound to the async engine.
+    Only usable when DATABASE_ASYNC is enabled.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database mode is disabled; set DATABASE_ASYNC=true")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # For type-annotated dependencies in your routes
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 
-def create_db_and_tables():
+async def run_sync(db: AsyncSession, fn: Callable[..., Any], *args: Any, response_model: Any = None, **kwargs: Any):
     """
-    Creates tables for all SQLModel metadata if they don't already exist.
-    Call this at startup (or whenever you need) to ensure DB is set up.
+    Runs a sync service function against an AsyncSession.
+
+    The function receives a regular Session whose IO goes through the async
+    driver, so the same query code serves both database modes. When
+    response_model is given the result is validated inside the session
+    greenlet, where lazy loads are still allowed.
     """
-    SQLModel.metadata.create_all(engine)
+    def call(session: Session):
+        result = fn(session, *args, **kwargs)
+        if response_model is None:
+            return result
+        return TypeAdapter(response_model).validate_python(result, from_attributes=True)
+
+    return await db.run_sync(call)
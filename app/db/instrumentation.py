@@ -0,0 +1,61 @@
+"""
+SQL statement counting and slow-query logging via engine events.
+
+Every statement run by any engine (the async engine's included) is timed
+and charged to the request in progress, if any. Statements slower than
+SLOW_QUERY_MS are logged with the route that issued them; parameters are
+left out of the log because they can carry personal data.
+"""
+import logging
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.services.metrics import current_request, slow_queries_total
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Longer statements are cut in the slow-query log
+_STATEMENT_LOG_LENGTH = 1000
+
+logger = logging.getLogger("app.sql")
+
+_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    stats = current_request.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = f"{stats.method} {stats.route}" if stats is not None else "-"
+        if stats is not None:
+            stats.slow_queries += 1
+        slow_queries_total.inc((stats.route if stats is not None else "-",))
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, " ".join(statement.split())[:_STATEMENT_LOG_LENGTH]
+        )
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def install() -> None:
+    """Attaches the hooks to every Engine; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
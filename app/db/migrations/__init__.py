@@ -0,0 +1,119 @@
+"""
+Versioned schema migrations.
+
+Each module in app/db/migrations/versions defines an integer ``revision``,
+an ``upgrade(conn)`` function and optionally ``transactional = False`` for
+steps such as CREATE INDEX CONCURRENTLY that cannot run in a transaction.
+Applied revisions are recorded in the schema_migrations table.
+
+A database without any application tables is created from the models with
+create_all and stamped at the latest revision; an existing database gets
+every revision it has not recorded yet.
+"""
+import importlib
+import pkgutil
+from contextlib import contextmanager
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+from app.db import models  # noqa: F401  (registers the tables on SQLModel.metadata)
+
+MIGRATIONS_TABLE = "schema_migrations"
+# Arbitrary key for the Postgres advisory lock that serializes concurrent upgrades
+_ADVISORY_LOCK_KEY = 72311
+
+
+def load_migrations() -> List:
+    from app.db.migrations import versions
+
+    modules = [
+        importlib.import_module(f"{versions.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(versions.__path__)
+    ]
+    modules.sort(key=lambda module: module.revision)
+    revisions = [module.revision for module in modules]
+    if len(set(revisions)) != len(revisions):
+        raise RuntimeError(f"Duplicate migration revisions: {revisions}")
+    return modules
+
+
+def _ensure_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "revision INTEGER PRIMARY KEY, "
+            "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+
+def applied_revisions(engine: Engine) -> List[int]:
+    if not inspect(engine).has_table(MIGRATIONS_TABLE):
+        return []
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text(f"SELECT revision FROM {MIGRATIONS_TABLE} ORDER BY revision"))]
+
+
+def _record(engine: Engine, revision: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {MIGRATIONS_TABLE} (revision) VALUES (:revision)"), {"revision": revision})
+
+
+@contextmanager
+def _upgrade_lock(engine: Engine):
+    """Keeps several workers starting at once from migrating in parallel (Postgres only)."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+
+def upgrade(engine: Engine = None, log=print) -> List[int]:
+    """Brings the schema to the latest revision and returns the revisions applied."""
+    if engine is None:
+        from app.db.database import engine
+    migrations = load_migrations()
+
+    with _upgrade_lock(engine):
+        fresh = not any(inspect(engine).has_table(table.name) for table in SQLModel.metadata.sorted_tables)
+        _ensure_table(engine)
+        if fresh:
+            # Nothing to migrate: build the current schema and mark every revision as done
+            SQLModel.metadata.create_all(engine)
+            for module in migrations:
+                _record(engine, module.revision)
+            log(f"Created schema at revision {migrations[-1].revision if migrations else 0}")
+            return []
+
+        # Tables added by newer models are created; changes to existing tables come from migrations
+        SQLModel.metadata.create_all(engine)
+        done = set(applied_revisions(engine))
+        applied = []
+        for module in migrations:
+            if module.revision in done:
+                continue
+            log(f"Applying migration {module.revision}: {(module.__doc__ or module.__name__).strip()}")
+            if getattr(module, "transactional", True):
+                with engine.begin() as conn:
+                    module.upgrade(conn)
+            else:
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    module.upgrade(conn)
+            _record(engine, module.revision)
+            applied.append(module.revision)
+        return applied
+
+
+def status(engine: Engine = None) -> dict:
+    if engine is None:
+        from app.db.database import engine
+    done = set(applied_revisions(engine))
+    return {
+        "applied": sorted(done),
+        "pending": [module.revision for module in load_migrations() if module.revision not in done],
+    }
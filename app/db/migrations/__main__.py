@@ -0,0 +1,26 @@
+"""
+Command line entry point:
+
+    python -m app.db.migrations upgrade   # apply pending revisions
+    python -m app.db.migrations status    # list applied and pending revisions
+"""
+import sys
+from app.db.migrations import upgrade, status
+
+
+def main(argv=None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "upgrade"
+    if command == "upgrade":
+        applied = upgrade()
+        print(f"Applied revisions: {applied}" if applied else "Schema is up to date")
+    elif command == "status":
+        print(status())
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
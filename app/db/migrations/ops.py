@@ -0,0 +1,65 @@
+from typing import Sequence
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """
+    Adds a column unless it already exists. Keep ddl to a type plus a
+    constant default so Postgres can add it without rewriting the table.
+    """
+    if has_column(conn, table, column):
+        return
+    conn.execute(text(f"ALTER TABLE {_quote(conn, table)} ADD COLUMN {_quote(conn, column)} {ddl}"))
+
+
+def create_index(
+    conn: Connection,
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    using: str = None,
+    unique: bool = False,
+    where: str = None,
+) -> None:
+    """
+    Creates an index if it does not exist yet; `where` makes it partial.
+
+    On Postgres the index is built CONCURRENTLY so the table stays writable;
+    the migration must then be declared non-transactional. A previous build
+    that failed half-way leaves an INVALID index behind, which is dropped
+    and rebuilt.
+    """
+    quoted_columns = ", ".join(columns if using else [_quote(conn, c) for c in columns])
+    target = f"{_quote(conn, name)} ON {_quote(conn, table)}"
+    if using:
+        target += f" USING {using}"
+
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    predicate = f" WHERE {where}" if where else ""
+
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(f"CREATE {kind} IF NOT EXISTS {target} ({quoted_columns}){predicate}"))
+        return
+
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(conn, name)}"))
+    conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {target} ({quoted_columns}){predicate}"))
+
+
+def drop_index(conn: Connection, name: str) -> None:
+    """Drops an index if it exists, CONCURRENTLY on Postgres (non-transactional migrations only)."""
+    concurrently = " CONCURRENTLY" if conn.dialect.name == "postgresql" else ""
+    conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {_quote(conn, name)}"))
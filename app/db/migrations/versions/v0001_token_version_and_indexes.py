@@ -0,0 +1,20 @@
+"""Token versions for revocation plus foreign-key, history and keyset indexes."""
+from app.db.migrations.ops import add_column, create_index
+
+revision = 1
+# Indexes are built CONCURRENTLY, which Postgres refuses inside a transaction
+transactional = False
+
+
+def upgrade(conn):
+    add_column(conn, "user", "token_version", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "admin", "token_version", "INTEGER NOT NULL DEFAULT 0")
+
+    create_index(conn, "ix_address_user_id", "address", ["user_id"])
+    create_index(conn, "ix_product_category_id", "product", ["category_id"])
+    create_index(conn, "ix_product_price_product_id", "product", ["price", "product_id"])
+    create_index(conn, "ix_product_created_at_product_id", "product", ["created_at", "product_id"])
+    create_index(conn, "ix_order_user_id_created_at_order_id", "order", ["user_id", "created_at", "order_id"])
+    create_index(conn, "ix_orderitem_order_id", "orderitem", ["order_id"])
+    create_index(conn, "ix_orderitem_product_id", "orderitem", ["product_id"])
+    create_index(conn, "ix_payment_order_id", "payment", ["order_id"])
@@ -0,0 +1,25 @@
+"""Store money as NUMERIC(12, 2) instead of floating point."""
+from sqlalchemy import text
+
+revision = 2
+
+MONEY_COLUMNS = [
+    ("product", "price"),
+    ("order", "total_amount"),
+    ("orderitem", "price_at_purchase"),
+    ("payment", "amount"),
+]
+
+
+def upgrade(conn):
+    # SQLite columns are dynamically typed, so only Postgres needs the rewrite.
+    # ALTER ... TYPE rewrites each table under an exclusive lock; schedule it
+    # for a quiet window on large tables.
+    if conn.dialect.name != "postgresql":
+        return
+    preparer = conn.dialect.identifier_preparer
+    for table, column in MONEY_COLUMNS:
+        conn.execute(text(
+            f"ALTER TABLE {preparer.quote(table)} ALTER COLUMN {preparer.quote(column)} "
+            f"TYPE NUMERIC(12, 2) USING round({preparer.quote(column)}::numeric, 2)"
+        ))
@@ -0,0 +1,10 @@
+"""Product.sku natural key for bulk catalog imports."""
+from app.db.migrations.ops import add_column, create_index
+
+revision = 3
+transactional = False
+
+
+def upgrade(conn):
+    add_column(conn, "product", "sku", "VARCHAR(64)")
+    create_index(conn, "ix_product_sku", "product", ["sku"], unique=True)
@@ -0,0 +1,15 @@
+"""Full-text search vector over product name/description with a GIN index."""
+from app.db.migrations.ops import add_column, create_index
+from app.db.models import PRODUCT_SEARCH_VECTOR_DDL
+
+revision = 4
+transactional = False
+
+
+def upgrade(conn):
+    # SQLite test runs search through the in-process index in app/services/search.py.
+    # Adding a stored generated column rewrites the product table once.
+    if conn.dialect.name != "postgresql":
+        return
+    add_column(conn, "product", "search_vector", PRODUCT_SEARCH_VECTOR_DDL)
+    create_index(conn, "ix_product_search_vector", "product", ["search_vector"], using="gin")
@@ -0,0 +1,11 @@
+"""Order created_at / updated_at indexes for the sales rollup refresh."""
+from app.db.migrations.ops import create_index
+
+revision = 5
+transactional = False
+
+
+def upgrade(conn):
+    # The rollup tables themselves are new and come from create_all
+    create_index(conn, "ix_order_created_at", "order", ["created_at"])
+    create_index(conn, "ix_order_updated_at", "order", ["updated_at"])
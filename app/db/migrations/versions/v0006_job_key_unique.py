@@ -0,0 +1,17 @@
+"""At most one queued job per key, enforced by a partial unique index."""
+from sqlalchemy import text
+from app.db.migrations.ops import create_index, drop_index
+
+revision = 6
+transactional = False
+
+
+def upgrade(conn):
+    # Keep the oldest queued job of each key; the later duplicates did the same work
+    conn.execute(text(
+        "UPDATE job SET status = 'done', last_error = 'Superseded by a queued job with the same key' "
+        "WHERE status = 'queued' AND key IS NOT NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM job WHERE status = 'queued' AND key IS NOT NULL GROUP BY key)"
+    ))
+    create_index(conn, "ux_job_key_queued", "job", ["key"], unique=True, where="status = 'queued'")
+    drop_index(conn, "ix_job_key_status")
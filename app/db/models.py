@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import DDL, Column, DateTime, Index, Text, UniqueConstraint, event, func, text
 from typing import Optional, List
 
 
@@ -8,6 +9,7 @@ class Admin(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
     hashed_password: str
+    token_version: int = Field(default=0)  # Bump to revoke every issued token
 
 
 class User(SQLModel, table=True):
@@ -16,6 +18,7 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True, index=True)
     hashed_password: str
     is_active: bool = Field(default=True)
+    token_version: int = Field(default=0)  # Bump to revoke every issued token
     created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()))
 
@@ -24,7 +27,7 @@ class User(SQLModel, table=True):
 
 class Address(SQLModel, table=True):
     address_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.user_id")
+    user_id: int = Field(foreign_key="user.user_id", index=True)
     address_line1: str = Field(max_length=255)
     address_line2: Optional[str] = Field(default=None, max_length=255)
     city: str = Field(max_length=50)
@@ -46,22 +49,59 @@ class Category(SQLModel, table=True):
 
 
 class Product(SQLModel, table=True):
+    # Keyset pagination indexes for GET /products sorted by price / created_at
+    __table_args__ = (
+        Index("ix_product_price_product_id", "price", "product_id"),
+        Index("ix_product_created_at_product_id", "created_at", "product_id"),
+    )
+
     product_id: Optional[int] = Field(default=None, primary_key=True)
+    sku: Optional[str] = Field(default=None, unique=True, index=True, max_length=64)  # Supplier key used by bulk imports
     name: str = Field(index=True, max_length=100)
     description: Optional[str] = Field(default=None, max_length=255)
-    price: float = Field(gt=0)
+    price: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
     stock: int = Field(default=0, ge=0)
-    category_id: int = Field(foreign_key="category.category_id")
+    category_id: int = Field(foreign_key="category.category_id", index=True)
     created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()))
 
     category: Category = Relationship(back_populates="products")
 
 
+# Full-text search over name (weight A) and description (weight B). The
+# column is Postgres-only, so it is kept out of the model and added by DDL:
+# on table creation here, and by migration 4 on existing databases. The
+# 'simple' configuration skips stemming so prefix queries match what was typed.
+PRODUCT_SEARCH_VECTOR_DDL = (
+    "tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+    ") STORED"
+)
+event.listen(
+    Product.__table__,
+    "after_create",
+    DDL(f"ALTER TABLE product ADD COLUMN search_vector {PRODUCT_SEARCH_VECTOR_DDL}").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Product.__table__,
+    "after_create",
+    DDL("CREATE INDEX ix_product_search_vector ON product USING gin (search_vector)").execute_if(dialect="postgresql"),
+)
+
+
 class Order(SQLModel, table=True):
+    # Serves per-user order lookups and newest-first order history; the
+    # created_at / updated_at indexes serve the analytics rollup refresh
+    __table_args__ = (
+        Index("ix_order_user_id_created_at_order_id", "user_id", "created_at", "order_id"),
+        Index("ix_order_created_at", "created_at"),
+        Index("ix_order_updated_at", "updated_at"),
+    )
+
     order_id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.user_id")
-    total_amount: float = Field(gt=0)
+    total_amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
     status: str = Field(default="pending", max_length=50)
     sale_source: str = Field(default="online", max_length=10)
     created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
@@ -74,10 +114,10 @@ class Order(SQLModel, table=True):
 
 class OrderItem(SQLModel, table=True):
     order_item_id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="order.order_id")
-    product_id: int = Field(foreign_key="product.product_id")
+    order_id: int = Field(foreign_key="order.order_id", index=True)
+    product_id: int = Field(foreign_key="product.product_id", index=True)
     quantity: int = Field(ge=1)
-    price_at_purchase: float = Field(gt=0)
+    price_at_purchase: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
 
     order: Order = Relationship(back_populates="order_items")  # ⬅️ Add this
     product: Product = Relationship()
@@ -85,11 +125,89 @@ class OrderItem(SQLModel, table=True):
 
 class Payment(SQLModel, table=True):
     payment_id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="order.order_id")
+    order_id: int = Field(foreign_key="order.order_id", index=True)
     payment_method: str = Field(max_length=50)
-    amount: float = Field(gt=0)
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
     status: str = Field(default="pending", max_length=20)  # ⬅️ Change default to 'pending' for better flow
     created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
 
     order: Order = Relationship(back_populates="payments")
 
+
+class IdempotencyKey(SQLModel, table=True):
+    """First response to a POST made with an Idempotency-Key header, replayed for retries."""
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", "key", name="uq_idempotencykey_user_id_scope_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.user_id")
+    scope: str = Field(max_length=50)  # e.g. "orders.create"
+    key: str = Field(max_length=255)
+    request_hash: str = Field(max_length=64)
+    status_code: int
+    response_body: str = Field(sa_column=Column(Text, nullable=False))
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+
+
+
+# Sales rollups, rebuilt per day from paid orders by app/services/analytics.py.
+# Revenue is the sum of quantity * price_at_purchase over the order lines.
+class SalesDaily(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    sale_source: str = Field(primary_key=True, max_length=10)
+    orders: int
+    units: int
+    revenue: Decimal = Field(max_digits=16, decimal_places=2)
+
+
+class CategorySalesDaily(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    category_id: int = Field(primary_key=True)
+    sale_source: str = Field(primary_key=True, max_length=10)
+    orders: int
+    units: int
+    revenue: Decimal = Field(max_digits=16, decimal_places=2)
+
+
+class ProductSalesDaily(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    product_id: int = Field(primary_key=True)
+    category_id: int
+    orders: int
+    units: int
+    revenue: Decimal = Field(max_digits=16, decimal_places=2)
+
+
+class AnalyticsWatermark(SQLModel, table=True):
+    """Orders updated up to `value` are reflected in the rollups."""
+    name: str = Field(primary_key=True, max_length=50)
+    value: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    refreshed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+
+
+class Job(SQLModel, table=True):
+    """Outbox entry for work run after the request commits, by app/services/jobs.py."""
+    # Serves the worker's claim query; enqueue() relies on the partial unique
+    # index to drop a keyed job while one with the same key is still queued
+    __table_args__ = (
+        Index("ix_job_status_run_at", "status", "run_at"),
+        Index(
+            "ux_job_key_queued", "key", unique=True,
+            sqlite_where=text("status = 'queued'"), postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(max_length=100)  # Handler name, e.g. "analytics.refresh"
+    payload: str = Field(default="{}", sa_column=Column(Text, nullable=False))  # JSON
+    key: Optional[str] = Field(default=None, max_length=255)  # At most one queued job per key
+    status: str = Field(default="queued", max_length=20)  # queued, running, done or dead
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=8)
+    run_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    locked_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now()))
+    updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()))
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+from app.services.metrics import Histogram
+
+
+class PoolTelemetry:
+    """Checkout wait times and timeouts recorded by an instrumented pool."""
+
+    def __init__(self):
+        self.wait_seconds = Histogram()
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+class _InstrumentedMixin:
+    """Times every checkout (queue wait plus any new connection) into PoolTelemetry."""
+
+    telemetry: PoolTelemetry
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.telemetry.record_timeout()
+            raise
+        finally:
+            self.telemetry.wait_seconds.observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(pool: Optional[Pool]) -> Optional[Dict]:
+    """Returns a JSON-friendly snapshot of a pool's occupancy and wait telemetry."""
+    if pool is None:
+        return None
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        stats.update(timeouts=telemetry.timeouts, wait_seconds=telemetry.wait_seconds.snapshot())
+    return stats
@@ -1,11 +1,17 @@
 from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession, make_transient_to_detached, object_session
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from app.db.models import User, Admin
-from app.db.database import get_session
+from app.db.database import get_session, get_async_session
+from app.services.cache import TTLCache
+from app.services import passwords
 import os
 
 # Secret key for JWT token generation (change this in production)
@@ -13,6 +19,17 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+# When enabled, tokens carrying principal claims (uid, role, ver) are resolved
+# from a short-lived per-worker cache instead of a lookup on every request.
+# Committed User/Admin updates (revocation, deactivation) evict this worker's
+# entry at once and reach other workers within AUTH_CACHE_TTL.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+
+# Immutable snapshots of User/Admin rows keyed by (role, id); see _snapshot
+principal_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
 # OAuth2 scheme definition for token authentication
 oauth2_scheme_user = OAuth2PasswordBearer(
     tokenUrl="auth/user/login",
@@ -24,18 +41,24 @@ oauth2_scheme_admin = OAuth2PasswordBearer(
     scheme_name="AdminAuth",       # <-- important
 )
 
-# Password hashing utility
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
 def hash_password(password: str) -> str:
-    """Hashes a password using bcrypt."""
-    return pwd_context.hash(password)
+    """Hashes a password using bcrypt on the dedicated hashing executor."""
+    return passwords.hash_password(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies if a provided password matches the hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_password(plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password for async routes: awaits the hashing executor instead of blocking a threadpool thread."""
+    return await passwords.hash_password_async(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password for async routes."""
+    return await passwords.verify_password_async(plain_password, hashed_password)
 
 
 def authenticate_user(db: Session, username: str, password: str):
@@ -62,6 +85,25 @@ def authenticate_admin(db: Session, username: str, password: str):
     return admin
 
 
+async def authenticate_user_async(db: Session, username: str, password: str):
+    """
+    authenticate_user for async routes: the lookup runs on the threadpool and
+    the bcrypt check is awaited, so no thread sits waiting on the hash.
+    """
+    user = await run_in_threadpool(lambda: db.exec(select(User).where(User.username == username)).first())
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+
+async def authenticate_admin_async(db: Session, username: str, password: str):
+    """authenticate_admin for async routes, see authenticate_user_async."""
+    admin = await run_in_threadpool(lambda: db.exec(select(Admin).where(Admin.username == username)).first())
+    if not admin or not await verify_password_async(password, admin.hashed_password):
+        return None
+    return admin
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """
     Creates a JWT access token with expiration.
@@ -79,41 +121,186 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme_user), db: Session = Depends(get_session)) -> User:
-    credentials_exception = HTTPException(
+def create_user_token(user: User, expires_delta: timedelta = None) -> str:
+    """Issues a user token carrying the stable principal claims."""
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.user_id,
+            "role": "user",
+            "active": user.is_active,
+            "ver": user.token_version,
+        },
+        expires_delta=expires_delta,
+    )
+
+
+def create_admin_token(admin: Admin, expires_delta: timedelta = None) -> str:
+    """Issues an admin token carrying the stable principal claims."""
+    return create_access_token(
+        data={"sub": admin.username, "uid": admin.id, "role": "admin", "ver": admin.token_version},
+        expires_delta=expires_delta,
+    )
+
+
+def revoke_tokens(db: Session, principal) -> None:
+    """
+    Invalidates every token issued so far for a user or admin by bumping
+    its token_version.
+    """
+    principal.token_version += 1
+    db.add(principal)
+    # The commit evicts the cached principal, see _forget_changed_principals
+    db.commit()
+
+
+def _principal_key(principal) -> Tuple[str, Any]:
+    if isinstance(principal, Admin):
+        return "admin", principal.id
+    return "user", principal.user_id
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(Admin, "after_update")
+def _principal_changed(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).add(_principal_key(target))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _forget_changed_principals(session) -> None:
+    """
+    Evicts principals updated in the committed transaction (is_active,
+    token_version, ...). Runs after the commit so a concurrent request
+    cannot cache the old row again. Bulk UPDATE statements bypass this;
+    call principal_cache.pop() after them.
+    """
+    for key in session.info.pop("changed_principals", ()):
+        principal_cache.pop(key)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changed_principals(session) -> None:
+    session.info.pop("changed_principals", None)
+
+
+def _snapshot(principal) -> Tuple[type, Tuple[Tuple[str, Any], ...]]:
+    """A principal's column values as an immutable value that requests can share."""
+    return type(principal), tuple(principal.model_dump().items())
+
+
+def _cached_principal(key) -> Optional[Any]:
+    """A fresh detached instance built from the cached snapshot, or None on a miss."""
+    snapshot = principal_cache.get(key)
+    if snapshot is None:
+        return None
+    model, values = snapshot
+    principal = model(**dict(values))
+    make_transient_to_detached(principal)
+    return principal
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str, role: str) -> dict:
+    """Decodes a bearer token, raising 401 if it is invalid or was issued for another role."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    if payload.get("sub") is None or payload.get("role", role) != role:
+        raise _credentials_exception()
+    return payload
 
-    user = db.exec(select(User).where(User.username == username)).first()
+
+def _cache_key(payload: dict, role: str):
+    """Cache key for tokens the claims mode can resolve by id, else None."""
+    if AUTH_TRUST_TOKEN_CLAIMS and isinstance(payload.get("uid"), int) and "ver" in payload:
+        return role, payload["uid"]
+    return None
+
+
+def _check_principal(principal, payload: dict):
+    """Rejects missing or deactivated principals and tokens issued before a revocation."""
+    if principal is None or not getattr(principal, "is_active", True) or payload.get("active") is False:
+        raise _credentials_exception()
+    if "ver" in payload and payload["ver"] != principal.token_version:
+        raise _credentials_exception()
+    return principal
+
+
+def get_current_user(token: str = Depends(oauth2_scheme_user), db: Session = Depends(get_session)) -> User:
+    payload = _decode_token(token, "user")
+    key = _cache_key(payload, "user")
+    if key is None:
+        user = db.exec(select(User).where(User.username == payload["sub"])).first()
+        return _check_principal(user, payload)
+
+    user = _cached_principal(key)
     if user is None:
-        raise credentials_exception
-    return user
+        generation = principal_cache.generation
+        user = db.get(User, payload["uid"])
+        if user is not None:
+            principal_cache.set(key, _snapshot(user), generation)
+    return _check_principal(user, payload)
 
 
 def get_current_admin(token: str = Depends(oauth2_scheme_admin), db: Session = Depends(get_session)) -> Admin:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+    payload = _decode_token(token, "admin")
+    key = _cache_key(payload, "admin")
+    if key is None:
+        admin = db.exec(select(Admin).where(Admin.username == payload["sub"])).first()
+        return _check_principal(admin, payload)
 
-    admin = db.exec(select(Admin).where(Admin.username == username)).first()
+    admin = _cached_principal(key)
     if admin is None:
-        raise credentials_exception
-    return admin
+        generation = principal_cache.generation
+        admin = db.get(Admin, payload["uid"])
+        if admin is not None:
+            principal_cache.set(key, _snapshot(admin), generation)
+    return _check_principal(admin, payload)
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme_user), db: AsyncSession = Depends(get_async_session)
+) -> User:
+    """Async-mode counterpart of get_current_user; shares the request's AsyncSession."""
+    payload = _decode_token(token, "user")
+    key = _cache_key(payload, "user")
+    if key is None:
+        user = (await db.exec(select(User).where(User.username == payload["sub"]))).first()
+        return _check_principal(user, payload)
+
+    user = _cached_principal(key)
+    if user is None:
+        generation = principal_cache.generation
+        user = await db.get(User, payload["uid"])
+        if user is not None:
+            principal_cache.set(key, _snapshot(user), generation)
+    return _check_principal(user, payload)
+
+
+async def get_current_admin_async(
+    token: str = Depends(oauth2_scheme_admin), db: AsyncSession = Depends(get_async_session)
+) -> Admin:
+    """Async-mode counterpart of get_current_admin; shares the request's AsyncSession."""
+    payload = _decode_token(token, "admin")
+    key = _cache_key(payload, "admin")
+    if key is None:
+        admin = (await db.exec(select(Admin).where(Admin.username == payload["sub"]))).first()
+        return _check_principal(admin, payload)
+
+    admin = _cached_principal(key)
+    if admin is None:
+        generation = principal_cache.generation
+        admin = await db.get(Admin, payload["uid"])
+        if admin is not None:
+            principal_cache.set(key, _snapshot(admin), generation)
+    return _check_principal(admin, payload)
@@ -1,31 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from app.db.database import get_session
+from app.db.database import get_session, engine, async_engine
+from app.db.pool import pool_stats
+from app.services.cache import catalog_cache
+from app.services import analytics, export, fast_json, jobs, passwords
 from app.db.models import Admin, User
-from app.dependencies.auth import hash_password, verify_password, create_access_token, get_current_admin
-from app.routers.schemas import UserResponse
-from typing import List
+from app.dependencies.auth import (
+    authenticate_admin_async, create_admin_token, get_current_admin, hash_password_async, revoke_tokens,
+)
+from app.routers.schemas import (
+    AnalyticsRefreshReport, AnalyticsStatus, CategorySales, ProductSales, SaleSourceSales, SalesPeriod, UserResponse,
+)
+from datetime import date
+from typing import List, Optional
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
 # Admin Login
 @router.post("/login")
-def login_admin(username: str, password: str, db: Session = Depends(get_session)):
-    admin = db.exec(select(Admin).where(Admin.username == username)).first()
-    if not admin or not verify_password(password, admin.hashed_password):
+async def login_admin(username: str, password: str, db: Session = Depends(get_session)):
+    admin = await authenticate_admin_async(db, username, password)
+    if not admin:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = create_access_token(data={"sub": admin.username})
+    access_token = create_admin_token(admin)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 # Create Admin (only existing admin can create new ones)
 @router.post("/create")
-def create_admin(username: str, password: str, db: Session = Depends(get_session),
-                 current_admin: Admin = Depends(get_current_admin, use_cache=False)):
+async def create_admin(username: str, password: str, db: Session = Depends(get_session),
+                       current_admin: Admin = Depends(get_current_admin, use_cache=False)):
     # Check if any admin exists
-    existing_admins = db.exec(select(Admin)).all()
+    existing_admins = await run_in_threadpool(lambda: db.exec(select(Admin)).all())
 
     # If an admin exists but the request is unauthorized, deny access
     if existing_admins and not current_admin:
@@ -33,14 +43,18 @@ def create_admin(username: str, password: str, db: Session = Depends(get_session
                             detail="Only an existing admin can create new admins")
 
     # Ensure the username is unique
-    if db.exec(select(Admin).where(Admin.username == username)).first():
+    if await run_in_threadpool(lambda: db.exec(select(Admin).where(Admin.username == username)).first()):
         raise HTTPException(status_code=400, detail="Admin already exists")
 
     # Hash password and create the new admin
-    new_admin = Admin(username=username, hashed_password=hash_password(password))
-    db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    new_admin = Admin(username=username, hashed_password=await hash_password_async(password))
+
+    def save():
+        db.add(new_admin)
+        db.commit()
+        db.refresh(new_admin)
+
+    await run_in_threadpool(save)
 
     return {"message": "Admin created successfully"}
 
@@ -54,5 +68,110 @@ def get_admin_me(current_admin: Admin = Depends(get_current_admin)):
 # Get all users (only admin can view)
 @router.get("/users", response_model=List[UserResponse])
 def get_all_users(db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(fast_json.as_dicts(db.exec(select(*fast_json.schema_columns(UserResponse, User)))))
     users = db.exec(select(User)).all()
     return users
+
+
+# Stream a whole table as NDJSON or CSV (users, orders or payments)
+@router.get("/export/{table}")
+def export_table(table: str, format: str = Query("ndjson", description="ndjson or csv"),
+                 current_admin: Admin = Depends(get_current_admin)):
+    if table not in export.EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export {table!r}")
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    filename = export.export_filename(table, format)
+    return StreamingResponse(
+        export.stream_table(engine, table, format),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# Revoke every token issued to a user (e.g. after a password reset or ban)
+@router.post("/users/{user_id}/revoke-tokens")
+def revoke_user_tokens(user_id: int, db: Session = Depends(get_session),
+                       current_admin: Admin = Depends(get_current_admin)):
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    revoke_tokens(db, user)
+    return {"message": "Tokens revoked"}
+
+
+# Connection pool occupancy and checkout wait times for this worker
+@router.get("/db/pool")
+def get_pool_stats(current_admin: Admin = Depends(get_current_admin)):
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.sync_engine.pool) if async_engine is not None else None,
+    }
+
+
+# Hit/miss counters for the public catalog cache on this worker
+@router.get("/cache")
+def get_cache_stats(current_admin: Admin = Depends(get_current_admin)):
+    return {"catalog": catalog_cache.stats()}
+
+
+# Password hashing executor load, rejections and latency on this worker
+@router.get("/passwords")
+def get_password_hashing_stats(current_admin: Admin = Depends(get_current_admin)):
+    return passwords.stats()
+
+
+# Sales dashboards, read from the daily rollups (dates are UTC days, inclusive)
+@router.get("/analytics/sales", response_model=List[SalesPeriod])
+def get_sales(start: Optional[date] = None, end: Optional[date] = None,
+              interval: str = Query("day", description="day or week"), sale_source: Optional[str] = None,
+              db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return analytics.sales_over_time(db, start, end, interval, sale_source)
+
+
+@router.get("/analytics/sale-sources", response_model=List[SaleSourceSales])
+def get_sales_by_source(start: Optional[date] = None, end: Optional[date] = None,
+                        db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return analytics.sales_by_source(db, start, end)
+
+
+@router.get("/analytics/categories", response_model=List[CategorySales])
+def get_sales_by_category(start: Optional[date] = None, end: Optional[date] = None, sale_source: Optional[str] = None,
+                          db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return analytics.sales_by_category(db, start, end, sale_source)
+
+
+@router.get("/analytics/top-products", response_model=List[ProductSales])
+def get_top_products(start: Optional[date] = None, end: Optional[date] = None, category_id: Optional[int] = None,
+                     limit: int = Query(10, ge=1, le=analytics.MAX_TOP_PRODUCTS),
+                     by: str = Query("revenue", description="revenue or units"),
+                     db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return analytics.top_products(db, start, end, category_id, limit, by)
+
+
+@router.get("/analytics/status", response_model=AnalyticsStatus)
+def get_analytics_status(db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return analytics.status(db)
+
+
+# Fold orders changed since the last run into the rollups (full=true rebuilds every day)
+@router.post("/analytics/refresh", response_model=AnalyticsRefreshReport)
+def refresh_analytics(full: bool = False, db: Session = Depends(get_session),
+                      current_admin: Admin = Depends(get_current_admin)):
+    return analytics.refresh(db, full=full)
+
+
+# Background job counts per status (dead jobs need attention)
+@router.get("/jobs")
+def get_job_stats(db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return jobs.stats(db)
+
+
+# Retry dead jobs: one by id, all of a kind, or all of them
+@router.post("/jobs/requeue")
+def requeue_dead_jobs(job_id: Optional[int] = None, kind: Optional[str] = None,
+                      db: Session = Depends(get_session), current_admin: Admin = Depends(get_current_admin)):
+    return {"requeued": jobs.requeue(db, job_id, kind)}
@@ -0,0 +1,130 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.db.database import SessionLocal, engine, async_engine
+from app.db.pool import pool_stats
+from app.dependencies.auth import principal_cache
+from app.services import jobs, metrics, passwords
+from app.services.cache import TTLCache, catalog_cache
+
+# Scrapers must send "Authorization: Bearer <METRICS_TOKEN>"; with no token set
+# the endpoint refuses every request unless METRICS_PUBLIC opens it (e.g. when
+# the port is only reachable from a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+# Seconds the job queue counts are reused between scrapes, instead of a query per scrape
+METRICS_JOB_COUNTS_TTL = float(os.getenv("METRICS_JOB_COUNTS_TTL", "15"))
+
+_job_counts = TTLCache(1, METRICS_JOB_COUNTS_TTL)
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _pool_metrics() -> list:
+    pools = [("sync", pool_stats(engine.pool))]
+    if async_engine is not None:
+        pools.append(("async", pool_stats(async_engine.sync_engine.pool)))
+    pools = [(name, stats) for name, stats in pools if stats is not None and "size" in stats]
+
+    parts = []
+    for metric, key, help_text in (
+        ("db_pool_size", "size", "Configured pool size."),
+        ("db_pool_checked_out", "checked_out", "Connections currently checked out."),
+        ("db_pool_overflow", "overflow", "Overflow connections currently open."),
+    ):
+        parts.append(metrics.format_gauge(metric, help_text, [({"engine": name}, stats[key]) for name, stats in pools]))
+    parts.append(metrics.format_gauge(
+        "db_pool_timeouts_total", "Checkouts that gave up waiting for a connection.",
+        [({"engine": name}, stats["timeouts"]) for name, stats in pools], kind="counter",
+    ))
+    parts.append(metrics.format_histograms(
+        "db_pool_wait_seconds", "Time spent waiting for a pool checkout.",
+        [({"engine": name}, stats["wait_seconds"]) for name, stats in pools],
+    ))
+    return parts
+
+
+def _cache_metrics() -> list:
+    caches = [("catalog", catalog_cache.stats()), ("principal", principal_cache.stats())]
+    return [
+        metrics.format_gauge("cache_entries", "Entries held per cache.", [({"cache": n}, s["size"]) for n, s in caches]),
+        metrics.format_gauge("cache_hits_total", "Cache hits.", [({"cache": n}, s["hits"]) for n, s in caches], kind="counter"),
+        metrics.format_gauge("cache_misses_total", "Cache misses.", [({"cache": n}, s["misses"]) for n, s in caches], kind="counter"),
+    ]
+
+
+def _password_metrics() -> list:
+    stats = passwords.stats()
+    return [
+        metrics.format_gauge("password_hash_in_flight", "bcrypt operations running or queued.", [({}, stats["in_flight"])]),
+        metrics.format_gauge("password_hash_queued", "bcrypt operations waiting for a worker.", [({}, stats["queued"])]),
+        metrics.format_gauge(
+            "password_hash_rejected_total", "bcrypt operations refused with 429.", [({}, stats["rejected"])], kind="counter"
+        ),
+        metrics.format_histograms("password_hash_seconds", "bcrypt hash latency, queue wait included.", [({}, stats["hash_seconds"])]),
+        metrics.format_histograms("password_verify_seconds", "bcrypt verify latency, queue wait included.", [({}, stats["verify_seconds"])]),
+    ]
+
+
+def _load_job_counts() -> dict:
+    with SessionLocal() as db:
+        return jobs.stats(db)
+
+
+def _job_metrics() -> list:
+    counts = _job_counts.get_or_load("counts", _load_job_counts)
+    return [
+        metrics.format_gauge("jobs", "Background jobs per status (whole queue).", [({"status": s}, n) for s, n in counts.items()]),
+        metrics.format_gauge(
+            "jobs_run_total", "Jobs run by this process, by outcome.",
+            metrics.labeled_counter_samples(metrics.jobs_total), kind="counter",
+        ),
+        metrics.format_histograms(
+            "job_duration_seconds", "Job run time by kind.", metrics.labeled_histogram_samples(metrics.job_seconds),
+        ),
+    ]
+
+
+def render_metrics() -> str:
+    parts = [
+        metrics.format_histograms(
+            "http_request_duration_seconds", "Request latency by route.",
+            metrics.labeled_histogram_samples(metrics.request_seconds),
+        ),
+        metrics.format_gauge(
+            "http_requests_total", "Requests by route and status.",
+            metrics.labeled_counter_samples(metrics.requests_total), kind="counter",
+        ),
+        metrics.format_histograms(
+            "http_request_sql_statements", "SQL statements executed per request.",
+            metrics.labeled_histogram_samples(metrics.request_sql_statements),
+        ),
+        metrics.format_histograms(
+            "http_request_db_seconds", "Time spent in SQL per request.",
+            metrics.labeled_histogram_samples(metrics.request_db_seconds),
+        ),
+        metrics.format_gauge(
+            "sql_slow_queries_total", "Statements slower than SLOW_QUERY_MS by route.",
+            metrics.labeled_counter_samples(metrics.slow_queries_total), kind="counter",
+        ),
+        *_pool_metrics(),
+        *_cache_metrics(),
+        *_password_metrics(),
+        *_job_metrics(),
+    ]
+    return "\n".join(parts) + "\n"
+
+
+# Prometheus scrape endpoint for this worker
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN:
+        if not METRICS_PUBLIC:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Set METRICS_TOKEN (or METRICS_PUBLIC) to enable metrics"
+            )
+    elif not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
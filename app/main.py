@@ -1,9 +1,19 @@
 from fastapi import FastAPI
-from app.db.database import create_db_and_tables
+from app.db import instrumentation
+from app.db.database import DB_MIGRATE_ON_STARTUP
+from app.db.migrations import upgrade as migrate_database
 from app.routers import routers
+from app.middleware import RequestMetricsMiddleware
+from app.services import jobs
 from .services.admin import seed_admin_if_none_exist
 
 app = FastAPI()
+# Runs background jobs on a thread of this process; otherwise use `python -m app.services.jobs worker`
+job_worker = jobs.Worker() if jobs.JOBS_IN_PROCESS else None
+
+# Per-route latency, SQL counts and slow-query logging (see GET /metrics)
+instrumentation.install()
+app.add_middleware(RequestMetricsMiddleware)
 
 # Include your routers
 for router in routers:
@@ -13,5 +23,14 @@ for router in routers:
 # Database initialization on startup
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
+    if DB_MIGRATE_ON_STARTUP:
+        migrate_database()
     seed_admin_if_none_exist()
+    if job_worker is not None:
+        job_worker.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if job_worker is not None:
+        job_worker.stop()
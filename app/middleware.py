@@ -0,0 +1,61 @@
+"""
+Per-request latency and SQL instrumentation.
+
+RequestMetricsMiddleware is plain ASGI, so it adds no extra task or
+response buffering. It puts a RequestStats in a context variable for the
+engine hooks in app/db/instrumentation.py to fill in, and then:
+
+- records latency, statement count and DB time per (method, route) for
+  GET /metrics,
+- adds a Server-Timing header (app, db) that browser dev tools display.
+"""
+import os
+import time
+from app.services.metrics import (
+    RequestStats,
+    current_request,
+    request_db_seconds,
+    request_seconds,
+    request_sql_statements,
+    requests_total,
+)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"], scope=scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    app_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_statements} queries", '
+                        f"app;dur={app_ms:.1f}"
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            labels = (stats.method, stats.route)
+            request_seconds.observe(labels, time.perf_counter() - started)
+            request_sql_statements.observe(labels, stats.sql_statements)
+            request_db_seconds.observe(labels, stats.sql_seconds)
+            requests_total.inc((*labels, str(status)))
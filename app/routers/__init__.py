@@ -1,11 +1,22 @@
+from app.db.database import DATABASE_ASYNC
 from .users import router as users_router
 from .auth import router as auth_router
 from .addresses import router as addresses_router
-from .products import router as products_router
-from .categories import router as categories_router
-from .orders import router as orders_router
-from .payments import router as payments_router
-from app.internal import admin
+from . import products, categories, orders, payments
+from app.internal import admin, metrics
+
+# The catalog, order and payment routes come in a sync and an async flavour;
+# DATABASE_ASYNC picks which one is mounted.
+if DATABASE_ASYNC:
+    products_router = products.async_router
+    categories_router = categories.async_router
+    orders_router = orders.async_router
+    payments_router = payments.async_router
+else:
+    products_router = products.router
+    categories_router = categories.router
+    orders_router = orders.router
+    payments_router = payments.router
 
 # List of routers
 routers = [
@@ -17,4 +28,5 @@ routers = [
     categories_router,
     orders_router,
     payments_router,
+    metrics.router,
 ]
@@ -5,6 +5,7 @@ from app.db.models import Address, User
 from app.dependencies.auth import get_current_user
 from typing import List
 from app.routers.schemas import AddressCreate, AddressResponse, AddressUpdate
+from app.services import fast_json
 
 router = APIRouter(
     prefix="/addresses",
@@ -32,6 +33,11 @@ def get_my_addresses(
         db: Session = Depends(get_session),
         current_user: User = Depends(get_current_user)
 ):
+    if fast_json.FAST_JSON:
+        columns = fast_json.schema_columns(AddressResponse, Address)
+        return fast_json.json_response(
+            fast_json.as_dicts(db.exec(select(*columns).where(Address.user_id == current_user.user_id)))
+        )
     addresses = db.exec(select(Address).where(Address.user_id == current_user.user_id)).all()
     return addresses
 
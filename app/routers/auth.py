@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session
-from app.dependencies.auth import authenticate_user, authenticate_admin, create_access_token
+from app.dependencies.auth import authenticate_user_async, authenticate_admin_async, create_user_token, create_admin_token
 from app.db.database import get_session
 from datetime import timedelta
 
@@ -12,24 +12,24 @@ router = APIRouter(
 
 
 @router.post("/user/login")
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(minutes=30))
+    access_token = create_user_token(user, expires_delta=timedelta(minutes=30))
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/admin/login")
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)
 ):
-    user = authenticate_admin(db, form_data.username, form_data.password)
+    user = await authenticate_admin_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(minutes=30))
+    access_token = create_admin_token(user, expires_delta=timedelta(minutes=30))
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
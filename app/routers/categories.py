@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List
-from app.db.models import Category, Admin
-from app.db.database import get_session
-from app.routers.schemas import CategoryCreate, CategoryRead, CategoryBase
-from app.dependencies.auth import get_current_admin
+from fastapi import APIRouter, Depends, Header, status
+from sqlmodel import Session
+from typing import List, Optional
+from app.db.models import Admin
+from app.db.database import get_session, AsyncSessionDep, run_sync
+from app.routers.schemas import CategoryCreate, CategoryRead, CategoryBase, CategoryReprice, CategoryRepriceResult
+from app.dependencies.auth import get_current_admin, get_current_admin_async
+from app.services import categories as category_service
+from app.services import products as product_service
+from app.services.http_cache import conditional_response
 
 router = APIRouter(
     prefix="/categories",
     tags=["Categories"]
 )
 
+# Same routes served from the async engine (DATABASE_ASYNC=true)
+async_router = APIRouter(
+    prefix="/categories",
+    tags=["Categories"]
+)
+
 
 # Route to create a new category (admin only)
 @router.post("/", response_model=CategoryRead, status_code=status.HTTP_201_CREATED)
@@ -19,32 +28,19 @@ def create_category(
     db: Session = Depends(get_session),
     current_admin: Admin = Depends(get_current_admin)
 ):
-    # Ensure the category name is unique
-    existing_category = db.exec(select(Category).where(Category.name == category.name)).first()
-    if existing_category:
-        raise HTTPException(status_code=400, detail="Category already exists")
-
-    new_category = Category(**category.dict())
-    db.add(new_category)
-    db.commit()
-    db.refresh(new_category)
-    return new_category
+    return category_service.create_category(db, category)
 
 
 # Route to get all categories (public)
 @router.get("/", response_model=List[CategoryRead])
-def read_categories(db: Session = Depends(get_session)):
-    categories = db.exec(select(Category)).all()
-    return categories
+def read_categories(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_session)):
+    return conditional_response(category_service.list_categories(db), if_none_match)
 
 
 # Route to get a single category by ID (public)
 @router.get("/{category_id}", response_model=CategoryRead)
-def read_category(category_id: int, db: Session = Depends(get_session)):
-    category = db.get(Category, category_id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return category
+def read_category(category_id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_session)):
+    return conditional_response(category_service.get_category(db, category_id), if_none_match)
 
 
 # Route to update a category (admin only)
@@ -55,22 +51,54 @@ def update_category(
     db: Session = Depends(get_session),
     current_admin: Admin = Depends(get_current_admin)
 ):
-    category = db.get(Category, category_id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-
-    # Update only the provided fields
-    category_data = category_update.dict(exclude_unset=True)
-    for key, value in category_data.items():
-        setattr(category, key, value)
-
-    # Ensure the new name is unique if it's being updated
-    if "name" in category_data:
-        existing_category = db.exec(select(Category).where(Category.name == category.name, Category.category_id != category_id)).first()
-        if existing_category:
-            raise HTTPException(status_code=400, detail="Category name already exists")
-
-    db.add(category)
-    db.commit()
-    db.refresh(category)
-    return category
\ No newline at end of file
+    return category_service.update_category(db, category_id, category_update)
+
+
+# Route to scale every price in a category by a percentage (admin only)
+@router.post("/{category_id}/reprice", response_model=CategoryRepriceResult)
+def reprice_category(
+    category_id: int,
+    reprice: CategoryReprice,
+    db: Session = Depends(get_session),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return product_service.reprice_category(db, category_id, reprice)
+
+
+@async_router.post("/", response_model=CategoryRead, status_code=status.HTTP_201_CREATED)
+async def create_category_async(
+    category: CategoryCreate,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, category_service.create_category, category, response_model=CategoryRead)
+
+
+@async_router.get("/", response_model=List[CategoryRead])
+async def read_categories_async(db: AsyncSessionDep, if_none_match: Optional[str] = Header(None)):
+    return conditional_response(await run_sync(db, category_service.list_categories), if_none_match)
+
+
+@async_router.get("/{category_id}", response_model=CategoryRead)
+async def read_category_async(category_id: int, db: AsyncSessionDep, if_none_match: Optional[str] = Header(None)):
+    return conditional_response(await run_sync(db, category_service.get_category, category_id), if_none_match)
+
+
+@async_router.put("/{category_id}", response_model=CategoryRead)
+async def update_category_async(
+    category_id: int,
+    category_update: CategoryBase,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, category_service.update_category, category_id, category_update, response_model=CategoryRead)
+
+
+@async_router.post("/{category_id}/reprice", response_model=CategoryRepriceResult)
+async def reprice_category_async(
+    category_id: int,
+    reprice: CategoryReprice,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, product_service.reprice_category, category_id, reprice, response_model=CategoryRepriceResult)
@@ -1,54 +1,32 @@
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from app.db.database import get_session
-from app.db.models import Order, User, Admin, Product, OrderItem
-from app.dependencies.auth import get_current_user, get_current_admin
-from app.routers.schemas import OrderCreate, OrderRead, OrderItemCreate
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlmodel import Session
+from app.db.database import get_session, AsyncSessionDep, run_sync
+from app.db.models import User
+from app.dependencies.auth import get_current_user, get_current_user_async
+from app.routers.schemas import OrderCreate, OrderRead, OrderItemCreate, OrderPage
+from app.services import orders as order_service
+from app.services import fast_json
+from app.services import idempotency as idempotency_service
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+# Same routes served from the async engine (DATABASE_ASYNC=true)
+async_router = APIRouter(prefix="/orders", tags=["Orders"])
+
 
 @router.post("/", response_model=OrderRead, status_code=201)
 def create_order(
     order: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    new_order = Order(
-        user_id=current_user.user_id,
-        total_amount=order.total_amount,
-        status=order.status,
-        sale_source=order.sale_source
-    )
-
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-
-    # Add order items
-    for item in order.order_items:
-        product = db.get(Product, item.product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough stock for product {item.product_id}")
-
-        order_item = OrderItem(
-            order_id=new_order.order_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_purchase=item.price_at_purchase
-        )
-
-        product.stock -= item.quantity  # Reduce stock
-        db.add(order_item)
-
-    db.commit()
-    db.refresh(new_order)
-
-    return new_order
+    idempotency = idempotency_service.from_header(idempotency_key, current_user.user_id, "orders.create", order)
+    created = order_service.create_order(db, order, current_user, idempotency)
+    idempotency_service.mark_replayed(response, idempotency)
+    return created
 
 
 @router.get("/{order_id}", response_model=OrderRead)
@@ -57,27 +35,23 @@ def read_order(
         session: Session = Depends(get_session),
         current_user: User = Depends(get_current_user)
 ):
-    order = session.exec(
-        select(Order).where(Order.order_id == order_id)
-    ).first()
-
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    return order_service.get_order(session, order_id, current_user)
 
-    if order.user_id != current_user.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this order")
 
-    return order
-
-
-@router.get("/", response_model=List[OrderRead])
+# Order history, newest first, with line items and payments
+@router.get("/", response_model=OrderPage)
 def read_orders(
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(order_service.DEFAULT_PAGE_SIZE, ge=1, le=order_service.MAX_PAGE_SIZE),
         session: Session = Depends(get_session),
         current_user: User = Depends(get_current_user)
 ):
-    orders = session.exec(select(Order).where(Order.user_id == current_user.user_id)).all()
-
-    return orders
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(
+            order_service.list_order_rows(session, current_user, status=status, cursor=cursor, limit=limit)
+        )
+    return order_service.list_orders(session, current_user, status=status, cursor=cursor, limit=limit)
 
 
 @router.put("/{order_id}/items", status_code=200)
@@ -87,33 +61,57 @@ def update_order_items(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    order = db.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    order_service.update_order_items(db, order_id, order_items, current_user)
+    return {"message": "Order items updated"}
 
-    if order.user_id != current_user.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to modify this order")
 
-    # Delete existing order items
-    db.exec(select(OrderItem).where(OrderItem.order_id == order_id)).delete()
+@async_router.post("/", response_model=OrderRead, status_code=201)
+async def create_order_async(
+    order: OrderCreate,
+    response: Response,
+    db: AsyncSessionDep,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user_async)
+):
+    idempotency = idempotency_service.from_header(idempotency_key, current_user.user_id, "orders.create", order)
+    created = await run_sync(db, order_service.create_order, order, current_user, idempotency)
+    idempotency_service.mark_replayed(response, idempotency)
+    return created
 
-    for item in order_items:
-        product = db.get(Product, item.product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
 
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough stock for product {item.product_id}")
+@async_router.get("/{order_id}", response_model=OrderRead)
+async def read_order_async(
+        order_id: int,
+        db: AsyncSessionDep,
+        current_user: User = Depends(get_current_user_async)
+):
+    return await run_sync(db, order_service.get_order, order_id, current_user, response_model=OrderRead)
 
-        order_item = OrderItem(
-            order_id=order_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_purchase=item.price_at_purchase
-        )
 
-        product.stock -= item.quantity
-        db.add(order_item)
+@async_router.get("/", response_model=OrderPage)
+async def read_orders_async(
+        db: AsyncSessionDep,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(order_service.DEFAULT_PAGE_SIZE, ge=1, le=order_service.MAX_PAGE_SIZE),
+        current_user: User = Depends(get_current_user_async)
+):
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(await run_sync(
+            db, order_service.list_order_rows, current_user, status=status, cursor=cursor, limit=limit,
+        ))
+    return await run_sync(
+        db, order_service.list_orders, current_user, status=status, cursor=cursor, limit=limit,
+        response_model=OrderPage,
+    )
+
 
-    db.commit()
+@async_router.put("/{order_id}/items", status_code=200)
+async def update_order_items_async(
+    order_id: int,
+    order_items: List[OrderItemCreate],
+    db: AsyncSessionDep,
+    current_user: User = Depends(get_current_user_async)
+):
+    await run_sync(db, order_service.update_order_items, order_id, order_items, current_user)
     return {"message": "Order items updated"}
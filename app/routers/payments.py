@@ -1,47 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from app.db.database import get_session
-from app.db.models import Payment, Order, User
-from app.dependencies.auth import get_current_user
+from fastapi import APIRouter, Depends, Header, Response
+from sqlmodel import Session
+from app.db.database import get_session, AsyncSessionDep, run_sync
+from app.db.models import User
+from app.dependencies.auth import get_current_user, get_current_user_async
 from app.routers.schemas import PaymentCreate, PaymentRead
-from typing import List
+from app.services import payments as payment_service
+from app.services import fast_json
+from app.services import idempotency as idempotency_service
+from typing import List, Optional
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+# Same routes served from the async engine (DATABASE_ASYNC=true)
+async_router = APIRouter(prefix="/payments", tags=["Payments"])
+
 
 @router.post("/", response_model=PaymentRead, status_code=201)
 def create_payment(
     payment: PaymentCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    order = db.get(Order, payment.order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    if order.user_id != current_user.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to pay for this order")
-
-    if payment.amount > order.total_amount:
-        raise HTTPException(status_code=400, detail="Payment amount exceeds order total")
-
-    new_payment = Payment(
-        order_id=payment.order_id,
-        payment_method=payment.payment_method,
-        amount=payment.amount,
-        status="completed"  # Assume payment is completed for now
-    )
-
-    # Update order status if fully paid
-    total_paid = sum(p.amount for p in db.exec(select(Payment).where(Payment.order_id == payment.order_id)))
-    if total_paid + payment.amount >= order.total_amount:
-        order.status = "paid"
-
-    db.add(new_payment)
-    db.commit()
-    db.refresh(new_payment)
-
-    return new_payment
+    idempotency = idempotency_service.from_header(idempotency_key, current_user.user_id, "payments.create", payment)
+    created = payment_service.create_payment(db, payment, current_user, idempotency)
+    idempotency_service.mark_replayed(response, idempotency)
+    return created
 
 
 @router.get("/", response_model=List[PaymentRead])
@@ -49,11 +34,9 @@ def get_payments(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    payments = db.exec(
-        select(Payment).join(Order).where(Order.user_id == current_user.user_id)
-    ).all()
-
-    return payments
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(payment_service.list_payment_rows(db, current_user))
+    return payment_service.list_payments(db, current_user)
 
 
 @router.put("/{payment_id}/status", response_model=PaymentRead)
@@ -63,20 +46,38 @@ def update_payment_status(
         db: Session = Depends(get_session),
         current_user: User = Depends(get_current_user)
 ):
-    payment = db.get(Payment, payment_id)
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment_service.update_payment_status(db, payment_id, status, current_user)
 
-    order = db.get(Order, payment.order_id)
-    if order.user_id != current_user.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this payment")
 
-    if status not in ["pending", "completed", "failed", "refunded"]:
-        raise HTTPException(status_code=400, detail="Invalid payment status")
+@async_router.post("/", response_model=PaymentRead, status_code=201)
+async def create_payment_async(
+    payment: PaymentCreate,
+    response: Response,
+    db: AsyncSessionDep,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user_async)
+):
+    idempotency = idempotency_service.from_header(idempotency_key, current_user.user_id, "payments.create", payment)
+    created = await run_sync(db, payment_service.create_payment, payment, current_user, idempotency)
+    idempotency_service.mark_replayed(response, idempotency)
+    return created
 
-    payment.status = status
-    db.commit()
-    db.refresh(payment)
 
-    return payment
+@async_router.get("/", response_model=List[PaymentRead])
+async def get_payments_async(
+    db: AsyncSessionDep,
+    current_user: User = Depends(get_current_user_async)
+):
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(await run_sync(db, payment_service.list_payment_rows, current_user))
+    return await run_sync(db, payment_service.list_payments, current_user, response_model=List[PaymentRead])
+
 
+@async_router.put("/{payment_id}/status", response_model=PaymentRead)
+async def update_payment_status_async(
+        payment_id: int,
+        status: str,
+        db: AsyncSessionDep,
+        current_user: User = Depends(get_current_user_async)
+):
+    return await run_sync(db, payment_service.update_payment_status, payment_id, status, current_user, response_model=PaymentRead)
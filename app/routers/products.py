@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List, Optional
-from app.db.models import Product, Category, Admin
-from app.db.database import get_session
-from app.routers.schemas import ProductCreate, ProductRead, ProductBase
-from app.dependencies.auth import get_current_admin
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile, status
+from sqlmodel import Session
+from decimal import Decimal
+from typing import Optional
+from app.db.models import Admin
+from app.db.database import get_session, AsyncSessionDep, run_sync
+from app.routers.schemas import (
+    ProductCreate, ProductRead, ProductBase, ProductPage, CatalogImportReport,
+    ProductBulkUpdate, ProductBulkUpdateReport, ProductSearchPage,
+)
+from app.dependencies.auth import get_current_admin, get_current_admin_async
+from app.services import products as product_service
+from app.services import catalog_import
+from app.services import search as search_service
+from app.services.http_cache import conditional_response
 
 router = APIRouter(
     prefix="/products",
     tags=["Products"]
 )
 
+# Same routes served from the async engine (DATABASE_ASYNC=true)
+async_router = APIRouter(
+    prefix="/products",
+    tags=["Products"]
+)
+
 
 # Route to create a new product (admin only)
 @router.post("/", response_model=ProductRead, status_code=status.HTTP_201_CREATED)
@@ -19,36 +33,85 @@ def create_product(
     db: Session = Depends(get_session),
     current_admin: Admin = Depends(get_current_admin)
 ):
-    # Check if the category exists
-    category = db.exec(select(Category).where(Category.category_id == product.category_id)).first()
-    if not category:
-        raise HTTPException(status_code=400, detail="Category not found")
+    return product_service.create_product(db, product)
+
+
+# Bulk import/upsert products from a CSV or NDJSON upload (admin only).
+# The upload is spooled to disk and parsed row by row, so it is served from
+# the threadpool in both database modes.
+@router.post("/import", response_model=CatalogImportReport)
+@async_router.post("/import", response_model=CatalogImportReport)
+def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; defaults to the file name / content type"),
+    db: Session = Depends(get_session),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    fmt = format or _import_format(file)
+    if fmt not in catalog_import.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return catalog_import.import_catalog_file(db, file.file, fmt)
 
-    new_product = Product(**product.dict())
-    db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
-    return new_product
 
+def _import_format(file: UploadFile) -> str:
+    name = (file.filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or file.content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
 
-# Route to get all products (public)
-@router.get("/", response_model=List[ProductRead])
-def read_products(category_id: Optional[str] = None, db: Session = Depends(get_session)):
-    query = select(Product)
-    if category_id:
-        query = query.join(Category).where(Category.category_id == category_id)
 
-    products = db.exec(query).all()
-    return products
+# Route to apply many price/stock changes in one transaction (admin only)
+@router.post("/bulk-update", response_model=ProductBulkUpdateReport)
+def bulk_update_products(
+    batch: ProductBulkUpdate,
+    db: Session = Depends(get_session),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return product_service.bulk_update_products(db, batch)
+
+
+# Route to get a page of products (public)
+@router.get("/", response_model=ProductPage)
+def read_products(
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = False,
+    sort: str = Query("product_id", description="product_id, price or created_at; prefix with - for descending"),
+    cursor: Optional[str] = None,
+    limit: int = Query(product_service.DEFAULT_PAGE_SIZE, ge=1, le=product_service.MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session),
+):
+    rendered = product_service.list_products(
+        db, category_id=category_id, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, sort=sort, cursor=cursor, limit=limit,
+    )
+    return conditional_response(rendered, if_none_match)
+
+
+# Route to search products by name/description with facets (public)
+@router.get("/search", response_model=ProductSearchPage)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to match; each one also matches as a prefix"),
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = False,
+    offset: int = Query(0, ge=0, le=search_service.MAX_OFFSET),
+    limit: int = Query(search_service.DEFAULT_PAGE_SIZE, ge=1, le=search_service.MAX_PAGE_SIZE),
+    db: Session = Depends(get_session),
+):
+    return search_service.search_products(
+        db, q, category_id=category_id, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, offset=offset, limit=limit,
+    )
 
 
 # Route to get a single product by ID (public)
 @router.get("/{product_id}", response_model=ProductRead)
-def read_product(product_id: int, db: Session = Depends(get_session)):
-    product = db.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+def read_product(product_id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_session)):
+    return conditional_response(product_service.get_product(db, product_id), if_none_match)
 
 
 @router.put("/{product_id}", response_model=ProductRead)
@@ -58,22 +121,73 @@ def update_product(
     db: Session = Depends(get_session),
     current_admin: Admin = Depends(get_current_admin)
 ):
-    product = db.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # Update only the provided fields
-    product_data = product_update.dict(exclude_unset=True)
-    for key, value in product_data.items():
-        setattr(product, key, value)
-
-    # Check if the category exists if it's being updated
-    if "category_id" in product_data:
-        category = db.exec(select(Category).where(Category.category_id == product.category_id)).first()
-        if not category:
-            raise HTTPException(status_code=400, detail="Category not found")
-
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
+    return product_service.update_product(db, product_id, product_update)
+
+
+@async_router.post("/", response_model=ProductRead, status_code=status.HTTP_201_CREATED)
+async def create_product_async(
+    product: ProductCreate,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, product_service.create_product, product, response_model=ProductRead)
+
+
+@async_router.post("/bulk-update", response_model=ProductBulkUpdateReport)
+async def bulk_update_products_async(
+    batch: ProductBulkUpdate,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, product_service.bulk_update_products, batch, response_model=ProductBulkUpdateReport)
+
+
+@async_router.get("/", response_model=ProductPage)
+async def read_products_async(
+    db: AsyncSessionDep,
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = False,
+    sort: str = Query("product_id", description="product_id, price or created_at; prefix with - for descending"),
+    cursor: Optional[str] = None,
+    limit: int = Query(product_service.DEFAULT_PAGE_SIZE, ge=1, le=product_service.MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+):
+    rendered = await run_sync(
+        db, product_service.list_products, category_id=category_id, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, sort=sort, cursor=cursor, limit=limit,
+    )
+    return conditional_response(rendered, if_none_match)
+
+
+@async_router.get("/search", response_model=ProductSearchPage)
+async def search_products_async(
+    db: AsyncSessionDep,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to match; each one also matches as a prefix"),
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = False,
+    offset: int = Query(0, ge=0, le=search_service.MAX_OFFSET),
+    limit: int = Query(search_service.DEFAULT_PAGE_SIZE, ge=1, le=search_service.MAX_PAGE_SIZE),
+):
+    return await run_sync(
+        db, search_service.search_products, q, category_id=category_id, min_price=min_price,
+        max_price=max_price, in_stock=in_stock, offset=offset, limit=limit, response_model=ProductSearchPage,
+    )
+
+
+@async_router.get("/{product_id}", response_model=ProductRead)
+async def read_product_async(product_id: int, db: AsyncSessionDep, if_none_match: Optional[str] = Header(None)):
+    return conditional_response(await run_sync(db, product_service.get_product, product_id), if_none_match)
+
+
+@async_router.put("/{product_id}", response_model=ProductRead)
+async def update_product_async(
+    product_id: int,
+    product_update: ProductBase,
+    db: AsyncSessionDep,
+    current_admin: Admin = Depends(get_current_admin_async)
+):
+    return await run_sync(db, product_service.update_product, product_id, product_update, response_model=ProductRead)
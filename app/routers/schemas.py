@@ -1,7 +1,19 @@
-from sqlmodel import SQLModel
-from pydantic import EmailStr
-from typing import Optional, List
-from datetime import datetime
+from sqlmodel import SQLModel, Field
+from pydantic import EmailStr, PlainSerializer, model_validator
+from pydantic import Field as PydanticField
+from typing import Annotated, Optional, List
+from datetime import date, datetime
+from decimal import Decimal
+
+# Money is exact to the cent internally (NUMERIC(12, 2) in the database) and
+# still travels as a plain JSON number.
+Money = Annotated[
+    Decimal,
+    PydanticField(max_digits=12, decimal_places=2),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
+# Sums of Money (analytics) can outgrow NUMERIC(12, 2)
+MoneyTotal = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
 
 class UserCreate(SQLModel):
     username: str
@@ -64,46 +76,149 @@ class CategoryRead(SQLModel):
 
 
 class ProductBase(SQLModel):
+    sku: Optional[str] = None
     name: Optional[str] = None
     description: Optional[str] = None
-    price: Optional[float] = None
+    price: Optional[Money] = None
     stock: Optional[int] = None
     category_id: Optional[int] = None
 
 
 class ProductCreate(ProductBase):
     name: str
-    price: float
+    price: Money
     stock: int
     category_id: int
 
 
 class ProductRead(SQLModel):
     product_id: int
+    sku: Optional[str] = None
     name: str
     description: Optional[str] = None
-    price: float
+    price: Money
     stock: int
     category: CategoryRead
 
 
+class ProductPage(SQLModel):
+    items: List[ProductRead]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
+
+
+class ProductSearchHit(ProductRead):
+    score: float  # Relevance; name matches weigh more than description matches
+
+
+class CategoryFacet(SQLModel):
+    category_id: int
+    name: str
+    count: int
+
+
+class PriceFacet(SQLModel):
+    min: Optional[Money] = None  # Inclusive; None for the lowest bucket
+    max: Optional[Money] = None  # Exclusive; None for the highest bucket
+    count: int
+
+
+class SearchFacets(SQLModel):
+    categories: List[CategoryFacet] = []
+    prices: List[PriceFacet] = []
+
+
+class ProductSearchPage(SQLModel):
+    items: List[ProductSearchHit]
+    total: int
+    offset: int
+    limit: int
+    facets: SearchFacets
+
+
+class ProductImportRow(SQLModel):
+    """One product line of a bulk catalog import, matched on sku."""
+    sku: str = Field(min_length=1, max_length=64)
+    name: str = Field(min_length=1, max_length=100)
+    description: Optional[str] = Field(default=None, max_length=255)
+    price: Money = Field(gt=0)
+    stock: int = Field(default=0, ge=0)
+    category_id: Optional[int] = None
+    category: Optional[str] = None  # Category name, used when category_id is absent
+
+
+class ImportRowError(SQLModel):
+    line: int
+    sku: Optional[str] = None
+    error: str
+
+
+class CatalogImportReport(SQLModel):
+    rows: int = 0
+    imported: int = 0
+    superseded: int = 0  # Valid rows replaced by a later row for the same sku in the same chunk
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
+
+class ProductBulkUpdateItem(SQLModel):
+    """New price and/or stock for one product; stock sets the level, stock_delta adjusts it."""
+    product_id: int
+    price: Optional[Money] = Field(default=None, gt=0)
+    stock: Optional[int] = Field(default=None, ge=0)
+    stock_delta: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.stock is not None and self.stock_delta is not None:
+            raise ValueError("Give either stock or stock_delta, not both")
+        if self.price is None and self.stock is None and self.stock_delta is None:
+            raise ValueError("Nothing to update; give price, stock or stock_delta")
+        return self
+
+
+class ProductBulkUpdate(SQLModel):
+    updates: List[ProductBulkUpdateItem] = Field(min_length=1, max_length=1000)
+
+
+class ProductUpdateResult(SQLModel):
+    product_id: int
+    status: str  # "updated", "not_found" or "insufficient_stock"
+    price: Optional[Money] = None
+    stock: Optional[int] = None
+
+
+class ProductBulkUpdateReport(SQLModel):
+    updated: int = 0
+    failed: int = 0
+    results: List[ProductUpdateResult] = []
+
+
+class CategoryReprice(SQLModel):
+    percent: Decimal = Field(gt=-100, le=1000, max_digits=6, decimal_places=2)  # e.g. 10 or -15.5
+
+
+class CategoryRepriceResult(SQLModel):
+    category_id: int
+    percent: float
+    updated: int
+
+
+# Prices and the order total are taken from the catalog at checkout
 class OrderItemCreate(SQLModel):
     product_id: int
-    quantity: int
-    price_at_purchase: float
+    quantity: int = Field(gt=0)
 
 
 class OrderCreate(SQLModel):
     order_items: List[OrderItemCreate]
-    total_amount: float
-    status: str = "pending"
     sale_source: str = "online"
 
 
 class OrderRead(SQLModel):
     order_id: int
     user_id: int
-    total_amount: float
+    total_amount: Money
     status: str
     created_at: datetime
     updated_at: datetime
@@ -112,20 +227,69 @@ class OrderRead(SQLModel):
 class PaymentCreate(SQLModel):
     order_id: int
     payment_method: str
-    amount: float
+    amount: Money = Field(gt=0)
 
 
 class PaymentRead(SQLModel):
     payment_id: int
     order_id: int
     payment_method: str
-    amount: float
+    amount: Money
     status: str
     created_at: datetime
 
 
+class OrderItemRead(SQLModel):
+    order_item_id: int
+    product_id: int
+    quantity: int
+    price_at_purchase: Money
+
+
+class OrderDetailRead(OrderRead):
+    sale_source: str
+    order_items: List[OrderItemRead] = []
+    payments: List[PaymentRead] = []
+
+
+class OrderPage(SQLModel):
+    items: List[OrderDetailRead]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
 
 
+# Sales analytics (admin)
+class SalesFigures(SQLModel):
+    orders: int
+    units: int
+    revenue: MoneyTotal
+    average_order_value: MoneyTotal
+
+
+class SalesPeriod(SalesFigures):
+    period: date  # The day, or the Monday starting the week
+
+
+class SaleSourceSales(SalesFigures):
+    sale_source: str
+
+
+class CategorySales(SalesFigures):
+    category_id: int
+    name: Optional[str] = None
+
+
+class ProductSales(SalesFigures):
+    product_id: int
+    name: Optional[str] = None
+    category_id: int
+
 
+class AnalyticsRefreshReport(SQLModel):
+    days: int  # Days whose rollup rows were rebuilt
+    watermark: Optional[datetime] = None
+    seconds: float
 
 
+class AnalyticsStatus(SQLModel):
+    watermark: Optional[datetime] = None  # Orders updated up to here are in the rollups
+    refreshed_at: Optional[datetime] = None
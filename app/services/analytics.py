@@ -0,0 +1,334 @@
+"""
+Sales analytics over incrementally maintained daily rollups.
+
+Three rollup tables hold revenue, units and order counts per day: by
+sale_source (SalesDaily), by category and sale_source (CategorySalesDaily)
+and by product (ProductSalesDaily). The admin endpoints only read these,
+so dashboards never scan order or orderitem.
+
+refresh() keeps them current without rescanning history. Payments that
+settle an order call schedule_refresh(), which queues one delayed refresh
+job for a burst of writes (see app/services/jobs.py). A watermark records
+the Order.updated_at up to which changes have been folded in; each run
+collects the days of orders updated since then and rebuilds just those days
+from the raw tables. Rebuilding a whole day is idempotent, so a day touched
+twice is simply recomputed. The watermark stops ANALYTICS_REFRESH_LAG
+seconds short of the database clock, so writes that are still in flight when
+a refresh runs are picked up by the next one rather than skipped.
+
+Orders count from their creation day (UTC) once they are settled: in a
+status only the server sets after payment (SETTLED_ORDER_STATUSES) and
+holding at least one completed payment. Lines are attributed to the
+product's category at refresh time; run a full refresh after moving
+products between categories to restate history.
+
+Command line:
+
+    python -m app.services.analytics [--full]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import Date, cast, delete, distinct, func, insert, literal_column, select as core_select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.db.models import (
+    AnalyticsWatermark, Category, CategorySalesDaily, Order, OrderItem, Payment, Product, ProductSalesDaily,
+    SalesDaily,
+)
+from app.routers.schemas import (
+    AnalyticsRefreshReport, AnalyticsStatus, CategorySales, ProductSales, SaleSourceSales, SalesPeriod,
+)
+from app.services import jobs
+
+# Seconds the watermark trails the database clock, to cover write transactions
+# still in flight. At least one, as the watermark is kept to whole seconds.
+ANALYTICS_REFRESH_LAG = max(1, int(os.getenv("ANALYTICS_REFRESH_LAG", "60")))
+# Default report window when no start date is given
+ANALYTICS_DEFAULT_DAYS = 30
+MAX_TOP_PRODUCTS = 100
+
+# Orders count as sales only in these states, all set by the server once paid
+SETTLED_ORDER_STATUSES = ("paid", "shipped")
+INTERVALS = ("day", "week")
+
+WATERMARK = "sales"
+REFRESH_JOB = "analytics.refresh"
+ROLLUPS = (SalesDaily, CategorySalesDaily, ProductSalesDaily)
+CENT = Decimal("0.01")
+
+
+def _day(db: Session):
+    """Order.created_at as a UTC calendar date, in the database's dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        # A literal rather than a bound 'UTC', so GROUP BY matches the selected expression
+        return cast(func.timezone(literal_column("'UTC'"), Order.created_at), Date)
+    return func.date(Order.created_at)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes, which are UTC here
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _runs(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Collapses dates into (first, last) runs of consecutive days."""
+    runs: List[List[date]] = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(first, last) for first, last in runs]
+
+
+def _midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _lock_watermark(db: Session) -> AnalyticsWatermark:
+    """Loads the watermark row FOR UPDATE, so concurrent refreshes run one after another."""
+    mark = db.get(AnalyticsWatermark, WATERMARK, with_for_update=True)
+    if mark is not None:
+        return mark
+    try:
+        with db.begin_nested():
+            db.add(AnalyticsWatermark(name=WATERMARK))
+    except IntegrityError:
+        pass  # Created by a concurrent first refresh
+    return db.get(AnalyticsWatermark, WATERMARK, with_for_update=True, populate_existing=True)
+
+
+def _rebuild(db: Session, first: date, last: date) -> None:
+    """Replaces the rollup rows of days first..last with fresh aggregates of the raw tables."""
+    for model in ROLLUPS:
+        db.exec(delete(model).where(model.day.between(first, last)))
+
+    day = _day(db)
+    lines = (
+        core_select()
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.order_id)
+        .where(
+            Order.created_at >= _midnight(first),
+            Order.created_at < _midnight(last + timedelta(days=1)),
+            Order.status.in_(SETTLED_ORDER_STATUSES),
+            core_select(Payment.payment_id)
+            .where(Payment.order_id == Order.order_id, Payment.status == "completed")
+            .exists(),
+        )
+    )
+    figures = (
+        func.count(distinct(Order.order_id)),
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.price_at_purchase),
+    )
+    by_category = lines.join(Product, Product.product_id == OrderItem.product_id)
+
+    db.exec(insert(SalesDaily).from_select(
+        ["day", "sale_source", "orders", "units", "revenue"],
+        lines.add_columns(day, Order.sale_source, *figures).group_by(day, Order.sale_source),
+    ))
+    db.exec(insert(CategorySalesDaily).from_select(
+        ["day", "category_id", "sale_source", "orders", "units", "revenue"],
+        by_category.add_columns(day, Product.category_id, Order.sale_source, *figures)
+        .group_by(day, Product.category_id, Order.sale_source),
+    ))
+    db.exec(insert(ProductSalesDaily).from_select(
+        ["day", "product_id", "category_id", "orders", "units", "revenue"],
+        by_category.add_columns(day, OrderItem.product_id, Product.category_id, *figures)
+        .group_by(day, OrderItem.product_id, Product.category_id),
+    ))
+
+
+def refresh(db: Session, full: bool = False) -> AnalyticsRefreshReport:
+    """Folds orders changed since the watermark into the rollups (all orders when full or on the first run)."""
+    started = time.perf_counter()
+    mark = _lock_watermark(db)
+    now = _utc(db.exec(select(func.now())).one())
+    # Whole seconds, since SQLite's CURRENT_TIMESTAMP has no fraction to compare against
+    upper = (now - timedelta(seconds=ANALYTICS_REFRESH_LAG)).replace(microsecond=0)
+
+    changed = select(_day(db)).distinct()
+    if not full and mark.value is not None:
+        changed = changed.where(Order.updated_at > mark.value, Order.updated_at <= upper)
+    days = [_as_date(day) for day in db.exec(changed).all()]
+    for first, last in _runs(days):
+        _rebuild(db, first, last)
+
+    mark.value = upper
+    mark.refreshed_at = now
+    db.commit()
+    return AnalyticsRefreshReport(days=len(days), watermark=upper, seconds=round(time.perf_counter() - started, 3))
+
+
+def schedule_refresh(db: Session) -> None:
+    """Queues a refresh in the caller's transaction, due once the write is past the lag."""
+    jobs.enqueue(db, REFRESH_JOB, delay=ANALYTICS_REFRESH_LAG + 1, key=REFRESH_JOB)
+
+
+@jobs.handler(REFRESH_JOB)
+def _refresh_job(db: Session, payload: dict) -> None:
+    report = refresh(db, full=payload.get("full", False))
+    # Writes made while this job was queued did not queue another one; if some
+    # are still newer than the watermark, follow up once they are past the lag
+    if db.exec(select(Order.order_id).where(Order.updated_at > report.watermark).limit(1)).first() is not None:
+        schedule_refresh(db)
+        db.commit()
+
+
+def status(db: Session) -> AnalyticsStatus:
+    mark = db.get(AnalyticsWatermark, WATERMARK)
+    if mark is None:
+        return AnalyticsStatus()
+    return AnalyticsStatus(watermark=_utc(mark.value), refreshed_at=_utc(mark.refreshed_at))
+
+
+def _window(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+def _figures(orders: int, units: int, revenue) -> dict:
+    revenue = Decimal(revenue or 0).quantize(CENT)
+    return {
+        "orders": orders or 0,
+        "units": units or 0,
+        "revenue": revenue,
+        "average_order_value": (revenue / orders).quantize(CENT) if orders else Decimal(0),
+    }
+
+
+def _totals(model):
+    return (
+        func.sum(model.orders).label("orders"),
+        func.sum(model.units).label("units"),
+        func.sum(model.revenue).label("revenue"),
+    )
+
+
+def sales_over_time(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: str = "day",
+    sale_source: Optional[str] = None,
+) -> List[SalesPeriod]:
+    """Revenue, units, orders and AOV per day or ISO week (weeks start on Monday)."""
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail="interval must be day or week")
+    start, end = _window(start, end)
+    query = select(SalesDaily.day, *_totals(SalesDaily)).where(SalesDaily.day.between(start, end))
+    if sale_source is not None:
+        query = query.where(SalesDaily.sale_source == sale_source)
+
+    periods: Dict[date, List] = defaultdict(lambda: [0, 0, Decimal(0)])
+    for day, orders, units, revenue in db.exec(query.group_by(SalesDaily.day)).all():
+        day = _as_date(day)
+        period = day - timedelta(days=day.weekday()) if interval == "week" else day
+        totals = periods[period]
+        totals[0] += orders
+        totals[1] += units
+        totals[2] += Decimal(revenue)
+    return [SalesPeriod(period=period, **_figures(*periods[period])) for period in sorted(periods)]
+
+
+def sales_by_source(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> List[SaleSourceSales]:
+    start, end = _window(start, end)
+    rows = db.exec(
+        select(SalesDaily.sale_source, *_totals(SalesDaily))
+        .where(SalesDaily.day.between(start, end))
+        .group_by(SalesDaily.sale_source)
+        .order_by(func.sum(SalesDaily.revenue).desc())
+    ).all()
+    return [SaleSourceSales(sale_source=source, **_figures(orders, units, revenue)) for source, orders, units, revenue in rows]
+
+
+def sales_by_category(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sale_source: Optional[str] = None,
+) -> List[CategorySales]:
+    start, end = _window(start, end)
+    totals = (
+        select(CategorySalesDaily.category_id, *_totals(CategorySalesDaily))
+        .where(CategorySalesDaily.day.between(start, end))
+        .group_by(CategorySalesDaily.category_id)
+    )
+    if sale_source is not None:
+        totals = totals.where(CategorySalesDaily.sale_source == sale_source)
+    totals = totals.subquery()
+    rows = db.exec(
+        select(totals.c.category_id, Category.name, totals.c.orders, totals.c.units, totals.c.revenue)
+        .outerjoin(Category, Category.category_id == totals.c.category_id)
+        .order_by(totals.c.revenue.desc())
+    ).all()
+    return [
+        CategorySales(category_id=category_id, name=name, **_figures(orders, units, revenue))
+        for category_id, name, orders, units, revenue in rows
+    ]
+
+
+def top_products(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category_id: Optional[int] = None,
+    limit: int = 10,
+    by: str = "revenue",
+) -> List[ProductSales]:
+    """Best sellers over the window, ranked by revenue or units."""
+    if by not in ("revenue", "units"):
+        raise HTTPException(status_code=400, detail="by must be revenue or units")
+    start, end = _window(start, end)
+    totals = (
+        select(ProductSalesDaily.product_id, ProductSalesDaily.category_id, *_totals(ProductSalesDaily))
+        .where(ProductSalesDaily.day.between(start, end))
+        .group_by(ProductSalesDaily.product_id, ProductSalesDaily.category_id)
+    )
+    if category_id is not None:
+        totals = totals.where(ProductSalesDaily.category_id == category_id)
+    rank = func.sum(getattr(ProductSalesDaily, by))
+    totals = totals.order_by(rank.desc(), ProductSalesDaily.product_id).limit(min(limit, MAX_TOP_PRODUCTS)).subquery()
+    rows = db.exec(
+        select(totals.c.product_id, Product.name, totals.c.category_id, totals.c.orders, totals.c.units, totals.c.revenue)
+        .outerjoin(Product, Product.product_id == totals.c.product_id)
+        .order_by(getattr(totals.c, by).desc(), totals.c.product_id)
+    ).all()
+    return [
+        ProductSales(product_id=product_id, name=name, category_id=category, **_figures(orders, units, revenue))
+        for product_id, name, category, orders, units, revenue in rows
+    ]
+
+
+def main(argv=None) -> int:
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Fold new and changed orders into the sales rollups.")
+    parser.add_argument("--full", action="store_true", help="rebuild every day instead of the changes since the watermark")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        report = refresh(db, full=args.full)
+    print(f"days={report.days} watermark={report.watermark.isoformat()} seconds={report.seconds}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
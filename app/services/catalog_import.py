@@ -0,0 +1,204 @@
+"""
+Bulk catalog import from CSV or NDJSON.
+
+Rows are parsed one at a time from a file object, validated, and upserted
+on Product.sku in multi-row INSERT ... ON CONFLICT statements of
+CATALOG_IMPORT_CHUNK_SIZE rows, one transaction per chunk, so memory stays
+bounded by the chunk size whatever the feed size. Categories are resolved
+from a map loaded once up front.
+
+Command line:
+
+    python -m app.services.catalog_import feed.csv [--format ndjson] [--chunk-size 2000]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from app.db.models import Category, Product
+from app.routers.schemas import CatalogImportReport, ImportRowError, ProductImportRow
+from app.services.cache import invalidate_catalog
+
+CATALOG_IMPORT_CHUNK_SIZE = int(os.getenv("CATALOG_IMPORT_CHUNK_SIZE", "1000"))
+# Only the first errors are reported back; the counts stay exact
+CATALOG_IMPORT_MAX_ERRORS = int(os.getenv("CATALOG_IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+# Columns overwritten when a sku already exists
+_UPDATE_COLUMNS = ("name", "description", "price", "stock", "category_id")
+
+
+def iter_rows(text: IO[str], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yields (line number, raw row or None, parse error or None) one row at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Empty cells mean "not provided", like a missing JSON key
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}, None
+    elif fmt == "ndjson":
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f"Unsupported import format {fmt!r}; expected one of {FORMATS}")
+
+
+def _upsert(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Bulk import does not support the {dialect_name} dialect")
+
+
+class CatalogImporter:
+    """Validates rows and writes them in chunks; call finish() once all rows are added, or close() if adding fails."""
+
+    def __init__(self, db: Session, chunk_size: int = CATALOG_IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.report = CatalogImportReport()
+        self._insert = _upsert(db.get_bind().dialect.name)
+        # sku -> (line, values); a sku repeated within one chunk keeps its last row
+        self._pending: Dict[str, Tuple[int, dict]] = {}
+
+        categories = db.exec(select(Category.category_id, Category.name)).all()
+        self._category_ids = {category_id for category_id, _ in categories}
+        self._category_by_name = {name.lower(): category_id for category_id, name in categories}
+
+    def _fail(self, line: int, sku: Optional[str], error: str) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < CATALOG_IMPORT_MAX_ERRORS:
+            self.report.errors.append(ImportRowError(line=line, sku=sku, error=error))
+        else:
+            self.report.errors_truncated = True
+
+    def add(self, line: int, raw: Optional[dict], parse_error: Optional[str] = None) -> None:
+        self.report.rows += 1
+        if parse_error is not None:
+            self._fail(line, None, parse_error)
+            return
+        sku = raw.get("sku")
+        try:
+            row = ProductImportRow.model_validate(raw)
+        except ValidationError as exc:
+            error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            self._fail(line, sku, error)
+            return
+
+        if row.category_id is not None:
+            category_id = row.category_id if row.category_id in self._category_ids else None
+        elif row.category:
+            category_id = self._category_by_name.get(row.category.lower())
+        else:
+            self._fail(line, row.sku, "category_id or category is required")
+            return
+        if category_id is None:
+            self._fail(line, row.sku, "Category not found")
+            return
+
+        if row.sku in self._pending:
+            # The earlier row is never written, so it is not counted as imported
+            self.report.superseded += 1
+        self._pending[row.sku] = (line, {
+            "sku": row.sku,
+            "name": row.name,
+            "description": row.description,
+            "price": row.price,
+            "stock": row.stock,
+            "category_id": category_id,
+        })
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Upserts the buffered rows in one multi-row statement and commits them."""
+        if not self._pending:
+            return
+        values: List[dict] = [row for _, row in self._pending.values()]
+        statement = self._insert(Product).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["sku"],
+            set_={
+                **{column: getattr(statement.excluded, column) for column in _UPDATE_COLUMNS},
+                "updated_at": func.now(),
+            },
+        )
+        self.db.exec(statement)
+        self.db.commit()
+        self.report.imported += len(self._pending)
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Drops cached catalog pages if any chunk was committed."""
+        if self.report.imported:
+            invalidate_catalog()
+
+    def finish(self) -> CatalogImportReport:
+        try:
+            self.flush()
+        finally:
+            self.close()
+        return self.report
+
+
+def import_catalog(db: Session, text: IO[str], fmt: str, chunk_size: int = CATALOG_IMPORT_CHUNK_SIZE) -> CatalogImportReport:
+    """Imports every row of a text stream and returns the per-row report."""
+    importer = CatalogImporter(db, chunk_size)
+    try:
+        for line, raw, error in iter_rows(text, fmt):
+            importer.add(line, raw, error)
+        importer.flush()
+    finally:
+        # Chunks committed before a failure are live, so cached pages must go either way
+        importer.close()
+    return importer.report
+
+
+def import_catalog_file(db: Session, binary: IO[bytes], fmt: str, chunk_size: int = CATALOG_IMPORT_CHUNK_SIZE) -> CatalogImportReport:
+    """Same as import_catalog for a binary file object such as an upload."""
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    try:
+        return import_catalog(db, text, fmt, chunk_size)
+    finally:
+        text.detach()
+
+
+def main(argv=None) -> int:
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import products from a CSV or NDJSON file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CATALOG_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    with SessionLocal() as db, open(args.path, "rb") as binary:
+        report = import_catalog_file(db, binary, fmt, args.chunk_size)
+
+    print(f"rows={report.rows} imported={report.imported} superseded={report.superseded} failed={report.failed}")
+    for error in report.errors:
+        print(f"  line {error.line} sku={error.sku}: {error.error}", file=sys.stderr)
+    return 0 if report.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
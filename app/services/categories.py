@@ -0,0 +1,58 @@
+from typing import List
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from app.db.models import Category
+from app.routers.schemas import CategoryCreate, CategoryBase, CategoryRead
+from app.services.cache import invalidate_catalog
+from app.services.http_cache import Rendered, cached_render
+
+
+def create_category(db: Session, category: CategoryCreate) -> Category:
+    # Ensure the category name is unique
+    existing_category = db.exec(select(Category).where(Category.name == category.name)).first()
+    if existing_category:
+        raise HTTPException(status_code=400, detail="Category already exists")
+
+    new_category = Category(**category.model_dump())
+    db.add(new_category)
+    db.commit()
+    invalidate_catalog()
+    db.refresh(new_category)
+    return new_category
+
+
+def list_categories(db: Session) -> Rendered:
+    return cached_render(("categories",), lambda: db.exec(select(Category)).all(), List[CategoryRead])
+
+
+def get_category(db: Session, category_id: int) -> Rendered:
+    def load():
+        category = db.get(Category, category_id)
+        if not category:
+            raise HTTPException(status_code=404, detail="Category not found")
+        return category
+
+    return cached_render(("category", category_id), load, CategoryRead)
+
+
+def update_category(db: Session, category_id: int, category_update: CategoryBase) -> Category:
+    category = db.get(Category, category_id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    # Update only the provided fields
+    category_data = category_update.model_dump(exclude_unset=True)
+    for key, value in category_data.items():
+        setattr(category, key, value)
+
+    # Ensure the new name is unique if it's being updated
+    if "name" in category_data:
+        existing_category = db.exec(select(Category).where(Category.name == category.name, Category.category_id != category_id)).first()
+        if existing_category:
+            raise HTTPException(status_code=400, detail="Category name already exists")
+
+    db.add(category)
+    db.commit()
+    invalidate_catalog()
+    db.refresh(category)
+    return category
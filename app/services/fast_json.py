@@ -0,0 +1,70 @@
+"""
+Opt-in fast serialization for list endpoints (FAST_JSON=true).
+
+The default path loads ORM objects, validates each one into its response
+schema and lets FastAPI encode the result. In fast mode the list routes
+select only the schema's columns, turn the row tuples into plain dicts and
+encode them with orjson, skipping per-object validation. That is safe
+because the rows come straight from our own tables, whose columns already
+have the schema's types. The output is the same JSON as the default path:
+money as numbers, datetimes in ISO 8601.
+
+orjson is optional; without it the stdlib encoder is used, which still
+skips validation but encodes more slowly.
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Read from the environment once, at import. Callers test fast_json.FAST_JSON
+# (not a copy) on each request, so code such as the serialization benchmark can
+# flip the attribute at runtime; changing the variable needs a restart.
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        # OPT_UTC_Z writes UTC offsets as "Z", as pydantic does
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
+
+
+def schema_columns(model: Any, entity: Any, exclude: Sequence[str] = ()) -> List[Any]:
+    """The entity columns matching a response schema's fields, in the schema's order."""
+    return [getattr(entity, name) for name in model.model_fields if name not in exclude]
+
+
+def as_dicts(result) -> List[dict]:
+    """Turns a column result into a list of dicts keyed by column name."""
+    names = list(result.keys())
+    return [dict(zip(names, row)) for row in result]
+
+
+def group_by(rows: Iterable[dict], key: str) -> dict:
+    """Groups child rows by a parent id, dropping the id from each row."""
+    groups: dict = {}
+    for row in rows:
+        groups.setdefault(row.pop(key), []).append(row)
+    return groups
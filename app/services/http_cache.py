@@ -0,0 +1,73 @@
+"""
+Pre-rendered catalog responses with ETags for conditional GETs.
+
+Catalog reads are cached as the JSON bytes they are served as, together
+with a weak ETag hashed from those bytes. A revalidation whose
+If-None-Match matches is answered with 304 straight from the cache, and a
+plain GET skips both the query and the serialization. Hashing the body
+rather than numbering versions per worker gives every worker the same ETag
+for the same content, so revalidations stay cheap behind a load balancer.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Hashable, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+from app.services import fast_json
+from app.services.cache import catalog_cache
+
+# Sent with every public catalog response (200 and 304); set to "no-cache"
+# to make clients revalidate each time, or raise max-age behind a CDN.
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=30, stale-while-revalidate=30")
+
+
+@dataclass(frozen=True)
+class Rendered:
+    body: bytes
+    etag: str
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def _rendered(body: bytes) -> Rendered:
+    return Rendered(body=body, etag=f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+
+
+def render(value: Any, model: Any) -> Rendered:
+    """Validates value (ORM rows included) against model and renders it as JSON."""
+    adapter = _adapter(model)
+    return _rendered(adapter.dump_json(adapter.validate_python(value, from_attributes=True)))
+
+
+def cached_render(key: Hashable, loader: Callable[[], Any], model: Any) -> Rendered:
+    """Returns the rendered response for key, loading and rendering it on a cache miss."""
+    return catalog_cache.get_or_load(key, lambda: render(loader(), model))
+
+
+def cached_json(key: Hashable, loader: Callable[[], Any]) -> Rendered:
+    """Like cached_render for plain dicts and lists that need no validation (FAST_JSON)."""
+    return catalog_cache.get_or_load(key, lambda: _rendered(fast_json.dumps(loader())))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def conditional_response(
+    rendered: Rendered, if_none_match: Optional[str], cache_control: str = CATALOG_CACHE_CONTROL
+) -> Response:
+    headers = {"ETag": rendered.etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
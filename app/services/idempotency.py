@@ -0,0 +1,172 @@
+"""
+Idempotency-Key support for POST /orders and POST /payments.
+
+The first successful response for a (user, scope, key) is stored in the
+same transaction as the write it describes, so a retry either finds it and
+gets it replayed or, if it races the original, fails on the unique
+constraint and replays the winner's response. Recent keys are also kept
+in a per-worker front cache so retry storms do not reach the database.
+"""
+import hashlib
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Type, TypeVar
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, select
+from app.db.models import IdempotencyKey
+from app.services.cache import TTLCache
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "300"))
+
+# (user_id, scope, key) -> (request_hash, status_code, response_body)
+_recent = TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL)
+
+ResponseModel = TypeVar("ResponseModel", bound=SQLModel)
+
+
+@dataclass
+class IdempotencyRequest:
+    key: str
+    user_id: int
+    scope: str
+    request_hash: str
+    replayed: bool = False
+    # (status_code, body) recorded in the open transaction, cached once it commits
+    pending: Optional[tuple] = None
+
+    @property
+    def cache_key(self):
+        return self.user_id, self.scope, self.key
+
+
+def from_header(key: Optional[str], user_id: int, scope: str, payload: SQLModel) -> Optional[IdempotencyRequest]:
+    """Builds the request context from the Idempotency-Key header, if one was sent."""
+    if key is None:
+        return None
+    if not 0 < len(key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    return IdempotencyRequest(key=key, user_id=user_id, scope=scope, request_hash=request_hash)
+
+
+def mark_replayed(response, request: Optional[IdempotencyRequest]) -> None:
+    """Flags replayed responses with an Idempotent-Replayed header."""
+    if request is not None and request.replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+
+
+def _replay(request: IdempotencyRequest, request_hash: str, body: str, model: Type[ResponseModel]) -> ResponseModel:
+    if request_hash != request.request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    request.replayed = True
+    return model.model_validate_json(body)
+
+
+def stored_response(db: Session, request: Optional[IdempotencyRequest], model: Type[ResponseModel]) -> Optional[ResponseModel]:
+    """
+    Returns the stored response for a repeated key, or None if the request
+    has to be executed. An expired record is deleted so the key can be reused.
+    """
+    if request is None:
+        return None
+    cached = _recent.get(request.cache_key)
+    if cached is not None:
+        request_hash, _, body = cached
+        return _replay(request, request_hash, body, model)
+
+    record = db.exec(select(IdempotencyKey).where(
+        IdempotencyKey.user_id == request.user_id,
+        IdempotencyKey.scope == request.scope,
+        IdempotencyKey.key == request.key,
+    )).first()
+    if record is None:
+        return None
+    if _as_utc(record.expires_at) <= datetime.now(timezone.utc):
+        db.delete(record)
+        db.flush()
+        return None
+    _recent.set(request.cache_key, (record.request_hash, record.status_code, record.response_body))
+    return _replay(request, record.request_hash, record.response_body, model)
+
+
+def record(db: Session, request: Optional[IdempotencyRequest], status_code: int, response: SQLModel) -> None:
+    """Adds the response to the caller's transaction; it becomes visible when that commits."""
+    if request is None:
+        return
+    body = response.model_dump_json()
+    db.add(IdempotencyKey(
+        user_id=request.user_id,
+        scope=request.scope,
+        key=request.key,
+        request_hash=request.request_hash,
+        status_code=status_code,
+        response_body=body,
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+    ))
+    request.pending = (status_code, body)
+
+
+def commit(db: Session, request: Optional[IdempotencyRequest], model: Type[ResponseModel]) -> Optional[ResponseModel]:
+    """
+    Commits the caller's transaction. If a concurrent request with the same
+    key committed first, everything is rolled back and that request's
+    response is returned for replay instead.
+    """
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if request is None:
+            raise
+        replay = stored_response(db, request, model)
+        if replay is None:
+            raise
+        return replay
+    if request is not None and request.pending is not None:
+        status_code, body = request.pending
+        _recent.set(request.cache_key, (request.request_hash, status_code, body))
+    return None
+
+
+def purge_expired(db: Session, batch_size: int = 1000) -> int:
+    """Deletes expired records in batches and returns how many were removed."""
+    removed = 0
+    while True:
+        ids = db.exec(
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return removed
+        db.exec(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+        db.commit()
+        removed += len(ids)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def main(argv=None) -> int:
+    """python -m app.services.idempotency purge"""
+    from app.db.database import SessionLocal
+
+    args = sys.argv[1:] if argv is None else argv
+    if args[:1] != ["purge"]:
+        print(main.__doc__)
+        return 2
+    with SessionLocal() as db:
+        print(f"Purged {purge_expired(db)} expired idempotency keys")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
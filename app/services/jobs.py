@@ -0,0 +1,365 @@
+"""
+Database-backed job queue for work that should not hold up a request.
+
+Request handlers call enqueue() before they commit, so a job row is written
+in the same transaction as the order or payment that caused it: it exists
+exactly when that write does, and the request only pays for one INSERT.
+Workers then claim due jobs, run the registered handler and record the
+outcome:
+
+- success marks the job done;
+- a failure puts it back with exponential backoff (JOB_BACKOFF_SECONDS
+  doubling per attempt, with jitter, capped at JOB_BACKOFF_MAX_SECONDS);
+- after max_attempts failures, or for a kind with no handler, the job is
+  dead: it stays in the table with its last error until requeued.
+
+Delivery is at least once. A worker that dies mid-job leaves it running;
+once its lease (JOB_LEASE_SECONDS) runs out another worker picks it up
+again. Handlers must therefore be idempotent.
+
+On Postgres jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of workers share the table without blocking each other. Every claim
+and outcome update is also guarded by the job's status and attempt count,
+which keeps concurrent workers and stale ones from clobbering each other
+on databases without row locks.
+
+Workers run out of process:
+
+    python -m app.services.jobs worker [--concurrency 4] [--drain]
+    python -m app.services.jobs stats
+    python -m app.services.jobs requeue-dead [--kind analytics.refresh]
+
+or as a thread inside each app process with JOBS_IN_PROCESS=true.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.db.models import Job
+from app.services import metrics
+
+logger = logging.getLogger("app.jobs")
+
+# Jobs run at the same time by one worker (threads)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+# Idle wait between polls for due jobs
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "8"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "3600"))
+# A running job whose worker has been silent this long is handed to another worker
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Run a worker thread inside every app process instead of (or as well as) the CLI worker
+JOBS_IN_PROCESS = os.getenv("JOBS_IN_PROCESS", "false").lower() in ("1", "true", "yes")
+
+STATUSES = ("queued", "running", "done", "dead")
+MAX_ERROR_LENGTH = 2000
+
+Handler = Callable[[Session, dict], None]
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """Registers fn(db, payload) as the handler for jobs of this kind."""
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    delay: float = 0,
+    key: Optional[str] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> None:
+    """
+    Adds a job to the caller's transaction; it becomes visible to workers on commit.
+
+    With a key, nothing is added while a job with the same key is still queued,
+    so a burst of writes schedules one run rather than one per write. That is
+    still a single INSERT: the partial unique index on queued keys turns the
+    duplicate into ON CONFLICT DO NOTHING.
+    """
+    values = dict(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        key=key,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=_now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        db.add(Job(**values))
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.exec(insert(Job).values(**values).on_conflict_do_nothing(
+        index_elements=[Job.key], index_where=Job.status == "queued",
+    ))
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    id: int
+    kind: str
+    payload: str
+    attempts: int
+    max_attempts: int
+
+
+def claim(db: Session, limit: int) -> List[ClaimedJob]:
+    """Marks up to `limit` due jobs (and jobs with expired leases) running and returns them."""
+    now = _now()
+    due = or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS)),
+    )
+    candidates = db.exec(
+        select(Job.id, Job.status, Job.attempts)
+        .where(due)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    claimed = []
+    for job_id, status, attempts in candidates:
+        result = db.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.status == status, Job.attempts == attempts)
+            .values(status="running", attempts=attempts + 1, locked_at=now)
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+    jobs = {}
+    if claimed:
+        jobs = {
+            row[0]: ClaimedJob(*row) for row in db.exec(
+                select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts).where(Job.id.in_(claimed))
+            ).all()
+        }
+    db.commit()
+    # In claim order, so the most overdue jobs start first
+    return [jobs[job_id] for job_id in claimed]
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before the next try after `attempts` failures: doubling, capped, with jitter."""
+    delay = min(JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), JOB_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _finish(db: Session, job: ClaimedJob, **values: Any) -> None:
+    # Guarded by the attempt count: if the lease expired and another worker
+    # re-claimed the job, this stale outcome is dropped
+    db.exec(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "running", Job.attempts == job.attempts)
+        .values(locked_at=None, **values)
+    )
+    db.commit()
+
+
+def execute(session_factory: Callable[[], Session], job: ClaimedJob) -> str:
+    """Runs one claimed job and records the outcome: "done", "retry" or "dead"."""
+    started = time.perf_counter()
+    fn = HANDLERS.get(job.kind)
+    error = None
+    with session_factory() as db:
+        if fn is None:
+            error = f"No handler registered for {job.kind!r}"
+        else:
+            try:
+                fn(db, json.loads(job.payload))
+            except Exception as exc:  # noqa: BLE001 - any failure is retried
+                db.rollback()
+                logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+                error = f"{type(exc).__name__}: {exc}"
+
+        if error is None:
+            outcome = "done"
+            _finish(db, job, status="done", last_error=None)
+        elif fn is not None and job.attempts < job.max_attempts:
+            outcome = "retry"
+            try:
+                _finish(db, job, status="queued", last_error=error[:MAX_ERROR_LENGTH],
+                        run_at=_now() + timedelta(seconds=backoff_seconds(job.attempts)))
+            except IntegrityError:
+                # A job with the same key was queued while this one ran; that run covers it
+                db.rollback()
+                _finish(db, job, status="done", last_error=f"Superseded after: {error}"[:MAX_ERROR_LENGTH])
+        else:
+            outcome = "dead"
+            logger.error("Job %s (%s) is dead after %s attempts: %s", job.id, job.kind, job.attempts, error)
+            _finish(db, job, status="dead", last_error=error[:MAX_ERROR_LENGTH])
+
+    metrics.job_seconds.observe((job.kind,), time.perf_counter() - started)
+    metrics.jobs_total.inc((job.kind, outcome))
+    return outcome
+
+
+class Worker:
+    """Polls for due jobs and runs at most `concurrency` of them at a time on a thread pool."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_seconds: float = JOB_POLL_SECONDS,
+    ):
+        if session_factory is None:
+            from app.db.database import SessionLocal as session_factory
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self, drain: bool = False) -> None:
+        """Works until stop() is called, or with drain=True until no job is due."""
+        running: Set[Future] = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="job") as executor:
+            while not self._stop.is_set():
+                running = {future for future in running if not future.done()}
+                # Only claim what can start now, so queued work is not held under a lease
+                free = self.concurrency - len(running)
+                jobs = []
+                if free:
+                    try:
+                        with self.session_factory() as db:
+                            jobs = claim(db, free)
+                    except Exception:  # noqa: BLE001 - e.g. the database restarting; try again later
+                        logger.exception("Claiming jobs failed")
+                for job in jobs:
+                    running.add(executor.submit(execute, self.session_factory, job))
+                if drain and not jobs and not running:
+                    return
+                if running and (not free or not jobs):
+                    wait(running, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                elif not jobs:
+                    self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        """Runs the worker on a daemon thread (JOBS_IN_PROCESS)."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="job-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops claiming and waits for the jobs in progress to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def stats(db: Session) -> Dict[str, int]:
+    counts = dict(db.exec(select(Job.status, func.count()).group_by(Job.status)).all())
+    return {status: counts.get(status, 0) for status in STATUSES}
+
+
+def requeue(db: Session, job_id: Optional[int] = None, kind: Optional[str] = None) -> int:
+    """
+    Gives dead jobs a fresh set of attempts; returns how many were requeued.
+
+    A keyed job is left dead when a job with its key is already queued (or
+    another dead one with that key is requeued with it), as that run covers it.
+    """
+    dead = select(Job.id, Job.key).where(Job.status == "dead").order_by(Job.id)
+    if job_id is not None:
+        dead = dead.where(Job.id == job_id)
+    if kind is not None:
+        dead = dead.where(Job.kind == kind)
+    rows = db.exec(dead).all()
+    taken = set(db.exec(
+        select(Job.key).where(Job.status == "queued", Job.key.in_({key for _, key in rows if key is not None}))
+    ).all())
+    ids = []
+    for dead_id, key in rows:
+        if key is not None:
+            if key in taken:
+                continue
+            taken.add(key)
+        ids.append(dead_id)
+    if ids:
+        db.exec(
+            update(Job).where(Job.id.in_(ids), Job.status == "dead")
+            .values(status="queued", attempts=0, run_at=_now(), last_error=None)
+        )
+    db.commit()
+    return len(ids)
+
+
+def purge_done(db: Session, older_than_hours: float = 24, batch_size: int = 1000) -> int:
+    """Deletes finished jobs in batches and returns how many were removed."""
+    removed = 0
+    cutoff = _now() - timedelta(hours=older_than_hours)
+    while True:
+        ids = db.exec(
+            select(Job.id).where(Job.status == "done", Job.updated_at <= cutoff).limit(batch_size)
+        ).all()
+        if not ids:
+            return removed
+        db.exec(delete(Job).where(Job.id.in_(ids)))
+        db.commit()
+        removed += len(ids)
+
+
+def main(argv=None) -> int:
+    from app.db.database import SessionLocal
+    # Loading the app imports every service, which registers the handlers on
+    # app.services.jobs (the importable module, not this __main__ copy)
+    import app.main  # noqa: F401
+    from app.services import jobs
+
+    parser = argparse.ArgumentParser(description="Run and inspect background jobs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="run jobs until interrupted")
+    worker.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    worker.add_argument("--drain", action="store_true", help="exit once no job is due")
+    commands.add_parser("stats", help="count jobs per status")
+    requeue_parser = commands.add_parser("requeue-dead", help="retry dead jobs")
+    requeue_parser.add_argument("--id", type=int)
+    requeue_parser.add_argument("--kind")
+    purge_parser = commands.add_parser("purge", help="delete finished jobs")
+    purge_parser.add_argument("--older-than-hours", type=float, default=24)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        try:
+            jobs.Worker(SessionLocal, args.concurrency).run(drain=args.drain)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    with SessionLocal() as db:
+        if args.command == "stats":
+            print(" ".join(f"{status}={count}" for status, count in jobs.stats(db).items()))
+        elif args.command == "requeue-dead":
+            print(f"Requeued {jobs.requeue(db, args.id, args.kind)} dead jobs")
+        else:
+            print(f"Purged {jobs.purge_done(db, args.older_than_hours)} finished jobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
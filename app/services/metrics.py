@@ -0,0 +1,156 @@
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bucket upper bounds in seconds, from sub-millisecond up to the default pool timeout.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Statements per request; the upper buckets are where N+1 queries show up
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """
+    Thread-safe cumulative histogram of durations in seconds.
+
+    Observations are counted into the first bucket whose upper bound they do
+    not exceed; snapshot() reports cumulative counts the way Prometheus does.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[str(bound)] = running
+        running += counts[-1]
+        cumulative["+Inf"] = running
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+
+class LabeledHistograms:
+    """One Histogram per label-value tuple, created on first use."""
+
+    def __init__(self, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values: Tuple[str, ...], amount: float) -> None:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        child.observe(amount)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], Histogram]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class LabeledCounter:
+    """Monotonic counters per label-value tuple."""
+
+    def __init__(self, labels: Sequence[str]):
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+@dataclass
+class RequestStats:
+    """SQL work done on behalf of the current request, filled in by the engine event hooks."""
+    method: str
+    scope: dict = field(repr=False)
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    slow_queries: int = 0
+
+    @property
+    def route(self) -> str:
+        """The matched route template; raw paths would give every id its own series."""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+# Set by the request metrics middleware. Threadpool and greenlet hops copy the
+# context, so the hooks see the same RequestStats object as the middleware.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+request_seconds = LabeledHistograms(("method", "route"))
+request_sql_statements = LabeledHistograms(("method", "route"), STATEMENT_BUCKETS)
+request_db_seconds = LabeledHistograms(("method", "route"))
+requests_total = LabeledCounter(("method", "route", "status"))
+slow_queries_total = LabeledCounter(("route",))
+
+# Background jobs run by this process (outcome: done, retry or dead)
+job_seconds = LabeledHistograms(("kind",))
+jobs_total = LabeledCounter(("kind", "outcome"))
+
+
+# --- Prometheus text exposition format ---------------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_gauge(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, object], float]], kind: str = "gauge") -> str:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return "\n".join(lines)
+
+
+def format_histograms(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, object], Dict]]) -> str:
+    """Renders Histogram.snapshot() results, one series per label set."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, snapshot in samples:
+        for bound, count in snapshot["buckets"].items():
+            bucket_labels = {**labels, "le": bound}
+            lines.append(f"{name}_bucket{_labels(bucket_labels.keys(), bucket_labels.values())} {count}")
+        suffix = _labels(labels.keys(), labels.values())
+        lines.append(f"{name}_sum{suffix} {_number(snapshot['sum'])}")
+        lines.append(f"{name}_count{suffix} {snapshot['count']}")
+    return "\n".join(lines)
+
+
+def labeled_histogram_samples(family: LabeledHistograms):
+    return [(dict(zip(family.labels, values)), histogram.snapshot()) for values, histogram in family.items()]
+
+
+def labeled_counter_samples(family: LabeledCounter):
+    return [(dict(zip(family.labels, values)), value) for values, value in family.items()]
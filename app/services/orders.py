@@ -0,0 +1,302 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, case, delete, func, insert, or_, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from app.db.models import Order, User, Product, OrderItem, Payment
+from app.routers.schemas import (
+    OrderCreate, OrderDetailRead, OrderItemCreate, OrderItemRead, OrderPage, OrderRead, PaymentRead,
+)
+from app.services import analytics, fast_json, webhooks
+from app.services import payments as payment_service
+from app.services import idempotency as idempotency_service
+from app.services.idempotency import IdempotencyRequest
+from app.services.cache import catalog_cache
+from app.services.pagination import encode_cursor, decode_cursor, keyset_key, keyset_value
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _quantities_by_product(items: List[OrderItemCreate]) -> Dict[int, int]:
+    """Sums line quantities per product so repeated lines reserve stock once."""
+    quantities: Dict[int, int] = defaultdict(int)
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    return dict(quantities)
+
+
+def adjust_stock(db: Session, deltas: Dict[int, int]) -> Dict[int, Product]:
+    """
+    Applies per-product stock changes inside the caller's transaction.
+
+    All referenced products are fetched with one IN query that takes row
+    locks in product_id order, so concurrent checkouts lock in the same
+    sequence and cannot deadlock, and the lines are validated in memory.
+    The changes are then written as one UPDATE with a CASE per product that
+    also re-checks stock never goes below zero. A positive delta reserves
+    stock, a negative one releases it. On failure the transaction is rolled
+    back and a 404 or 400 is raised. Returns the locked products by id.
+    """
+    if not deltas:
+        return {}
+
+    product_ids = sorted(deltas)
+    products = {
+        product.product_id: product
+        for product in db.exec(
+            select(Product)
+            .where(Product.product_id.in_(product_ids))
+            .order_by(Product.product_id)
+            .with_for_update()
+        ).all()
+    }
+
+    for product_id in product_ids:
+        product = products.get(product_id)
+        if product is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        if product.stock < deltas[product_id]:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Not enough stock for product {product_id}")
+
+    changed = {product_id: delta for product_id, delta in deltas.items() if delta != 0}
+    if changed:
+        delta = case(changed, value=Product.product_id)
+        result = db.exec(
+            update(Product)
+            .where(Product.product_id.in_(changed), Product.stock - delta >= 0)
+            .values(stock=Product.stock - delta)
+            .execution_options(synchronize_session=False)
+        )
+        # Databases without row locks (SQLite) can still lose a race here; the guard catches it
+        if result.rowcount != len(changed):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Not enough stock for one or more products")
+        # The loaded stock values are now stale; reload them if anything reads them
+        for product_id in changed:
+            db.expire(products[product_id], ["stock"])
+
+    return products
+
+
+def _evict_products(product_ids) -> None:
+    # Stock changed, so drop the cached single-product reads; list pages converge within the TTL
+    for product_id in product_ids:
+        catalog_cache.pop(("product", product_id))
+
+
+def _price_items(items: List[OrderItemCreate], products: Dict[int, Product]):
+    """
+    Prices every line from the locked catalog rows and returns the item rows
+    together with the exact order total.
+    """
+    rows = []
+    total = Decimal("0")
+    for item in items:
+        price = products[item.product_id].price
+        total += price * item.quantity
+        rows.append({"product_id": item.product_id, "quantity": item.quantity, "price_at_purchase": price})
+    return rows, total
+
+
+def _insert_items(db: Session, order_id: int, rows: List[dict]) -> None:
+    """Writes all order lines with a single executemany INSERT."""
+    if not rows:
+        return
+    db.exec(insert(OrderItem), params=[{"order_id": order_id, **row} for row in rows])
+
+
+def create_order(
+    db: Session,
+    order: OrderCreate,
+    current_user: User,
+    idempotency: Optional[IdempotencyRequest] = None,
+) -> OrderRead:
+    # A retry of an already committed checkout gets the original response
+    replay = idempotency_service.stored_response(db, idempotency, OrderRead)
+    if replay is not None:
+        return replay
+
+    if not order.order_items:
+        raise HTTPException(status_code=400, detail="Order must contain at least one item")
+
+    quantities = _quantities_by_product(order.order_items)
+    # Reserve stock first; nothing is written if any line cannot be fulfilled
+    products = adjust_stock(db, quantities)
+    rows, total = _price_items(order.order_items, products)
+
+    new_order = Order(
+        user_id=current_user.user_id,
+        total_amount=total,
+        status="pending",
+        sale_source=order.sale_source
+    )
+    db.add(new_order)
+    db.flush()
+
+    # Add order items
+    _insert_items(db, new_order.order_id, rows)
+
+    # Load the server-side timestamps so the response can be stored with the order
+    db.refresh(new_order)
+    response = OrderRead.model_validate(new_order)
+    idempotency_service.record(db, idempotency, 201, response)
+    # Post-checkout work runs from the job queue once this transaction commits
+    webhooks.order_created(db, new_order.order_id)
+
+    # Order, items, stock reservations and the idempotency record commit together
+    replay = idempotency_service.commit(db, idempotency, OrderRead)
+    if replay is not None:
+        return replay
+    _evict_products(quantities)
+
+    return response
+
+
+def get_order(db: Session, order_id: int, current_user: User) -> Order:
+    order = db.exec(
+        select(Order).where(Order.order_id == order_id)
+    ).first()
+
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    if order.user_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this order")
+
+    return order
+
+
+def _orders_page_query(
+    query, dialect: str, current_user: User, status: Optional[str], cursor: Optional[str], limit: int
+):
+    query = query.where(Order.user_id == current_user.user_id)
+    if status is not None:
+        query = query.where(Order.status == status)
+    created_at = keyset_key(Order.created_at, dialect)
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_created_at = keyset_value(Order.created_at, datetime.fromisoformat(position["created_at"]), dialect)
+            last_id = int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            created_at < last_created_at,
+            and_(created_at == last_created_at, Order.order_id < last_id),
+        ))
+    return query.order_by(created_at.desc(), Order.order_id.desc()).limit(limit + 1)
+
+
+def _orders_cursor(created_at: datetime, order_id: int) -> str:
+    return encode_cursor({"created_at": created_at.isoformat(), "id": order_id})
+
+
+def list_orders(
+    db: Session,
+    current_user: User,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> OrderPage:
+    """
+    Returns one page of the user's order history, newest first, with line
+    items and payments.
+
+    Pages are keyset on (created_at, order_id), which the
+    (user_id, created_at, order_id) index serves directly, and the two
+    collections are fetched with one IN query each, so a page costs three
+    statements however many orders the user has.
+    """
+    query = select(Order).options(selectinload(Order.order_items), selectinload(Order.payments))
+    dialect = db.get_bind().dialect.name
+    orders = db.exec(_orders_page_query(query, dialect, current_user, status, cursor, limit)).all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = _orders_cursor(orders[-1].created_at, orders[-1].order_id)
+
+    return OrderPage.model_validate({"items": orders, "next_cursor": next_cursor})
+
+
+def list_order_rows(
+    db: Session,
+    current_user: User,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """Same page as list_orders, built from column tuples (FAST_JSON)."""
+    columns = fast_json.schema_columns(OrderDetailRead, Order, exclude=("order_items", "payments"))
+    dialect = db.get_bind().dialect.name
+    orders = fast_json.as_dicts(db.exec(_orders_page_query(select(*columns), dialect, current_user, status, cursor, limit)))
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = _orders_cursor(orders[-1]["created_at"], orders[-1]["order_id"])
+
+    order_ids = [order["order_id"] for order in orders]
+    items = payments = {}
+    if order_ids:
+        items = fast_json.group_by(fast_json.as_dicts(db.exec(
+            select(OrderItem.order_id, *fast_json.schema_columns(OrderItemRead, OrderItem))
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.order_item_id)
+        )), "order_id")
+        payments = fast_json.group_by(fast_json.as_dicts(db.exec(
+            select(Payment.order_id.label("parent_id"), *fast_json.schema_columns(PaymentRead, Payment))
+            .where(Payment.order_id.in_(order_ids))
+            .order_by(Payment.payment_id)
+        )), "parent_id")
+    for order in orders:
+        order["order_items"] = items.get(order["order_id"], [])
+        order["payments"] = payments.get(order["order_id"], [])
+    return {"items": orders, "next_cursor": next_cursor}
+
+
+def update_order_items(db: Session, order_id: int, order_items: List[OrderItemCreate], current_user: User) -> None:
+    # Lock the order so concurrent edits cannot both release the same items
+    order = db.get(Order, order_id, with_for_update=True)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    if order.user_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to modify this order")
+
+    # Once paid the items are settled; payments and analytics already count them
+    if order.status != "pending":
+        raise HTTPException(status_code=409, detail="Only pending orders can be modified")
+
+    if not order_items:
+        raise HTTPException(status_code=400, detail="Order must contain at least one item")
+
+    # Release the stock held by the current items and reserve the new ones as one net change
+    deltas = _quantities_by_product(order_items)
+    for item in db.exec(select(OrderItem).where(OrderItem.order_id == order_id)).all():
+        deltas[item.product_id] = deltas.get(item.product_id, 0) - item.quantity
+    products = adjust_stock(db, deltas)
+    rows, total = _price_items(order_items, products)
+
+    # Replace existing order items and re-total the order
+    db.exec(delete(OrderItem).where(OrderItem.order_id == order_id))
+    _insert_items(db, order_id, rows)
+    # Payments are taken under the same order lock, so this sees all of them
+    paid = payment_service.amount_paid(db, order_id)
+    if total < paid:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="New order total is below the amount already paid")
+    order.total_amount = total
+    # Set even when the total is unchanged: the analytics refresh finds edited orders by updated_at
+    order.updated_at = func.now()
+    if paid and total == paid:
+        # The edit brought the total down to exactly what has been paid
+        order.status = "paid"
+        analytics.schedule_refresh(db)
+
+    db.commit()
+    _evict_products(deltas)
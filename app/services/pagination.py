@@ -0,0 +1,46 @@
+import base64
+import json
+from typing import Any, Dict
+from fastapi import HTTPException
+from sqlalchemy import DateTime, func, literal
+
+# SQLite keeps timestamps as text in two shapes, "YYYY-MM-DD HH:MM:SS" from
+# CURRENT_TIMESTAMP defaults and "YYYY-MM-DD HH:MM:SS.ffffff" from bound
+# Python values, which do not compare correctly as strings.
+_SQLITE_TIMESTAMP = "%Y-%m-%d %H:%M:%f"
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Packs the keyset position of the last row into an opaque URL-safe token."""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Reverses encode_cursor, rejecting anything that was not produced by it."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return payload
+
+
+def keyset_key(column, dialect: str):
+    """
+    The expression to order and compare a keyset column by.
+
+    On SQLite timestamps are normalised to one text format (to the
+    millisecond, ties falling to the id tie-breaker); the ORDER BY must use
+    the same expression as the cursor predicate so the two agree.
+    """
+    if dialect == "sqlite" and isinstance(column.type, DateTime):
+        return func.strftime(_SQLITE_TIMESTAMP, column)
+    return column
+
+
+def keyset_value(column, value, dialect: str):
+    """A cursor value bound with the column's type and compared the way keyset_key orders."""
+    return keyset_key(literal(value, column.type), dialect)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from app.services.metrics import Histogram
+
+# bcrypt runs on its own executor so login bursts cannot occupy the request
+# threadpool. "process" spreads hashing across cores; "thread" keeps it in-process.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Operations allowed in flight (running + queued) before callers get a 429
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+
+# Password hashing utility
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+hash_seconds = Histogram()
+verify_seconds = Histogram()
+# Submitted operations not yet finished (running + queued), and 429s so far
+_in_flight = 0
+_rejected = 0
+_load_lock = threading.Lock()
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+
+def _submit(histogram: Histogram, fn, *args) -> Future:
+    """
+    Queues a hashing call, or raises 429 when PASSWORD_HASH_MAX_PENDING
+    operations are already in flight.
+    """
+    global _in_flight, _rejected
+    with _load_lock:
+        admitted = _in_flight < PASSWORD_HASH_MAX_PENDING
+        if admitted:
+            _in_flight += 1
+        else:
+            _rejected += 1
+    if not admitted:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent password operations, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    started = time.perf_counter()
+
+    def done(_):
+        _release()
+        histogram.observe(time.perf_counter() - started)
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(done)
+    return future
+
+
+def _release() -> None:
+    global _in_flight
+    with _load_lock:
+        _in_flight -= 1
+
+
+def hash_password(password: str) -> str:
+    """Hashes a password with bcrypt on the hashing executor."""
+    return _submit(hash_seconds, _hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Checks a password against its bcrypt hash on the hashing executor."""
+    return _submit(verify_seconds, _verify, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(hash_seconds, _hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit(verify_seconds, _verify, plain_password, hashed_password))
+
+
+def stats() -> dict:
+    """Executor configuration, current load and latency histograms (queue wait included)."""
+    with _load_lock:
+        in_flight, rejected = _in_flight, _rejected
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "in_flight": in_flight,
+        # Every worker is busy before anything waits, so the excess is the queue
+        "queued": max(0, in_flight - PASSWORD_HASH_WORKERS),
+        "rejected": rejected,
+        "hash_seconds": hash_seconds.snapshot(),
+        "verify_seconds": verify_seconds.snapshot(),
+    }
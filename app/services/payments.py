@@ -0,0 +1,128 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.db.models import Payment, Order, User
+from app.routers.schemas import PaymentCreate, PaymentRead
+from app.services import analytics, fast_json, webhooks
+from app.services import idempotency as idempotency_service
+from app.services.idempotency import IdempotencyRequest
+
+# Payments in these states no longer count towards the amount paid
+NOT_PAID_STATUSES = ("failed", "refunded")
+PAYMENT_STATUSES = ("pending", "completed", "failed", "refunded")
+# Order states that follow the amount paid; later ones (shipped) are left alone
+PAYABLE_ORDER_STATUSES = ("pending", "paid")
+
+
+def amount_paid(db: Session, order_id: int):
+    """Sums an order's standing payments in SQL instead of loading every row."""
+    return db.exec(
+        select(func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.order_id == order_id, Payment.status.not_in(NOT_PAID_STATUSES))
+    ).one()
+
+
+def create_payment(
+    db: Session,
+    payment: PaymentCreate,
+    current_user: User,
+    idempotency: Optional[IdempotencyRequest] = None,
+) -> PaymentRead:
+    # A retried payment gets the original response instead of a second charge
+    replay = idempotency_service.stored_response(db, idempotency, PaymentRead)
+    if replay is not None:
+        return replay
+
+    # Lock the order row so concurrent partial payments are totalled one at a time
+    order = db.get(Order, payment.order_id, with_for_update=True)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    if order.user_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to pay for this order")
+
+    # Checked under the order lock, so concurrent partial payments cannot overpay together
+    total_paid = amount_paid(db, payment.order_id)
+    if total_paid + payment.amount > order.total_amount:
+        raise HTTPException(status_code=400, detail="Payment amount exceeds the outstanding balance")
+
+    new_payment = Payment(
+        order_id=payment.order_id,
+        payment_method=payment.payment_method,
+        amount=payment.amount,
+        status="completed"  # Assume payment is completed for now
+    )
+
+    _update_order_status(order, total_paid + payment.amount)
+
+    db.add(new_payment)
+    db.flush()
+    db.refresh(new_payment)
+    response = PaymentRead.model_validate(new_payment)
+    idempotency_service.record(db, idempotency, 201, response)
+    # Post-payment work runs from the job queue once this transaction commits
+    webhooks.payment_recorded(db, new_payment.payment_id)
+    if order.status in analytics.SETTLED_ORDER_STATUSES:
+        analytics.schedule_refresh(db)
+
+    replay = idempotency_service.commit(db, idempotency, PaymentRead)
+    if replay is not None:
+        return replay
+
+    return response
+
+
+def list_payments(db: Session, current_user: User):
+    return db.exec(
+        select(Payment).join(Order).where(Order.user_id == current_user.user_id)
+    ).all()
+
+
+def list_payment_rows(db: Session, current_user: User) -> list:
+    """Same rows as list_payments as plain dicts (FAST_JSON)."""
+    return fast_json.as_dicts(db.exec(
+        select(*fast_json.schema_columns(PaymentRead, Payment)).join(Order).where(Order.user_id == current_user.user_id)
+    ))
+
+
+def _update_order_status(order: Order, total_paid) -> None:
+    """Marks a pending order paid once fully paid, and a paid one pending again if it no longer is."""
+    if order.status in PAYABLE_ORDER_STATUSES:
+        order.status = "paid" if total_paid >= order.total_amount else "pending"
+
+
+def update_payment_status(db: Session, payment_id: int, status: str, current_user: User) -> Payment:
+    if status not in PAYMENT_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid payment status")
+
+    payment = db.get(Payment, payment_id)
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found")
+
+    # Same order lock as create_payment, so the balance check below sees every payment
+    order = db.get(Order, payment.order_id, with_for_update=True)
+    if order.user_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this payment")
+    db.refresh(payment)
+
+    total_paid = amount_paid(db, order.order_id)
+    if payment.status in NOT_PAID_STATUSES and status not in NOT_PAID_STATUSES:
+        # The payment counts again, so it must still fit in the outstanding balance
+        if total_paid + payment.amount > order.total_amount:
+            raise HTTPException(status_code=400, detail="Payment amount exceeds the outstanding balance")
+        total_paid += payment.amount
+    elif payment.status not in NOT_PAID_STATUSES and status in NOT_PAID_STATUSES:
+        total_paid -= payment.amount
+
+    was_settled = order.status in analytics.SETTLED_ORDER_STATUSES
+    payment.status = status
+    _update_order_status(order, total_paid)
+    if was_settled or order.status in analytics.SETTLED_ORDER_STATUSES:
+        # Whether the order counts as a sale may have changed; the refresh finds it by updated_at
+        order.updated_at = func.now()
+        analytics.schedule_refresh(db)
+    db.commit()
+    db.refresh(payment)
+
+    return payment
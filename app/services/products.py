@@ -0,0 +1,360 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+from app.db.models import Product, Category
+from app.routers.schemas import (
+    CategoryRead,
+    CategoryReprice,
+    CategoryRepriceResult,
+    ProductBase,
+    ProductBulkUpdate,
+    ProductBulkUpdateReport,
+    ProductCreate,
+    ProductPage,
+    ProductRead,
+    ProductUpdateResult,
+)
+from app.services.cache import invalidate_catalog
+from app.services import fast_json
+from app.services.http_cache import Rendered, cached_json, cached_render
+from app.services.pagination import encode_cursor, decode_cursor, keyset_key, keyset_value
+
+# Columns GET /products can be ordered by; a leading "-" sorts descending.
+# Each one is paired with product_id as tie-breaker so the keyset is unique.
+SORT_COLUMNS = {
+    "product_id": Product.product_id,
+    "price": Product.price,
+    "created_at": Product.created_at,
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _load_product(db: Session, product_id: int) -> Optional[Product]:
+    """Loads a product and its category in one round trip, refreshing any stale copy."""
+    return db.exec(
+        select(Product)
+        .options(joinedload(Product.category))
+        .where(Product.product_id == product_id)
+        .execution_options(populate_existing=True)
+    ).first()
+
+
+def create_product(db: Session, product: ProductCreate) -> Product:
+    # Check if the category exists
+    category = db.exec(select(Category).where(Category.category_id == product.category_id)).first()
+    if not category:
+        raise HTTPException(status_code=400, detail="Category not found")
+
+    new_product = Product(**product.model_dump())
+    db.add(new_product)
+    db.flush()
+    product_id = new_product.product_id  # read before commit expires the instance
+    db.commit()
+    invalidate_catalog()
+    return _load_product(db, product_id)
+
+
+def _parse_sort(sort: str):
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {name}")
+    return name, descending
+
+
+def _cursor_value(name: str, value):
+    try:
+        if name == "created_at":
+            return datetime.fromisoformat(value)
+        number = Decimal(str(value))
+        if not number.is_finite():
+            raise ValueError(value)
+        return number
+    except (TypeError, ValueError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_products(
+    db: Session,
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: bool = False,
+    sort: str = "product_id",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Rendered:
+    """Cached, pre-rendered front for _query_products, keyed by the full set of query parameters."""
+    key = ("products", category_id, min_price, max_price, in_stock, sort, cursor, limit)
+    args = (db, category_id, min_price, max_price, in_stock, sort, cursor, limit)
+    if fast_json.FAST_JSON:
+        return cached_json(key, lambda: _query_product_rows(*args))
+    return cached_render(key, lambda: _query_products(*args), ProductPage)
+
+
+def _page_query(
+    query,
+    dialect: str,
+    category_id: Optional[int],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    in_stock: bool,
+    sort: str,
+    cursor: Optional[str],
+    limit: int,
+):
+    """
+    Applies the filters, the keyset position and the order of one catalog
+    page to a product query.
+
+    The cursor carries the sort key and product_id of the last row served,
+    so each page is an index range scan no matter how deep the client pages.
+    One extra row is fetched to learn whether another page exists.
+    """
+    name, descending = _parse_sort(sort)
+    column = SORT_COLUMNS[name]
+
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if in_stock:
+        query = query.where(Product.stock > 0)
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position.get("sort") != sort or "id" not in position:
+            raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+        try:
+            last_id = int(position["id"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if name == "product_id":
+            query = query.where(Product.product_id < last_id if descending else Product.product_id > last_id)
+        else:
+            last_value = keyset_value(column, _cursor_value(name, position.get("value")), dialect)
+            key = keyset_key(column, dialect)
+            if descending:
+                query = query.where(or_(key < last_value, and_(key == last_value, Product.product_id < last_id)))
+            else:
+                query = query.where(or_(key > last_value, and_(key == last_value, Product.product_id > last_id)))
+
+    key = keyset_key(column, dialect)
+    if descending:
+        query = query.order_by(key.desc(), Product.product_id.desc())
+    else:
+        query = query.order_by(key.asc(), Product.product_id.asc())
+    return query.limit(limit + 1)
+
+
+def _next_cursor(sort: str, last_id: int, last_value) -> str:
+    position = {"sort": sort, "id": last_id}
+    if last_value is not None:
+        position["value"] = last_value.isoformat() if isinstance(last_value, datetime) else str(last_value)
+    return encode_cursor(position)
+
+
+def _query_products(
+    db: Session,
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: bool = False,
+    sort: str = "product_id",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> ProductPage:
+    """Returns one keyset page of the catalog."""
+    name, _ = _parse_sort(sort)
+    # ProductRead nests the category, so load it in the same query instead of once per row
+    query = select(Product).options(joinedload(Product.category))
+    dialect = db.get_bind().dialect.name
+    products = db.exec(_page_query(query, dialect, category_id, min_price, max_price, in_stock, sort, cursor, limit)).all()
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = _next_cursor(sort, last.product_id, getattr(last, name) if name != "product_id" else None)
+
+    return ProductPage.model_validate({"items": products, "next_cursor": next_cursor})
+
+
+def _query_product_rows(
+    db: Session,
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: bool = False,
+    sort: str = "product_id",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """Same page as _query_products, built from column tuples (FAST_JSON)."""
+    name, _ = _parse_sort(sort)
+    product_columns = fast_json.schema_columns(ProductRead, Product, exclude=("category",))
+    category_columns = fast_json.schema_columns(CategoryRead, Category)
+    product_names = [column.key for column in product_columns]
+    category_names = [column.key for column in category_columns]
+    split = len(product_columns)
+
+    query = select(*product_columns, *category_columns, SORT_COLUMNS[name].label("sort_value")).join(
+        Category, Product.category_id == Category.category_id
+    )
+    dialect = db.get_bind().dialect.name
+    rows = db.exec(_page_query(query, dialect, category_id, min_price, max_price, in_stock, sort, cursor, limit)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _next_cursor(sort, last[0], last[-1] if name != "product_id" else None)
+
+    items = []
+    for row in rows:
+        item = dict(zip(product_names, row[:split]))
+        item["category"] = dict(zip(category_names, row[split:-1]))
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_product(db: Session, product_id: int) -> Rendered:
+    def load():
+        product = _load_product(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+
+    return cached_render(("product", product_id), load, ProductRead)
+
+
+def update_product(db: Session, product_id: int, product_update: ProductBase) -> Product:
+    product = db.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # Update only the provided fields
+    product_data = product_update.model_dump(exclude_unset=True)
+    for key, value in product_data.items():
+        setattr(product, key, value)
+
+    # Check if the category exists if it's being updated
+    if "category_id" in product_data:
+        category = db.exec(select(Category).where(Category.category_id == product.category_id)).first()
+        if not category:
+            raise HTTPException(status_code=400, detail="Category not found")
+
+    db.add(product)
+    db.commit()
+    invalidate_catalog()
+    return _load_product(db, product_id)
+
+
+def bulk_update_products(db: Session, batch: ProductBulkUpdate) -> ProductBulkUpdateReport:
+    """
+    Applies many price / stock changes in one transaction.
+
+    The referenced rows are read and locked with one IN query in product_id
+    order (the same order checkout uses), each line is checked in memory,
+    and every valid line is then written by a single UPDATE with one CASE
+    per column. Missing products and stock deltas that would go below zero
+    are reported per id and skipped; the rest commit together.
+    """
+    product_ids = [item.product_id for item in batch.updates]
+    if len(set(product_ids)) != len(product_ids):
+        raise HTTPException(status_code=400, detail="Each product_id may appear only once per batch")
+
+    current = {
+        product_id: (price, stock)
+        for product_id, price, stock in db.exec(
+            select(Product.product_id, Product.price, Product.stock)
+            .where(Product.product_id.in_(product_ids))
+            .order_by(Product.product_id)
+            .with_for_update()
+        ).all()
+    }
+
+    report = ProductBulkUpdateReport()
+    prices: Dict[int, Decimal] = {}
+    stocks: Dict[int, int] = {}
+    stock_deltas: Dict[int, int] = {}
+    for item in batch.updates:
+        if item.product_id not in current:
+            report.results.append(ProductUpdateResult(product_id=item.product_id, status="not_found"))
+            continue
+        price, stock = current[item.product_id]
+        if item.stock_delta is not None and stock + item.stock_delta < 0:
+            report.results.append(ProductUpdateResult(
+                product_id=item.product_id, status="insufficient_stock", price=price, stock=stock,
+            ))
+            continue
+        if item.price is not None:
+            prices[item.product_id] = price = item.price
+        if item.stock is not None:
+            stocks[item.product_id] = stock = item.stock
+        elif item.stock_delta:
+            stock_deltas[item.product_id] = item.stock_delta
+            stock += item.stock_delta
+        report.results.append(ProductUpdateResult(
+            product_id=item.product_id, status="updated", price=price, stock=stock,
+        ))
+
+    report.updated = sum(result.status == "updated" for result in report.results)
+    report.failed = len(report.results) - report.updated
+
+    changed = set(prices) | set(stocks) | set(stock_deltas)
+    if changed:
+        values = {}
+        if prices:
+            values["price"] = case(prices, value=Product.product_id, else_=Product.price)
+        new_stock = Product.stock
+        if stocks:
+            new_stock = case(stocks, value=Product.product_id, else_=Product.stock)
+        if stock_deltas:
+            new_stock = new_stock + case(stock_deltas, value=Product.product_id, else_=0)
+        if stocks or stock_deltas:
+            values["stock"] = new_stock
+        result = db.exec(
+            update(Product)
+            .where(Product.product_id.in_(changed), new_stock >= 0)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        # Databases without row locks (SQLite) can race a checkout here; the guard catches it
+        if result.rowcount != len(changed):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Stock changed during the update; retry the batch")
+        db.commit()
+        invalidate_catalog()
+
+    return report
+
+
+def reprice_category(db: Session, category_id: int, reprice: CategoryReprice) -> CategoryRepriceResult:
+    """
+    Scales every price in a category by a percentage with one UPDATE,
+    rounding to the cent and never going below 0.01.
+    """
+    if db.get(Category, category_id) is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    factor = 1 + reprice.percent / 100
+    new_price = func.round(Product.price * factor, 2)
+    minimum = Decimal("0.01")
+    result = db.exec(
+        update(Product)
+        .where(Product.category_id == category_id)
+        .values(price=case((new_price < minimum, minimum), else_=new_price))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount:
+        invalidate_catalog()
+    return CategoryRepriceResult(category_id=category_id, percent=reprice.percent, updated=result.rowcount)
@@ -0,0 +1,294 @@
+"""
+Product full-text search.
+
+On Postgres the query runs against the product.search_vector column and its
+GIN index (see migration 4): every word of the query is a prefix match and
+hits are ordered by ts_rank. Other databases (the SQLite test setup) use an
+in-process inverted index with the same semantics and the same A/B weights,
+rebuilt whenever the catalog is invalidated.
+
+Facets are counted over all matches: category counts ignore the category
+filter and price buckets ignore the price filters, so a client can show
+the alternatives to the current selection.
+
+Result pages are kept in the catalog cache like the product list pages.
+Admin catalog writes clear them, but checkouts do not, so stock (and the
+in_stock filter) on a cached page can lag by up to CATALOG_CACHE_TTL.
+"""
+import itertools
+import os
+import re
+import threading
+import time
+from bisect import bisect, bisect_left
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import case, func, literal_column
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+from app.db.models import Category, Product
+from app.routers.schemas import CategoryFacet, PriceFacet, ProductSearchHit, ProductSearchPage, SearchFacets
+from app.services.cache import CATALOG_CACHE_TTL, catalog_cache, catalog_version
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Relevance pages are offset based; deep offsets get slower, so they are capped
+MAX_OFFSET = 1000
+MAX_QUERY_WORDS = 10
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+SEARCH_PRICE_FACETS = [Decimal(edge) for edge in os.getenv("SEARCH_PRICE_FACETS", "10,25,50,100,250,500").split(",")]
+
+# ts_rank's default weights for the A (name) and B (description) labels
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def search_products(
+    db: Session,
+    q: str,
+    category_id: Optional[int] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: bool = False,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> ProductSearchPage:
+    """
+    Cached front for the search backends, keyed by the normalized query and
+    filters; stock may be up to CATALOG_CACHE_TTL old (see module docstring).
+    """
+    words = tuple(dict.fromkeys(tokenize(q)))[:MAX_QUERY_WORDS]
+    if not words:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+
+    key = ("search", words, category_id, min_price, max_price, in_stock, offset, limit)
+    backend = _search_postgres if db.get_bind().dialect.name == "postgresql" else _search_index
+    return catalog_cache.get_or_load(
+        key, lambda: backend(db, words, category_id, min_price, max_price, in_stock, offset, limit)
+    )
+
+
+def _price_facets(counts: Dict[int, int]) -> List[PriceFacet]:
+    """Turns per-bucket counts (bucket i is below SEARCH_PRICE_FACETS[i]) into facets."""
+    bounds = [None, *SEARCH_PRICE_FACETS, None]
+    return [
+        PriceFacet(min=bounds[bucket], max=bounds[bucket + 1], count=counts[bucket])
+        for bucket in sorted(counts)
+        if counts[bucket]
+    ]
+
+
+def _hits(products: Iterable[Tuple[Product, float]]) -> List[ProductSearchHit]:
+    return [ProductSearchHit.model_validate(product, update={"score": score}) for product, score in products]
+
+
+# --- Postgres: tsvector column with a GIN index ---------------------------
+
+_TS_CONFIG = literal_column("'simple'::regconfig")
+_SEARCH_VECTOR = literal_column("product.search_vector")
+
+
+def _search_postgres(
+    db: Session,
+    words: Tuple[str, ...],
+    category_id: Optional[int],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    in_stock: bool,
+    offset: int,
+    limit: int,
+) -> ProductSearchPage:
+    # Words only contain letters and digits, so they cannot inject tsquery operators
+    query = func.to_tsquery(_TS_CONFIG, " & ".join(f"{word}:*" for word in words))
+    match = _SEARCH_VECTOR.op("@@")(query)
+    category_filter = [Product.category_id == category_id] if category_id is not None else []
+    price_filters = []
+    if min_price is not None:
+        price_filters.append(Product.price >= min_price)
+    if max_price is not None:
+        price_filters.append(Product.price <= max_price)
+    stock_filter = [Product.stock > 0] if in_stock else []
+    where = [match, *category_filter, *price_filters, *stock_filter]
+
+    total = db.exec(select(func.count()).select_from(Product).where(*where)).one()
+
+    score = func.ts_rank(_SEARCH_VECTOR, query).label("score")
+    rows = db.exec(
+        select(Product, score)
+        .options(joinedload(Product.category))
+        .where(*where)
+        .order_by(score.desc(), Product.product_id)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+
+    count = func.count().label("count")
+    categories = db.exec(
+        select(Category.category_id, Category.name, count)
+        .join(Product, Product.category_id == Category.category_id)
+        .where(match, *price_filters, *stock_filter)
+        .group_by(Category.category_id, Category.name)
+        .order_by(count.desc(), Category.name)
+    ).all()
+
+    bucket = case(
+        *[(Product.price < edge, index) for index, edge in enumerate(SEARCH_PRICE_FACETS)],
+        else_=len(SEARCH_PRICE_FACETS),
+    ).label("bucket")
+    buckets = db.exec(
+        select(bucket, func.count()).where(match, *category_filter, *stock_filter).group_by(bucket)
+    ).all()
+
+    return ProductSearchPage(
+        items=_hits(rows),
+        total=total,
+        offset=offset,
+        limit=limit,
+        facets=SearchFacets(
+            categories=[CategoryFacet(category_id=cid, name=name, count=n) for cid, name, n in categories],
+            prices=_price_facets(dict(buckets)),
+        ),
+    )
+
+
+# --- Fallback: in-process inverted index ----------------------------------
+
+class InvertedIndex:
+    """
+    Maps every word of the product names and descriptions to the products
+    containing it, with the word's weight (name beats description). Terms
+    are kept sorted so a prefix lookup is a bisect plus a short scan.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[int, str, Optional[str]]], version: int):
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for product_id, name, description in documents:
+            for weight, text in ((DESCRIPTION_WEIGHT, description), (NAME_WEIGHT, name)):
+                for term in tokenize(text or ""):
+                    postings[term][product_id] = weight
+        self.postings = dict(postings)
+        self.terms = sorted(self.postings)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def search(self, words: Iterable[str]) -> Dict[int, float]:
+        """Returns {product_id: score} for products matching every word as a prefix."""
+        scores: Optional[Dict[int, float]] = None
+        for word in words:
+            matches: Dict[int, float] = {}
+            start = bisect_left(self.terms, word)
+            for term in itertools.takewhile(lambda t: t.startswith(word), itertools.islice(self.terms, start, None)):
+                for product_id, weight in self.postings[term].items():
+                    if weight > matches.get(product_id, 0):
+                        matches[product_id] = weight
+            if scores is None:
+                scores = matches
+            else:
+                scores = {product_id: scores[product_id] + weight for product_id, weight in matches.items() if product_id in scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+_index: Optional[InvertedIndex] = None
+_index_lock = threading.Lock()
+# Rows per IN (...) query when reading candidate products
+_CHUNK = 500
+
+
+def _current_index(db: Session) -> InvertedIndex:
+    """
+    Returns the index, rebuilding it after a catalog write on this worker or
+    once it is older than the catalog cache TTL (writes made by other workers).
+    """
+    global _index
+    index = _index
+    if index is not None and index.version == catalog_version() and time.monotonic() - index.built_at < CATALOG_CACHE_TTL:
+        return index
+    with _index_lock:
+        index = _index
+        version = catalog_version()
+        if index is None or index.version != version or time.monotonic() - index.built_at >= CATALOG_CACHE_TTL:
+            documents = db.exec(select(Product.product_id, Product.name, Product.description)).all()
+            index = _index = InvertedIndex(documents, version)
+    return index
+
+
+def _search_index(
+    db: Session,
+    words: Tuple[str, ...],
+    category_id: Optional[int],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    in_stock: bool,
+    offset: int,
+    limit: int,
+) -> ProductSearchPage:
+    scores = _current_index(db).search(words)
+
+    # Stock changes without an index rebuild (checkout), so these are read from
+    # the table rather than the index; the page built here is then cached
+    candidates = []
+    product_ids = list(scores)
+    for start in range(0, len(product_ids), _CHUNK):
+        candidates.extend(db.exec(
+            select(Product.product_id, Product.category_id, Product.price, Product.stock)
+            .where(Product.product_id.in_(product_ids[start:start + _CHUNK]))
+        ).all())
+
+    def price_ok(price):
+        return (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+
+    if in_stock:
+        candidates = [row for row in candidates if row.stock > 0]
+
+    category_counts: Dict[int, int] = defaultdict(int)
+    bucket_counts: Dict[int, int] = defaultdict(int)
+    matched = []
+    for row in candidates:
+        in_category = category_id is None or row.category_id == category_id
+        in_price = price_ok(row.price)
+        if in_price:
+            category_counts[row.category_id] += 1
+        if in_category:
+            bucket_counts[bisect(SEARCH_PRICE_FACETS, row.price)] += 1
+        if in_category and in_price:
+            matched.append(row.product_id)
+
+    matched.sort(key=lambda product_id: (-scores[product_id], product_id))
+    page_ids = matched[offset:offset + limit]
+    products = {}
+    if page_ids:
+        products = {
+            product.product_id: product
+            for product in db.exec(
+                select(Product).options(joinedload(Product.category)).where(Product.product_id.in_(page_ids))
+            ).all()
+        }
+
+    names = {}
+    if category_counts:
+        names = dict(db.exec(
+            select(Category.category_id, Category.name).where(Category.category_id.in_(list(category_counts)))
+        ).all())
+    categories = sorted(
+        (CategoryFacet(category_id=cid, name=names[cid], count=n) for cid, n in category_counts.items() if cid in names),
+        key=lambda facet: (-facet.count, facet.name),
+    )
+
+    return ProductSearchPage(
+        items=_hits((products[product_id], scores[product_id]) for product_id in page_ids if product_id in products),
+        total=len(matched),
+        offset=offset,
+        limit=limit,
+        facets=SearchFacets(categories=categories, prices=_price_facets(bucket_counts)),
+    )
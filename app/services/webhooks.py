@@ -0,0 +1,92 @@
+"""
+Checkout webhook notifications, delivered from the job queue.
+
+create_order and create_payment call order_created() / payment_recorded()
+before they commit, so the notification job is written in the same
+transaction as the order or payment (see app/services/jobs.py). The handlers
+load the order as it is when the job runs and POST it as JSON to
+ORDER_WEBHOOK_URL. When ORDER_WEBHOOK_SECRET is set the body is signed with
+HMAC-SHA256 in the X-Signature header.
+
+A network error or a non-2xx answer raises, so the queue retries with
+backoff and eventually dead-letters the notification. Delivery is at least
+once; receivers deduplicate on the event_id field. Without a URL the
+handlers do nothing.
+"""
+import hashlib
+import hmac
+import json
+import os
+import urllib.request
+from sqlmodel import Session
+from app.db.models import Order, Payment
+from app.services import jobs
+
+ORDER_WEBHOOK_URL = os.getenv("ORDER_WEBHOOK_URL", "")
+ORDER_WEBHOOK_SECRET = os.getenv("ORDER_WEBHOOK_SECRET", "")
+ORDER_WEBHOOK_TIMEOUT = float(os.getenv("ORDER_WEBHOOK_TIMEOUT", "10"))
+
+ORDER_CREATED = "order.created"
+PAYMENT_RECORDED = "payment.recorded"
+
+
+def order_created(db: Session, order_id: int) -> None:
+    """Queues the order.created notification in the caller's transaction."""
+    jobs.enqueue(db, ORDER_CREATED, {"order_id": order_id})
+
+
+def payment_recorded(db: Session, payment_id: int) -> None:
+    """Queues the payment.recorded notification in the caller's transaction."""
+    jobs.enqueue(db, PAYMENT_RECORDED, {"payment_id": payment_id})
+
+
+def _order_body(order: Order) -> dict:
+    return {
+        "order_id": order.order_id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "total_amount": str(order.total_amount),
+        "sale_source": order.sale_source,
+    }
+
+
+def _post(body: dict) -> None:
+    data = json.dumps(body, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if ORDER_WEBHOOK_SECRET:
+        headers["X-Signature"] = hmac.new(ORDER_WEBHOOK_SECRET.encode(), data, hashlib.sha256).hexdigest()
+    request = urllib.request.Request(ORDER_WEBHOOK_URL, data=data, headers=headers, method="POST")
+    # urlopen raises HTTPError for non-2xx answers, which fails the job
+    with urllib.request.urlopen(request, timeout=ORDER_WEBHOOK_TIMEOUT):
+        pass
+
+
+@jobs.handler(ORDER_CREATED)
+def _order_created_job(db: Session, payload: dict) -> None:
+    if not ORDER_WEBHOOK_URL:
+        return
+    order = db.get(Order, payload["order_id"])
+    if order is None:
+        return
+    _post({"event": ORDER_CREATED, "event_id": f"{ORDER_CREATED}:{order.order_id}", "order": _order_body(order)})
+
+
+@jobs.handler(PAYMENT_RECORDED)
+def _payment_recorded_job(db: Session, payload: dict) -> None:
+    if not ORDER_WEBHOOK_URL:
+        return
+    payment = db.get(Payment, payload["payment_id"])
+    if payment is None:
+        return
+    order = db.get(Order, payment.order_id)
+    _post({
+        "event": PAYMENT_RECORDED,
+        "event_id": f"{PAYMENT_RECORDED}:{payment.payment_id}",
+        "payment": {
+            "payment_id": payment.payment_id,
+            "payment_method": payment.payment_method,
+            "amount": str(payment.amount),
+            "status": payment.status,
+        },
+        "order": _order_body(order),
+    })
@@ -0,0 +1,23 @@
+"""
+Performance benchmarks, run as modules from the repository root, e.g.
+
+    python -m benchmarks.serialization
+
+Unless DATABASE_URL is set they use a throwaway SQLite file, so they never
+touch a real database by accident.
+"""
+import os
+import tempfile
+
+
+def configure_environment() -> str:
+    """Fills in the settings the app needs before it is imported; returns the database URL."""
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="onlineshop-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+    os.environ.setdefault("FIRST_ADMIN_USERNAME", "bench-admin")
+    os.environ.setdefault("FIRST_ADMIN_PASSWORD", "bench-admin")
+    return os.environ["DATABASE_URL"]
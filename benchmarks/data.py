@@ -0,0 +1,131 @@
+"""
+Deterministic synthetic dataset for the benchmarks.
+
+Every user shares one password (BENCH_PASSWORD) so the bcrypt hash is
+computed once, and rows are written with executemany INSERTs in chunks so
+that generating tens of thousands of rows takes seconds.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from app.db.models import Category, Order, OrderItem, Payment, Product, User
+from app.services.passwords import pwd_context
+
+BENCH_PASSWORD = "benchmark-password"
+CHUNK = 2000
+
+WORDS = (
+    "red blue green black white wool cotton linen leather steel oak bamboo classic slim vintage sport "
+    "travel winter summer rain trail city studio compact deluxe organic"
+).split()
+NOUNS = (
+    "jacket sweater shirt socks boots sneakers backpack bottle lamp chair table mug kettle blanket "
+    "pillow scarf gloves hat umbrella wallet"
+).split()
+
+
+@dataclass
+class Dataset:
+    usernames: Dict[int, str] = field(default_factory=dict)  # user_id -> username
+    product_ids: List[int] = field(default_factory=list)
+    category_ids: List[int] = field(default_factory=list)
+    orders: int = 0
+    payments: int = 0
+
+
+def _chunks(rows: list):
+    for start in range(0, len(rows), CHUNK):
+        yield rows[start:start + CHUNK]
+
+
+def _write(conn, model, rows: list) -> None:
+    for chunk in _chunks(rows):
+        conn.execute(insert(model), chunk)
+
+
+def is_empty(engine: Engine) -> bool:
+    with engine.connect() as conn:
+        return not conn.execute(select(func.count()).select_from(User)).scalar()
+
+
+def generate(
+    engine: Engine,
+    users: int = 200,
+    categories: int = 10,
+    products: int = 500,
+    orders: int = 2000,
+    seed: int = 42,
+) -> Dataset:
+    """Fills an empty database and returns the generated ids."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+    dataset = Dataset()
+
+    with engine.begin() as conn:
+        _write(conn, User, [
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "hashed_password": hashed_password}
+            for i in range(users)
+        ])
+        dataset.usernames = dict(conn.execute(select(User.user_id, User.username)).all())
+
+        _write(conn, Category, [{"name": f"Category {i}", "description": f"Benchmark category {i}"} for i in range(categories)])
+        dataset.category_ids = list(conn.execute(select(Category.category_id)).scalars())
+
+        _write(conn, Product, [
+            {
+                "sku": f"BENCH-{i:06d}",
+                "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(NOUNS)}",
+                "description": " ".join(rng.choices(WORDS + NOUNS, k=8)),
+                "price": Decimal(rng.randint(199, 49999)) / 100,
+                "stock": rng.randint(0, 500),
+                "category_id": rng.choice(dataset.category_ids),
+            }
+            for i in range(products)
+        ])
+        prices = dict(conn.execute(select(Product.product_id, Product.price)).all())
+        dataset.product_ids = list(prices)
+
+        user_ids = list(dataset.usernames)
+        order_rows, lines = [], []
+        for _ in range(orders):
+            picked = rng.sample(dataset.product_ids, k=rng.randint(1, 4))
+            quantities = {product_id: rng.randint(1, 3) for product_id in picked}
+            created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            order_rows.append({
+                "user_id": rng.choice(user_ids),
+                "total_amount": sum(prices[p] * q for p, q in quantities.items()),
+                "status": rng.choice(("pending", "paid", "paid", "shipped")),
+                "sale_source": rng.choice(("online", "online", "store")),
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+            lines.append(quantities)
+        _write(conn, Order, order_rows)
+
+        order_ids = list(conn.execute(select(Order.order_id).order_by(Order.order_id)).scalars())
+        _write(conn, OrderItem, [
+            {"order_id": order_id, "product_id": product_id, "quantity": quantity, "price_at_purchase": prices[product_id]}
+            for order_id, quantities in zip(order_ids, lines)
+            for product_id, quantity in quantities.items()
+        ])
+        payment_rows = [
+            {
+                "order_id": order_id,
+                "payment_method": rng.choice(("card", "card", "paypal")),
+                "amount": order["total_amount"],
+                "status": "completed",
+                "created_at": order["created_at"],
+            }
+            for order_id, order in zip(order_ids, order_rows)
+            if order["status"] != "pending"
+        ]
+        _write(conn, Payment, payment_rows)
+
+    dataset.orders = len(order_ids)
+    dataset.payments = len(payment_rows)
+    return dataset
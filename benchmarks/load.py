@@ -0,0 +1,329 @@
+"""
+Scripted load scenarios against the app, in process.
+
+Requests go through httpx.AsyncClient over ASGITransport, so the full
+middleware / routing / dependency / database stack is exercised without a
+server or network in the way. Statements per request are read from the
+Server-Timing header written by the request metrics middleware.
+
+    python -m benchmarks.load                        # all scenarios, fresh SQLite file
+    python -m benchmarks.load --scenario browse checkout --requests 2000 --concurrency 32
+    python -m benchmarks.load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --compare benchmarks/baseline.json
+
+Set DATABASE_URL to run against a local Postgres; the database must be
+empty (pass --reset to drop and recreate the application tables first).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from benchmarks import configure_environment
+
+configure_environment()
+
+import httpx  # noqa: E402
+from sqlalchemy import text, update  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from app.db.database import engine  # noqa: E402
+from app.db.migrations import MIGRATIONS_TABLE, upgrade as migrate_database  # noqa: E402
+from app.db.models import Product, User  # noqa: E402
+from app.dependencies.auth import create_user_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.admin import seed_admin_if_none_exist  # noqa: E402
+from app.services import passwords  # noqa: E402
+from app.services.cache import invalidate_catalog  # noqa: E402
+from benchmarks import data  # noqa: E402
+
+_SQL_COUNT = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+@dataclass
+class Recorder:
+    latencies: List[float] = field(default_factory=list)
+    ok_latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    sql_statements: List[int] = field(default_factory=list)
+    db_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    dataset: data.Dataset
+    tokens: Dict[int, str]
+    hot_products: List[int]
+    recorder: Recorder = field(default_factory=Recorder)
+
+    async def request(self, method: str, url: str, token: Optional[str] = None, **kwargs) -> Optional[httpx.Response]:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.errors += 1
+            return None
+        elapsed = time.perf_counter() - started
+        self.recorder.latencies.append(elapsed)
+        if response.status_code < 300:
+            self.recorder.ok_latencies.append(elapsed)
+        self.recorder.statuses[response.status_code] += 1
+        if response.status_code >= 500:
+            self.recorder.errors += 1
+        match = _SQL_COUNT.search(response.headers.get("server-timing", ""))
+        if match:
+            self.recorder.db_ms.append(float(match.group(1)))
+            self.recorder.sql_statements.append(int(match.group(2)))
+        return response
+
+    def random_token(self, rng: random.Random) -> str:
+        return self.tokens[rng.choice(list(self.tokens))]
+
+
+# --- scenarios: one call issues one request or a short sequence of them ----
+
+async def browse(ctx: Context, rng: random.Random) -> None:
+    """Anonymous catalog traffic: list pages (sometimes paging on), details, categories, search."""
+    roll = rng.random()
+    if roll < 0.45:
+        params = {"limit": 24, "sort": rng.choice(("product_id", "price", "-price", "-created_at"))}
+        if rng.random() < 0.5:
+            params["category_id"] = rng.choice(ctx.dataset.category_ids)
+        response = await ctx.request("GET", "/products/", params=params)
+        if response is not None and response.status_code == 200 and response.json().get("next_cursor") and rng.random() < 0.5:
+            await ctx.request("GET", "/products/", params={**params, "cursor": response.json()["next_cursor"]})
+    elif roll < 0.8:
+        await ctx.request("GET", f"/products/{rng.choice(ctx.dataset.product_ids)}")
+    elif roll < 0.9:
+        await ctx.request("GET", "/categories/")
+    else:
+        await ctx.request("GET", "/products/search", params={"q": rng.choice(data.WORDS + data.NOUNS)[:4]})
+
+
+async def login(ctx: Context, rng: random.Random) -> None:
+    """
+    Password logins. Run at most PASSWORD_HASH_MAX_PENDING at a time (see
+    scenario_concurrency), so this measures hashing rather than 429s; any
+    429 is the password executor shedding load, not a failure.
+    """
+    username = ctx.dataset.usernames[rng.choice(list(ctx.dataset.usernames))]
+    await ctx.request("POST", "/auth/user/login", data={"username": username, "password": data.BENCH_PASSWORD})
+
+
+async def checkout(ctx: Context, rng: random.Random) -> None:
+    """Many shoppers buying the same few products; 400 means sold out."""
+    body = {"order_items": [{"product_id": rng.choice(ctx.hot_products), "quantity": 1}]}
+    await ctx.request("POST", "/orders/", token=ctx.random_token(rng), json=body)
+
+
+async def history(ctx: Context, rng: random.Random) -> None:
+    """Order history, first page and sometimes the next one."""
+    token = ctx.random_token(rng)
+    response = await ctx.request("GET", "/orders/", token=token, params={"limit": 20})
+    if response is not None and response.status_code == 200 and response.json().get("next_cursor") and rng.random() < 0.3:
+        await ctx.request("GET", "/orders/", token=token, params={"limit": 20, "cursor": response.json()["next_cursor"]})
+
+
+SCENARIOS: Dict[str, Callable] = {"browse": browse, "login": login, "checkout": checkout, "history": history}
+
+
+def scenario_concurrency(name: str, concurrency: int) -> int:
+    """Concurrency for one scenario; logins beyond the password executor's queue would only measure 429s."""
+    if name == "login":
+        return min(concurrency, passwords.PASSWORD_HASH_MAX_PENDING)
+    return concurrency
+
+
+# --- running and reporting -------------------------------------------------
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> dict:
+    count = len(recorder.latencies)
+    return {
+        "requests": count,
+        "errors": recorder.errors,
+        "statuses": {str(code): n for code, n in sorted(recorder.statuses.items())},
+        "throughput_rps": round(count / wall_seconds, 1) if wall_seconds else 0.0,
+        "p50_ms": round(_percentile(recorder.latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(recorder.latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(recorder.latencies, 99) * 1000, 2),
+        # Successful responses only, so shed or rejected requests cannot flatter the latency
+        "ok_p50_ms": round(_percentile(recorder.ok_latencies, 50) * 1000, 2),
+        "ok_p95_ms": round(_percentile(recorder.ok_latencies, 95) * 1000, 2),
+        "sql_per_request": round(sum(recorder.sql_statements) / len(recorder.sql_statements), 2) if recorder.sql_statements else 0.0,
+        "db_ms_per_request": round(sum(recorder.db_ms) / len(recorder.db_ms), 2) if recorder.db_ms else 0.0,
+    }
+
+
+async def run_scenario(name: str, ctx: Context, requests: int, concurrency: int, seed: int) -> dict:
+    ctx.recorder = Recorder()
+    step = SCENARIOS[name]
+    issued = 0
+
+    async def worker(worker_id: int) -> None:
+        nonlocal issued
+        rng = random.Random(f"{seed}-{name}-{worker_id}")
+        while issued < requests:
+            issued += 1
+            await step(ctx, rng)
+
+    concurrency = scenario_concurrency(name, concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return {**summarize(ctx.recorder, time.perf_counter() - started), "concurrency": concurrency}
+
+
+def prepare_database(args) -> data.Dataset:
+    if args.reset:
+        SQLModel.metadata.drop_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {MIGRATIONS_TABLE}"))
+    migrate_database(log=lambda *_: None)
+    seed_admin_if_none_exist()
+    if not data.is_empty(engine):
+        sys.exit("The benchmark database already has users; point DATABASE_URL at an empty database or pass --reset.")
+    return data.generate(
+        engine, users=args.users, categories=args.categories, products=args.products, orders=args.orders, seed=args.seed
+    )
+
+
+def reset_hot_stock(hot_products: List[int], stock: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(update(Product).where(Product.product_id.in_(hot_products)).values(stock=stock))
+    invalidate_catalog()
+
+
+def hot_stock_sold(hot_products: List[int], stock: int) -> int:
+    with engine.connect() as conn:
+        remaining = conn.execute(
+            Product.__table__.select().with_only_columns(Product.stock).where(Product.product_id.in_(hot_products))
+        ).scalars().all()
+    if any(value < 0 for value in remaining):
+        raise AssertionError(f"Negative stock after checkout scenario: {remaining}")
+    return stock * len(hot_products) - sum(remaining)
+
+
+async def run(args) -> dict:
+    dataset = prepare_database(args)
+    tokens = {
+        user_id: create_user_token(User(user_id=user_id, username=username, is_active=True, token_version=0))
+        for user_id, username in dataset.usernames.items()
+    }
+    hot_products = dataset.product_ids[:args.hot_products]
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        ctx = Context(client=client, dataset=dataset, tokens=tokens, hot_products=hot_products)
+        for name in args.scenario:
+            if name == "checkout":
+                reset_hot_stock(hot_products, args.checkout_stock)
+            results[name] = await run_scenario(name, ctx, args.requests, args.concurrency, args.seed)
+            if name == "checkout":
+                sold = hot_stock_sold(hot_products, args.checkout_stock)
+                created = results[name]["statuses"].get("201", 0)
+                if sold != created:
+                    raise AssertionError(f"Stock accounting mismatch: {created} orders created, {sold} units sold")
+                results[name]["units_sold"] = sold
+
+    return {
+        "meta": {
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "users": args.users, "categories": args.categories, "products": args.products, "orders": args.orders,
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+            "hot_products": args.hot_products, "checkout_stock": args.checkout_stock,
+        },
+        "scenarios": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"database={report['meta']['database']} requests/scenario={report['meta']['requests']} "
+          f"concurrency={report['meta']['concurrency']}")
+    print(f"{'scenario':<10} {'conc':>4} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'2xx p95':>8} {'sql/req':>8} {'db ms':>7}  statuses")
+    for name, result in report["scenarios"].items():
+        print(f"{name:<10} {result['concurrency']:>4} {result['requests']:>6} {result['errors']:>4} "
+              f"{result['throughput_rps']:>8.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['ok_p95_ms']:>8.2f} "
+              f"{result['sql_per_request']:>8.2f} {result['db_ms_per_request']:>7.2f}  {result['statuses']}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints the change against a baseline; False when p95 or statements per request regressed."""
+    ok = True
+    print(f"\nagainst baseline (tolerance {tolerance:.0%} on p95, any increase in sql/req):")
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:<10} no baseline")
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "ok_p95_ms", "throughput_rps", "sql_per_request"):
+            if key not in before:
+                continue
+            old, new = before[key], result[key]
+            delta = (new - old) / old if old else 0.0
+            changes.append(f"{key} {old}->{new} ({delta:+.0%})")
+        regressed = (
+            before["p95_ms"] and (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] > tolerance
+        ) or result["sql_per_request"] > before["sql_per_request"] + 0.05
+        ok = ok and not regressed
+        print(f"{name:<10} {'REGRESSED ' if regressed else ''}" + ", ".join(changes))
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run scripted load scenarios against the app in process.")
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--hot-products", type=int, default=5)
+    parser.add_argument("--checkout-stock", type=int, default=50, help="units of each hot product")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the application tables first")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 increase")
+    parser.add_argument("--log-slow-queries", action="store_true", help="keep the slow-query log on stderr")
+    args = parser.parse_args(argv)
+
+    if not args.log_slow_queries:
+        logging.getLogger("app.sql").setLevel(logging.ERROR)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+        print(f"\nbaseline written to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(report, json.load(file), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,450 @@
+"""
+Production-scale synthetic data, for reproducing performance problems locally.
+
+    python -m benchmarks.seed                                   # small dataset, throwaway SQLite file
+    DATABASE_URL=postgresql://... python -m benchmarks.seed --users 1000000 --orders 10000000 --workers 8
+    python -m benchmarks.seed --orders 2000000 --target-rows-per-second 150000
+
+Rows are generated and written in chunks by a pool of worker processes, each
+on its own connection: with COPY FROM STDIN on Postgres through psycopg2, and
+with multi-row INSERTs on anything else. Each chunk draws from its own RNG
+seeded by (--seed, table, chunk), so the same arguments give the same rows
+whatever the number of workers. Timestamps are relative to the start of the
+current day.
+
+Every table the app reads is filled, and the data is referentially
+consistent and skewed the way real traffic is:
+
+- product popularity follows a Zipf distribution (--skew), so a few
+  products appear in most orders;
+- older users place most orders, and no order predates its user;
+- orders are mostly one or two lines with a long tail, spread over --days
+  of history with newer orders getting higher ids;
+- most paid or shipped orders have one completed payment; some were paid in
+  installments or after a failed attempt, and some pending orders are
+  partially paid.
+
+Admins and idempotency keys are left alone: the app seeds its first admin
+itself and idempotency keys are short-lived.
+
+Primary keys are assigned here, after each table's current maximum, so
+seeding adds to an existing database; Postgres sequences are moved past them
+at the end. SQLite allows one writer at a time, so it always runs a single
+worker.
+"""
+import argparse
+import csv
+import io
+import itertools
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from benchmarks import configure_environment
+
+configure_environment()
+
+from sqlalchemy import create_engine, event, func, insert, select, text  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+from app.db.migrations import upgrade as migrate_database  # noqa: E402
+from app.db.models import Address, Category, Order, OrderItem, Payment, Product, User  # noqa: E402
+from app.services.passwords import pwd_context  # noqa: E402
+from benchmarks.data import BENCH_PASSWORD, NOUNS, WORDS  # noqa: E402
+
+CENT = Decimal("0.01")
+
+# Share of users that already exist when the order history starts
+EARLY_USERS = 0.2
+# Orders pick user index int(existing * random() ** USER_SKEW): higher is more skewed
+USER_SKEW = 3
+
+ADDRESS_COUNTS, ADDRESS_WEIGHTS = (0, 1, 2), (30, 55, 15)
+LINE_COUNTS, LINE_WEIGHTS = (1, 2, 3, 4, 5, 6, 8, 12), (45, 25, 12, 7, 5, 3, 2, 1)
+QUANTITIES, QUANTITY_WEIGHTS = (1, 2, 3, 5), (80, 12, 6, 2)
+STATUSES, STATUS_WEIGHTS = ("pending", "paid", "shipped"), (10, 25, 65)
+METHODS, METHOD_WEIGHTS = ("card", "paypal", "bank_transfer"), (70, 20, 10)
+CITIES = (
+    ("Tbilisi", "Tbilisi"), ("Batumi", "Adjara"), ("Kutaisi", "Imereti"), ("Rustavi", "Kvemo Kartli"),
+    ("Zugdidi", "Samegrelo"), ("Gori", "Shida Kartli"), ("Telavi", "Kakheti"), ("Poti", "Samegrelo"),
+)
+STREETS = ("Rustaveli", "Chavchavadze", "Pekini", "Vazha-Pshavela", "Tamar Mepe", "Agmashenebeli", "Kazbegi")
+
+# Phases run one after another so foreign keys always point at written rows
+PHASES = ("categories", "products", "users", "orders")
+FIRST_ID = {"categories": "first_category", "products": "first_product", "users": "first_user", "orders": "first_order"}
+
+
+@dataclass(frozen=True)
+class Plan:
+    url: str
+    seed: int
+    skew: float
+    end: datetime
+    days: int
+    password_hash: str
+    categories: int
+    products: int
+    users: int
+    orders: int
+    first_category: int
+    first_product: int
+    first_user: int
+    first_order: int
+
+    @property
+    def span(self) -> timedelta:
+        return timedelta(days=self.days)
+
+    @property
+    def start(self) -> datetime:
+        return self.end - self.span
+
+    def ids(self, phase: str) -> range:
+        first = getattr(self, FIRST_ID[phase])
+        return range(first, first + getattr(self, phase))
+
+
+# Worker process state, set by _init_worker
+_plan: Optional[Plan] = None
+_engine: Optional[Engine] = None
+_catalog: Optional[Tuple[List[int], List[float], Dict[int, Decimal]]] = None
+
+
+def make_engine(url: str) -> Engine:
+    engine = create_engine(url, poolclass=NullPool)
+    if engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "connect")
+        def _relax_durability(dbapi_connection, _record):
+            # Losing the last few chunks on a crash is fine for generated data
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute("SET synchronous_commit TO off")
+    return engine
+
+
+def _init_worker(plan: Plan) -> None:
+    global _plan, _engine, _catalog
+    _plan, _engine, _catalog = plan, make_engine(plan.url), None
+
+
+def _popularity() -> Tuple[List[int], List[float], Dict[int, Decimal]]:
+    """Product ids in popularity order, their cumulative Zipf weights, and prices; loaded once per worker."""
+    global _catalog
+    if _catalog is None:
+        products = _plan.ids("products")
+        with _engine.connect() as conn:
+            prices = dict(conn.execute(
+                select(Product.product_id, Product.price)
+                .where(Product.product_id.between(products.start, products.stop - 1))
+            ).all())
+        ranked = sorted(prices)
+        random.Random(f"{_plan.seed}:popularity").shuffle(ranked)
+        weights = list(itertools.accumulate(1 / (rank ** _plan.skew) for rank in range(1, len(ranked) + 1)))
+        _catalog = ranked, weights, prices
+    return _catalog
+
+
+def _before_start(rng: random.Random, max_days: int) -> datetime:
+    return _plan.start - timedelta(minutes=rng.randint(0, max_days * 24 * 60))
+
+
+def _category_rows(rng: random.Random, ids: range) -> List[tuple]:
+    rows = [
+        {
+            "category_id": category_id,
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(NOUNS)}s {category_id}",
+            "description": " ".join(rng.choices(WORDS + NOUNS, k=6)),
+            "created_at": _before_start(rng, 730),
+        }
+        for category_id in ids
+    ]
+    for row in rows:
+        row["updated_at"] = row["created_at"]
+    return [(Category, rows)]
+
+
+def _product_rows(rng: random.Random, ids: range) -> List[tuple]:
+    categories = _plan.ids("categories")
+    # Catalog size per category is skewed too
+    category_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(categories) + 1)))
+    rows = []
+    for product_id in ids:
+        created_at = _before_start(rng, 365)
+        rows.append({
+            "product_id": product_id,
+            "sku": f"SEED-{product_id:09d}",
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(NOUNS)}",
+            "description": " ".join(rng.choices(WORDS + NOUNS, k=10)),
+            "price": Decimal(f"{min(max(rng.lognormvariate(3.2, 1.0), 0.99), 9999):.2f}"),
+            "stock": rng.randint(0, 1000),
+            "category_id": rng.choices(categories, cum_weights=category_weights)[0],
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return [(Product, rows)]
+
+
+def _user_rows(rng: random.Random, ids: range) -> List[tuple]:
+    users, addresses = [], []
+    for user_id in ids:
+        index = user_id - _plan.first_user
+        joined = (index / _plan.users - EARLY_USERS) / (1 - EARLY_USERS)
+        created_at = _plan.start + _plan.span * joined if joined > 0 else _before_start(rng, 730)
+        users.append({
+            "user_id": user_id,
+            "username": f"seed{user_id}",
+            "email": f"seed{user_id}@example.com",
+            "hashed_password": _plan.password_hash,
+            "is_active": rng.random() > 0.02,
+            "token_version": 0,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        for _ in range(rng.choices(ADDRESS_COUNTS, ADDRESS_WEIGHTS)[0]):
+            city, state = rng.choice(CITIES)
+            addresses.append({
+                "user_id": user_id,
+                "address_line1": f"{rng.randint(1, 200)} {rng.choice(STREETS)} St",
+                "address_line2": f"Apt {rng.randint(1, 120)}" if rng.random() < 0.4 else None,
+                "city": city,
+                "state": state,
+                "zip_code": f"{rng.randint(100, 6200):04d}",
+                "country": "GE",
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+    return [(User, users), (Address, addresses)]
+
+
+def _split(rng: random.Random, total: Decimal, parts: int) -> List[Decimal]:
+    cents = int(total / CENT)
+    if cents < parts:
+        return [total]
+    cuts = sorted(rng.sample(range(1, cents), parts - 1))
+    return [Decimal(high - low) * CENT for low, high in zip([0] + cuts, cuts + [cents])]
+
+
+def _payment_rows(rng: random.Random, order_id: int, total: Decimal, status: str, created_at: datetime) -> List[dict]:
+    method = rng.choices(METHODS, METHOD_WEIGHTS)[0]
+    paid_at = created_at + timedelta(minutes=rng.randint(1, 90))
+    rows = []
+
+    def add(amount: Decimal, payment_status: str) -> None:
+        rows.append({
+            "order_id": order_id, "payment_method": method, "amount": amount,
+            "status": payment_status, "created_at": paid_at,
+        })
+
+    roll = rng.random()
+    if status == "pending":
+        if roll < 0.2:
+            add(max((total * Decimal(rng.randint(10, 90)) / 100).quantize(CENT), CENT), "completed")
+        elif roll < 0.3:
+            add(total, "failed")
+        return rows
+    if 0.85 <= roll < 0.93:
+        add(total, "failed")
+        paid_at += timedelta(minutes=rng.randint(1, 60))
+    for amount in _split(rng, total, 1 if roll < 0.93 else rng.randint(2, 3)):
+        add(amount, "completed")
+        paid_at += timedelta(days=rng.randint(1, 30))
+    return rows
+
+
+def _order_rows(rng: random.Random, ids: range) -> List[tuple]:
+    ranked, weights, prices = _popularity()
+    orders, items, payments = [], [], []
+    for order_id in ids:
+        fraction = (order_id - _plan.first_order + rng.random()) / _plan.orders
+        created_at = _plan.start + _plan.span * fraction
+        existing = max(1, int(_plan.users * (EARLY_USERS + (1 - EARLY_USERS) * fraction)))
+        picks = Counter(rng.choices(ranked, cum_weights=weights, k=rng.choices(LINE_COUNTS, LINE_WEIGHTS)[0]))
+
+        total = Decimal(0)
+        for product_id, repeats in picks.items():
+            quantity = rng.choices(QUANTITIES, QUANTITY_WEIGHTS)[0] + repeats - 1
+            items.append({
+                "order_id": order_id, "product_id": product_id,
+                "quantity": quantity, "price_at_purchase": prices[product_id],
+            })
+            total += prices[product_id] * quantity
+
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        paid = _payment_rows(rng, order_id, total, status, created_at)
+        payments.extend(paid)
+        updated_at = paid[-1]["created_at"] if paid else created_at
+        if status == "shipped":
+            updated_at += timedelta(hours=rng.randint(4, 120))
+        orders.append({
+            "order_id": order_id,
+            "user_id": _plan.first_user + int(existing * rng.random() ** USER_SKEW),
+            "total_amount": total,
+            "status": status,
+            "sale_source": "store" if rng.random() < 0.3 else "online",
+            "created_at": created_at,
+            "updated_at": min(updated_at, _plan.end),
+        })
+    return [(Order, orders), (OrderItem, items), (Payment, payments)]
+
+
+GENERATORS = {
+    "categories": _category_rows,
+    "products": _product_rows,
+    "users": _user_rows,
+    "orders": _order_rows,
+}
+
+
+def _copy(conn, table, rows: List[dict]) -> None:
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    with conn.connection.cursor() as cursor:
+        # Unquoted empty CSV fields load as NULL
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def write(conn, table, rows: List[dict]) -> None:
+    """COPY on psycopg2, a multi-row INSERT (insertmanyvalues / executemany) otherwise."""
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        _copy(conn, table, rows)
+    else:
+        conn.execute(insert(table), rows)
+
+
+def run_chunk(task: Tuple[str, int, int, int]) -> Dict[str, int]:
+    """Generates and writes one chunk in one transaction; returns rows written per table."""
+    phase, chunk, first, stop = task
+    rng = random.Random(f"{_plan.seed}:{phase}:{chunk}")
+    tables = GENERATORS[phase](rng, range(first, stop))
+    with _engine.begin() as conn:
+        for model, rows in tables:
+            write(conn, model.__table__, rows)
+    return {model.__tablename__: len(rows) for model, rows in tables}
+
+
+SEEDED_KEYS = {"categories": Category.category_id, "products": Product.product_id, "users": User.user_id, "orders": Order.order_id}
+
+
+def _next_ids(engine: Engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        return {
+            FIRST_ID[phase]: (conn.execute(select(func.max(column))).scalar() or 0) + 1
+            for phase, column in SEEDED_KEYS.items()
+        }
+
+
+def finish(engine: Engine) -> None:
+    """Moves Postgres sequences past the explicit ids and refreshes planner statistics."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for column in SEEDED_KEYS.values():
+                table, name = column.table.name, column.name
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', '{name}'), "
+                    f"(SELECT coalesce(max({name}), 0) + 1 FROM \"{table}\"), false)"
+                ))
+        conn.execute(text("ANALYZE"))
+
+
+def _tasks(plan: Plan, phase: str, chunk_size: int) -> List[Tuple[str, int, int, int]]:
+    ids = plan.ids(phase)
+    return [
+        (phase, chunk, first, min(first + chunk_size, ids.stop))
+        for chunk, first in enumerate(range(ids.start, ids.stop, chunk_size))
+    ]
+
+
+def seed(plan: Plan, workers: int, chunk_size: int, log=print) -> List[dict]:
+    """Runs every phase and returns per-phase row counts and timings."""
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(plan,)) if workers > 1 else None
+    if pool is None:
+        _init_worker(plan)
+    phases = []
+    try:
+        for phase in PHASES:
+            tasks = _tasks(plan, phase, chunk_size)
+            counts: Counter = Counter()
+            started = time.perf_counter()
+            results = (future.result() for future in as_completed([pool.submit(run_chunk, task) for task in tasks])) \
+                if pool else map(run_chunk, tasks)
+            for done, result in enumerate(results, start=1):
+                counts.update(result)
+                elapsed = time.perf_counter() - started
+                log(f"\r{phase:<10} {done}/{len(tasks)} chunks  {sum(counts.values()):>12,} rows  "
+                    f"{sum(counts.values()) / elapsed:>10,.0f} rows/s", end="")
+            log("")
+            phases.append({"phase": phase, "tables": dict(counts), "seconds": time.perf_counter() - started})
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return phases
+
+
+def print_report(phases: List[dict], finish_seconds: float, target: float) -> bool:
+    """Prints rows/s per table group and overall; returns False if a target was given and missed."""
+    print(f"\n{'phase':<10} {'rows':>12} {'seconds':>9} {'rows/s':>10}  tables")
+    for phase in phases:
+        rows = sum(phase["tables"].values())
+        tables = ", ".join(f"{name}={count:,}" for name, count in phase["tables"].items())
+        print(f"{phase['phase']:<10} {rows:>12,} {phase['seconds']:>9.1f} {rows / max(phase['seconds'], 1e-9):>10,.0f}  {tables}")
+    print(f"{'analyze':<10} {'':>12} {finish_seconds:>9.1f}")
+    rows = sum(sum(phase["tables"].values()) for phase in phases)
+    seconds = sum(phase["seconds"] for phase in phases) + finish_seconds
+    rate = rows / max(seconds, 1e-9)
+    print(f"{'total':<10} {rows:>12,} {seconds:>9.1f} {rate:>10,.0f}")
+    if not target:
+        return True
+    print(f"\ntarget {target:,.0f} rows/s: {'met' if rate >= target else 'MISSED'} ({rate / target:.0%})")
+    return rate >= target
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fill the database with large, realistic synthetic data.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="length of the order history")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4, help="writer processes (always 1 on SQLite)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows of the driving table per transaction")
+    parser.add_argument("--target-rows-per-second", type=float, default=0, help="exit 1 if the overall rate is lower")
+    args = parser.parse_args(argv)
+    if min(args.users, args.categories, args.products, args.orders, args.chunk_size, args.days) < 1:
+        parser.error("counts, --days and --chunk-size must be positive")
+
+    url = configure_environment()
+    engine = make_engine(url)
+    migrate_database(engine, log=lambda message: None)
+    workers = 1 if engine.dialect.name == "sqlite" else args.workers
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    plan = Plan(
+        url=url, seed=args.seed, skew=args.skew, end=today, days=args.days,
+        password_hash=pwd_context.hash(BENCH_PASSWORD),
+        categories=args.categories, products=args.products, users=args.users, orders=args.orders,
+        **_next_ids(engine),
+    )
+    print(f"database={engine.url.render_as_string(hide_password=True)} workers={workers} "
+          f"chunk-size={args.chunk_size} password={BENCH_PASSWORD!r}")
+
+    phases = seed(plan, workers, args.chunk_size, log=lambda *parts, **kw: print(*parts, **kw, flush=True))
+    started = time.perf_counter()
+    finish(engine)
+    return 0 if print_report(phases, time.perf_counter() - started, args.target_rows_per_second) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
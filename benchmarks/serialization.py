@@ -0,0 +1,86 @@
+"""
+Default vs FAST_JSON serialization of large list responses.
+
+Seeds one user with N orders and payments and N extra users, then times
+GET /payments/ and GET /admin/users (both unpaginated) end to end through
+the ASGI app in both modes, for each page size:
+
+    python -m benchmarks.serialization [--rows 1000 10000] [--repeat 20]
+"""
+import argparse
+import statistics
+import time
+from benchmarks import configure_environment
+
+configure_environment()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, insert, select  # noqa: E402
+from app.db.database import SessionLocal  # noqa: E402
+from app.db.models import Admin, Order, Payment, User  # noqa: E402
+from app.dependencies.auth import create_admin_token, create_user_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import fast_json  # noqa: E402
+
+
+def seed(rows: int):
+    """Replaces the benchmark data with one shopper owning `rows` payments plus `rows` other users."""
+    with SessionLocal() as db:
+        for model in (Payment, Order, User):
+            db.exec(delete(model))
+        db.exec(insert(User), params=[
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"} for i in range(rows)
+        ])
+        shopper = db.exec(select(User).where(User.username == "user0")).scalar_one()
+        db.exec(insert(Order), params=[
+            {"user_id": shopper.user_id, "total_amount": "19.99", "status": "paid"} for _ in range(rows)
+        ])
+        order_ids = db.exec(select(Order.order_id)).scalars().all()
+        db.exec(insert(Payment), params=[
+            {"order_id": order_id, "payment_method": "card", "amount": "19.99", "status": "completed"}
+            for order_id in order_ids
+        ])
+        db.commit()
+        admin = db.exec(select(Admin)).scalars().first()
+        return create_user_token(shopper), create_admin_token(admin)
+
+
+def measure(client: TestClient, path: str, token: str, repeat: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    body_size = len(client.get(path, headers=headers).content)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    mean = statistics.mean(timings)
+    return {"mean_ms": mean * 1000, "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000,
+            "rps": 1 / mean, "bytes": body_size}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with TestClient(app) as client:
+        print(f"{'endpoint':<14} {'rows':>6} {'mode':<8} {'mean ms':>9} {'p95 ms':>9} {'req/s':>8} {'speedup':>8}")
+        for rows in args.rows:
+            user_token, admin_token = seed(rows)
+            for path, token in (("/payments/", user_token), ("/admin/users", admin_token)):
+                results = {}
+                for mode in (False, True):
+                    fast_json.FAST_JSON = mode
+                    results[mode] = measure(client, path, token, args.repeat)
+                fast_json.FAST_JSON = False
+                for mode, label in ((False, "default"), (True, "fast")):
+                    result = results[mode]
+                    speedup = results[False]["mean_ms"] / result["mean_ms"]
+                    print(f"{path:<14} {rows:>6} {label:<8} {result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                          f"{result['rps']:>8.1f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+
+# Settings are read when the app is imported, so fill them in first; a
+# DATABASE_URL from the environment (e.g. Postgres in CI) takes precedence.
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='onlineshop-test-'), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("FIRST_ADMIN_USERNAME", "test-admin")
+os.environ.setdefault("FIRST_ADMIN_PASSWORD", "test-admin")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "2")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+_names = itertools.count()
+
+
+def unique(prefix: str) -> str:
+    """A name no other test has used, so tests can share one database."""
+    return f"{prefix}-{os.getpid()}-{next(_names)}"
+
+
+def bearer(client: TestClient, path: str, username: str, password: str) -> dict:
+    response = client.post(path, data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return bearer(client, "/auth/admin/login", os.environ["FIRST_ADMIN_USERNAME"], os.environ["FIRST_ADMIN_PASSWORD"])
+
+
+@pytest.fixture
+def user_headers(client):
+    username = unique("user")
+    response = client.post(
+        "/users/register", json={"username": username, "email": f"{username}@example.com", "password": "secret"}
+    )
+    assert response.status_code == 200, response.text
+    return bearer(client, "/auth/user/login", username, "secret")
+
+
+@pytest.fixture
+def category_id(client, admin_headers):
+    response = client.post("/categories/", json={"name": unique("category")}, headers=admin_headers)
+    assert response.status_code == 201, response.text
+    return response.json()["category_id"]
+
+
+@pytest.fixture
+def make_product(client, admin_headers, category_id):
+    def make_product(stock: int = 100, price: str = "10.00") -> dict:
+        response = client.post(
+            "/products/",
+            json={"name": unique("product"), "price": price, "stock": stock, "category_id": category_id},
+            headers=admin_headers,
+        )
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make_product
@@ -0,0 +1,28 @@
+from app.db.database import SessionLocal
+from app.services import analytics
+
+
+def test_only_settled_orders_count_as_sales(client, user_headers, make_product, category_id):
+    product = make_product(price="10.00")
+    orders = []
+    for quantity in (1, 2, 4):
+        response = client.post(
+            "/orders/", json={"order_items": [{"product_id": product["product_id"], "quantity": quantity}]},
+            headers=user_headers,
+        )
+        assert response.status_code == 201, response.text
+        orders.append(response.json())
+    paid, part_paid, _unpaid = orders
+    for order, amount in ((paid, "10.00"), (part_paid, "5.00")):
+        response = client.post(
+            "/payments/", json={"order_id": order["order_id"], "payment_method": "card", "amount": amount},
+            headers=user_headers,
+        )
+        assert response.status_code == 201, response.text
+
+    with SessionLocal() as db:
+        analytics.refresh(db, full=True)
+        sales = {row.category_id: row for row in analytics.sales_by_category(db)}
+
+    assert sales[category_id].orders == 1
+    assert sales[category_id].units == 1
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.models import User
+from app.dependencies import auth
+from app.services import passwords
+from app.services.metrics import Histogram
+
+
+def test_password_routes(client, admin_headers):
+    admin, password = os.environ["FIRST_ADMIN_USERNAME"], os.environ["FIRST_ADMIN_PASSWORD"]
+    assert client.post("/admin/login", params={"username": admin, "password": password}).status_code == 200
+    assert client.post("/admin/login", params={"username": admin, "password": "wrong"}).status_code == 401
+
+    response = client.post("/admin/create", params={"username": "second-admin", "password": "pw"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert client.post("/auth/admin/login", data={"username": "second-admin", "password": "pw"}).status_code == 200
+
+    user = {"username": "login-user", "email": "login-user@example.com", "password": "pw"}
+    assert client.post("/users/register", json=user).status_code == 200
+    assert client.post("/users/register", json=user).status_code == 400
+    assert client.post("/users/login", params={"identifier": user["email"], "password": "pw"}).status_code == 200
+    assert client.post("/auth/user/login", data={"username": user["username"], "password": "no"}).status_code == 400
+
+
+def test_rejected_password_operations_are_all_counted(client):
+    admin = os.environ["FIRST_ADMIN_USERNAME"]
+    before = passwords.stats()["rejected"]
+    attempts = passwords.PASSWORD_HASH_MAX_PENDING * 8
+    with ThreadPoolExecutor(max_workers=attempts) as pool:
+        codes = list(pool.map(
+            lambda _: client.post("/auth/admin/login", data={"username": admin, "password": "wrong"}).status_code,
+            range(attempts),
+        ))
+    assert set(codes) == {400, 429}
+    assert passwords.stats()["rejected"] - before == codes.count(429)
+
+
+def test_password_load_is_counted_until_each_operation_finishes():
+    release = threading.Event()
+    futures = [
+        passwords._submit(Histogram(), release.wait) for _ in range(passwords.PASSWORD_HASH_WORKERS + 1)
+    ]
+    stats = passwords.stats()
+    assert (stats["in_flight"], stats["queued"]) == (passwords.PASSWORD_HASH_WORKERS + 1, 1)
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    # Done callbacks run just after the result is handed out
+    deadline = time.monotonic() + 5
+    while passwords.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = passwords.stats()
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+
+
+@pytest.fixture
+def claims_mode(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    auth.principal_cache.clear()
+
+
+def test_claims_mode_evicts_principals_on_commit(client, claims_mode, user_headers):
+    me = client.get("/users/me", headers=user_headers)
+    assert me.status_code == 200, me.text
+    key = ("user", me.json()["id"])
+    assert auth.principal_cache.get(key) is not None
+
+    with SessionLocal() as db:
+        user = db.get(User, me.json()["id"])
+        user.is_active = False
+        db.add(user)
+        db.commit()
+
+    assert auth.principal_cache.get(key) is None
+    assert client.get("/users/me", headers=user_headers).status_code == 401
+
+
+def test_claims_mode_hands_out_copies_of_the_cached_principal(client, claims_mode, user_headers):
+    assert client.get("/users/me", headers=user_headers).status_code == 200
+    token = user_headers["Authorization"].split()[1]
+    with SessionLocal() as db:
+        first = auth.get_current_user(token, db)
+        first.email = "changed@example.com"
+        second = auth.get_current_user(token, db)
+    assert first is not second
+    assert second.email != "changed@example.com"
+
+
+def test_claims_mode_rejects_tokens_issued_to_inactive_users(client, claims_mode, user_headers):
+    me = client.get("/users/me", headers=user_headers).json()
+    with SessionLocal() as db:
+        user = db.get(User, me["id"])
+        token = auth.create_access_token(
+            {"sub": user.username, "uid": user.user_id, "role": "user", "active": False, "ver": user.token_version}
+        )
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
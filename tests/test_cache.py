@@ -0,0 +1,63 @@
+import pytest
+
+from app.services import http_cache
+from app.services.cache import TTLCache
+from tests.conftest import unique
+
+
+def test_load_overlapping_an_invalidation_is_not_stored():
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def stale_loader():
+        cache.clear()  # a write commits and invalidates while the old state is being read
+        return "stale"
+
+    assert cache.get_or_load("key", stale_loader) == "stale"
+    assert cache.get_or_load("key", lambda: "fresh") == "fresh"
+    assert cache.get_or_load("key", lambda: "unused") == "fresh"
+
+
+def test_pop_also_discards_overlapping_loads():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get_or_load("a", lambda: cache.pop("b") or "stale") == "stale"
+    assert cache.get("a") is None
+
+
+@pytest.mark.parametrize("path", ["/products/{product_id}", "/products/?category_id={category_id}", "/categories/"])
+def test_etag_revalidation_until_an_admin_write(client, admin_headers, category_id, make_product, path):
+    product = make_product()
+    url = path.format(product_id=product["product_id"], category_id=category_id)
+
+    first = client.get(url)
+    assert first.status_code == 200, first.text
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.headers["Cache-Control"] == http_cache.CATALOG_CACHE_CONTROL
+
+    if path.startswith("/categories"):
+        response = client.post("/categories/", json={"name": unique("category")}, headers=admin_headers)
+    else:
+        response = client.put(f"/products/{product['product_id']}", json={"stock": 7}, headers=admin_headers)
+    assert response.status_code in (200, 201), response.text
+
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200, changed.text
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"other", W/"abc"', True),
+    ("*", True),
+    ('"other"', False),
+    ("", False),
+    (None, False),
+])
+def test_if_none_match_uses_weak_comparison(header, matches):
+    assert http_cache.etag_matches(header, 'W/"abc"') is matches
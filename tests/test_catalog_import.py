@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from sqlmodel import select
+
+from app.db.database import SessionLocal
+from app.db.models import Product
+from app.services import catalog_import
+from tests.conftest import unique
+
+
+def upload(client, headers, name: str, content: str, **params):
+    return client.post(
+        "/products/import", params=params, files={"file": (name, content.encode())}, headers=headers
+    )
+
+
+def products_by_sku(*skus):
+    with SessionLocal() as db:
+        return {p.sku: p for p in db.exec(select(Product).where(Product.sku.in_(skus))).all()}
+
+
+def test_csv_upload_reports_each_row(client, admin_headers, category_id):
+    category = client.get(f"/categories/{category_id}").json()["name"]
+    good, named, repeated = unique("sku"), unique("sku"), unique("sku")
+    content = "\n".join([
+        "sku,name,price,stock,category_id,category",
+        f"{good},Good,9.50,3,{category_id},",
+        f"{named},By name,4.00,,,{category.upper()}",
+        f"{repeated},First,1.00,1,{category_id},",
+        f"{repeated},Second,2.00,2,{category_id},",
+        f"{unique('sku')},Negative,-1,1,{category_id},",
+        f"{unique('sku')},Lost,1.00,1,999999,",
+        f"{unique('sku')},Homeless,1.00,1,,",
+    ])
+    response = upload(client, admin_headers, "feed.csv", content)
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    assert report["rows"] == 7
+    assert (report["imported"], report["superseded"], report["failed"]) == (3, 1, 3)
+    errors = {error["line"]: error["error"] for error in report["errors"]}
+    assert sorted(errors) == [6, 7, 8]
+    assert errors[6].startswith("price")
+    assert errors[7] == "Category not found"
+    assert errors[8] == "category_id or category is required"
+
+    written = products_by_sku(good, named, repeated)
+    assert written[named].category_id == category_id and written[named].stock == 0
+    assert (written[repeated].name, str(written[repeated].price)) == ("Second", "2.00")
+
+
+def test_ndjson_upload_reports_unparseable_lines(client, admin_headers, category_id):
+    sku = unique("sku")
+    content = "\n".join([
+        json.dumps({"sku": sku, "name": "Fine", "price": "3.00", "category_id": category_id}),
+        "{not json",
+        "[1, 2]",
+        "",
+        json.dumps({"name": "No sku", "price": "3.00", "category_id": category_id}),
+    ])
+    response = upload(client, admin_headers, "feed.ndjson", content)
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    assert (report["rows"], report["imported"], report["failed"]) == (4, 1, 3)
+    errors = {error["line"]: error["error"] for error in report["errors"]}
+    assert errors[2].startswith("Invalid JSON")
+    assert errors[3] == "Expected a JSON object"
+    assert errors[5].startswith("sku")
+    assert sku in products_by_sku(sku)
+
+
+def test_import_updates_existing_skus_in_place(client, admin_headers, category_id):
+    sku = unique("sku")
+    for price, stock in (("5.00", 1), ("6.00", 7)):
+        content = f"sku,name,price,stock,category_id\n{sku},Upserted,{price},{stock},{category_id}\n"
+        response = upload(client, admin_headers, "feed.csv", content)
+        assert response.json()["imported"] == 1, response.text
+
+    with SessionLocal() as db:
+        rows = db.exec(select(Product).where(Product.sku == sku)).all()
+    assert [(str(p.price), p.stock) for p in rows] == [("6.00", 7)]
+
+
+def test_import_rejects_unknown_formats(client, admin_headers):
+    response = upload(client, admin_headers, "feed.csv", "sku\n", format="xml")
+    assert response.status_code == 400, response.text
+
+
+def test_catalog_cache_is_dropped_when_an_import_fails_midway(client, category_id, monkeypatch):
+    invalidations = []
+    monkeypatch.setattr(catalog_import, "invalidate_catalog", lambda: invalidations.append(True))
+
+    def feed():
+        for _ in range(3):
+            yield json.dumps({"sku": unique("sku"), "name": "Partial", "price": "1.00", "category_id": category_id})
+        raise OSError("connection reset")
+
+    with SessionLocal() as db, pytest.raises(OSError):
+        catalog_import.import_catalog(db, feed(), "ndjson", chunk_size=2)
+    assert invalidations == [True]
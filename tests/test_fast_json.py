@@ -0,0 +1,60 @@
+import pytest
+
+from app.services import fast_json
+from app.services.cache import invalidate_catalog
+
+
+def fetch_both_ways(client, monkeypatch, url: str, headers=None) -> dict:
+    """Fetches url with the default serializer and with FAST_JSON, from a cold catalog cache each time."""
+    bodies = {}
+    for fast in (False, True):
+        monkeypatch.setattr(fast_json, "FAST_JSON", fast)
+        invalidate_catalog()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+        bodies[fast] = response
+    return bodies
+
+
+@pytest.fixture
+def checkout(client, user_headers, make_product):
+    """A user with an order (two lines, one payment) and an address."""
+    first, second = make_product(price="12.34"), make_product(price="0.10")
+    items = [{"product_id": first["product_id"], "quantity": 3}, {"product_id": second["product_id"], "quantity": 1}]
+    order = client.post("/orders/", json={"order_items": items}, headers=user_headers).json()
+    response = client.post(
+        "/payments/", json={"order_id": order["order_id"], "payment_method": "card", "amount": "20.05"},
+        headers=user_headers,
+    )
+    assert response.status_code == 201, response.text
+    response = client.post(
+        "/addresses/", json={"address_line1": "1 Main St", "city": "Tbilisi", "state": "TB", "zip_code": "0100"},
+        headers=user_headers,
+    )
+    assert response.status_code == 200, response.text
+    return user_headers
+
+
+@pytest.mark.parametrize("path", ["/orders/", "/payments/", "/addresses/"])
+def test_fast_json_matches_the_default_serializer_for_user_lists(client, monkeypatch, checkout, path):
+    bodies = fetch_both_ways(client, monkeypatch, path, headers=checkout)
+    default = bodies[False].json()
+    assert bodies[True].json() == default
+    assert default, "nothing was compared"
+    if path == "/orders/":
+        # Money, timestamps and the nested lines and payments all took part in the comparison
+        [order] = default["items"]
+        assert order["total_amount"] == 37.12 and order["created_at"]
+        assert len(order["order_items"]) == 2 and order["payments"][0]["amount"] == 20.05
+
+
+def test_fast_json_matches_the_default_serializer_for_products(client, monkeypatch, category_id, make_product):
+    make_product(price="12.34")
+    make_product(price="0.10")
+    bodies = fetch_both_ways(client, monkeypatch, f"/products/?category_id={category_id}&sort=-price&limit=1")
+    default, fast = bodies[False].json(), bodies[True].json()
+    assert fast == default
+    [item] = default["items"]
+    assert item["price"] == 12.34 and item["category"]["category_id"] == category_id
+    assert default["next_cursor"]
+    assert bodies[True].headers["ETag"] == bodies[False].headers["ETag"]
@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, update
+from sqlmodel import select
+
+from app.db.database import SessionLocal
+from app.db.models import Job
+from app.services import jobs, webhooks
+
+
+@pytest.fixture
+def queue(client):
+    """An empty job table (the client fixture creates the schema), so other tests' jobs are not claimed here."""
+    with SessionLocal() as db:
+        db.exec(delete(Job))
+        db.commit()
+        yield db
+    jobs.HANDLERS.pop("test.failing", None)
+
+
+def make_due(db, *job_ids):
+    db.exec(update(Job).where(Job.id.in_(job_ids)).values(run_at=jobs._now() - timedelta(seconds=1)))
+    db.commit()
+
+
+def rows(db, kind):
+    db.expire_all()
+    return db.exec(select(Job).where(Job.kind == kind).order_by(Job.id)).all()
+
+
+def test_keyed_jobs_are_queued_once(queue):
+    for _ in range(3):
+        jobs.enqueue(queue, "test.keyed", key="one")
+    queue.commit()
+    jobs.enqueue(queue, "test.keyed", key="one")
+    queue.commit()
+    assert [job.status for job in rows(queue, "test.keyed")] == ["queued"]
+
+    # Once the queued job is picked up, the next write queues a new run
+    assert len(jobs.claim(queue, 10)) == 1
+    jobs.enqueue(queue, "test.keyed", key="one")
+    queue.commit()
+    assert [job.status for job in rows(queue, "test.keyed")] == ["running", "queued"]
+
+
+def test_claim_takes_due_jobs_in_order_and_skips_claimed_ones(queue):
+    jobs.enqueue(queue, "test.later", delay=3600)
+    for n in range(3):
+        jobs.enqueue(queue, "test.due", {"n": n})
+    queue.commit()
+    first, second, third = rows(queue, "test.due")
+    queue.exec(update(Job).where(Job.id == third.id).values(run_at=first.run_at - timedelta(seconds=10)))
+    queue.commit()
+
+    claimed = jobs.claim(queue, 2)
+    assert [job.id for job in claimed] == [third.id, first.id]
+    assert all(job.attempts == 1 for job in claimed)
+    assert [job.id for job in jobs.claim(queue, 10)] == [second.id]
+    assert jobs.claim(queue, 10) == []
+
+
+def test_failures_back_off_then_go_dead(queue):
+    calls = []
+
+    @jobs.handler("test.failing")
+    def failing(db, payload):
+        calls.append(payload)
+        raise RuntimeError("boom")
+
+    jobs.enqueue(queue, "test.failing", {"n": 1}, max_attempts=2)
+    queue.commit()
+
+    [job] = jobs.claim(queue, 10)
+    assert jobs.execute(SessionLocal, job) == "retry"
+    [row] = rows(queue, "test.failing")
+    assert row.status == "queued" and row.attempts == 1 and "boom" in row.last_error
+    assert jobs.claim(queue, 10) == [], "retried before its backoff"
+
+    make_due(queue, row.id)
+    [job] = jobs.claim(queue, 10)
+    assert jobs.execute(SessionLocal, job) == "dead"
+    [row] = rows(queue, "test.failing")
+    assert row.status == "dead" and row.attempts == 2
+    assert calls == [{"n": 1}, {"n": 1}]
+
+    assert jobs.requeue(queue, kind="test.failing") == 1
+    [row] = rows(queue, "test.failing")
+    assert row.status == "queued" and row.attempts == 0
+
+
+def test_backoff_doubles_up_to_the_cap():
+    for attempts in range(1, 30):
+        delay = jobs.backoff_seconds(attempts)
+        expected = min(jobs.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), jobs.JOB_BACKOFF_MAX_SECONDS)
+        assert expected / 2 <= delay <= expected
+
+
+def test_expired_lease_is_reclaimed_and_the_stale_outcome_dropped(queue):
+    jobs.HANDLERS["test.failing"] = lambda db, payload: None
+    jobs.enqueue(queue, "test.failing")
+    queue.commit()
+    [stale] = jobs.claim(queue, 10)
+    assert jobs.claim(queue, 10) == [], "claimed while its lease is live"
+
+    expired = jobs._now() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+    queue.exec(update(Job).where(Job.id == stale.id).values(locked_at=expired))
+    queue.commit()
+    [fresh] = jobs.claim(queue, 10)
+    assert fresh.id == stale.id and fresh.attempts == 2
+
+    jobs.execute(SessionLocal, stale)
+    assert rows(queue, "test.failing")[0].status == "running"
+    assert jobs.execute(SessionLocal, fresh) == "done"
+    assert rows(queue, "test.failing")[0].status == "done"
+
+
+def test_checkout_queues_webhooks_in_its_transaction(client, user_headers, make_product, queue, monkeypatch):
+    sent = []
+    monkeypatch.setattr(webhooks, "ORDER_WEBHOOK_URL", "http://hooks.example/orders")
+    monkeypatch.setattr(webhooks, "_post", sent.append)
+
+    product = make_product(price="4.00")
+    order = client.post(
+        "/orders/", json={"order_items": [{"product_id": product["product_id"], "quantity": 1}]}, headers=user_headers
+    ).json()
+    payment = client.post(
+        "/payments/", json={"order_id": order["order_id"], "payment_method": "card", "amount": "4.00"},
+        headers=user_headers,
+    ).json()
+    assert [job.status for job in rows(queue, webhooks.ORDER_CREATED)] == ["queued"]
+    assert [job.status for job in rows(queue, webhooks.PAYMENT_RECORDED)] == ["queued"]
+
+    jobs.Worker(SessionLocal, concurrency=2, poll_seconds=0.01).run(drain=True)
+    events = {body["event"]: body for body in sent}
+    assert events[webhooks.ORDER_CREATED]["order"]["order_id"] == order["order_id"]
+    assert events[webhooks.PAYMENT_RECORDED]["payment"]["payment_id"] == payment["payment_id"]
+    assert events[webhooks.PAYMENT_RECORDED]["order"]["status"] == "paid"
+
+
+def test_failed_keyed_job_folds_into_a_newer_queued_one(queue):
+    jobs.HANDLERS["test.failing"] = lambda db, payload: 1 / 0
+    jobs.enqueue(queue, "test.failing", key="refresh")
+    queue.commit()
+    [job] = jobs.claim(queue, 10)
+    jobs.enqueue(queue, "test.failing", key="refresh")
+    queue.commit()
+
+    assert jobs.execute(SessionLocal, job) == "retry"
+    first, second = rows(queue, "test.failing")
+    assert first.status == "done" and first.last_error.startswith("Superseded")
+    assert second.status == "queued"
@@ -0,0 +1,35 @@
+import pytest
+
+from app.internal import metrics as metrics_route
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(metrics_route, "METRICS_TOKEN", "scrape-secret")
+    return "scrape-secret"
+
+
+def test_metrics_are_closed_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(metrics_route, "METRICS_TOKEN", "")
+    monkeypatch.setattr(metrics_route, "METRICS_PUBLIC", False)
+    assert client.get("/metrics").status_code == 403
+
+    monkeypatch.setattr(metrics_route, "METRICS_PUBLIC", True)
+    assert client.get("/metrics").status_code == 200
+
+
+def test_metrics_require_the_configured_token(client, metrics_token):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+    assert response.status_code == 200
+    assert 'jobs{status="queued"}' in response.text
+
+
+def test_job_counts_are_not_queried_on_every_scrape(client, metrics_token, monkeypatch):
+    calls = []
+    monkeypatch.setattr(metrics_route.jobs, "stats", lambda db: calls.append(1) or {"queued": 0})
+    metrics_route._job_counts.clear()
+    for _ in range(3):
+        assert client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"}).status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,162 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.db.database import SessionLocal
+from app.db.models import OrderItem
+from app.services import idempotency as idempotency_service
+
+
+def place_order(client, headers, product_id: int, quantity: int = 1):
+    return client.post("/orders/", json={"order_items": [{"product_id": product_id, "quantity": quantity}]}, headers=headers)
+
+
+def test_order_history_pages_cover_every_order_once(client, user_headers, make_product):
+    product = make_product()
+    placed = []
+    for _ in range(7):
+        response = place_order(client, user_headers, product["product_id"])
+        assert response.status_code == 201, response.text
+        placed.append(response.json()["order_id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/orders/", params=params, headers=user_headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert len(seen) < 100, "pagination does not terminate"
+
+    assert sorted(order["order_id"] for order in seen) == sorted(placed)
+    keys = [(datetime.fromisoformat(order["created_at"]), order["order_id"]) for order in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_new_orders_start_pending(client, user_headers, make_product):
+    product = make_product()
+    response = client.post(
+        "/orders/",
+        json={"order_items": [{"product_id": product["product_id"], "quantity": 1}], "status": "shipped"},
+        headers=user_headers,
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["status"] == "pending"
+
+
+def test_only_pending_orders_can_be_modified(client, user_headers, make_product):
+    product = make_product(price="5.00")
+    order = place_order(client, user_headers, product["product_id"], quantity=2).json()
+    items = [{"product_id": product["product_id"], "quantity": 3}]
+    response = client.put(f"/orders/{order['order_id']}/items", json=items, headers=user_headers)
+    assert response.status_code == 200, response.text
+
+    response = client.post(
+        "/payments/", json={"order_id": order["order_id"], "payment_method": "card", "amount": "15.00"}, headers=user_headers
+    )
+    assert response.status_code == 201, response.text
+    response = client.put(f"/orders/{order['order_id']}/items", json=items, headers=user_headers)
+    assert response.status_code == 409, response.text
+
+
+def test_concurrent_checkouts_never_oversell(client, user_headers, make_product):
+    stock = 10
+    product = make_product(stock=stock)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        codes = Counter(pool.map(
+            lambda _: place_order(client, user_headers, product["product_id"]).status_code, range(4 * stock)
+        ))
+
+    assert codes == {201: stock, 400: 3 * stock}, codes
+    assert client.get(f"/products/{product['product_id']}").json()["stock"] == 0
+    with SessionLocal() as db:
+        sold = db.exec(
+            select(func.sum(OrderItem.quantity)).where(OrderItem.product_id == product["product_id"])
+        ).one()
+    assert sold == stock
+
+
+def test_edits_cannot_take_the_total_below_the_amount_paid(client, user_headers, make_product):
+    product = make_product(price="5.00")
+    order = place_order(client, user_headers, product["product_id"], quantity=4).json()
+    response = client.post(
+        "/payments/", json={"order_id": order["order_id"], "payment_method": "card", "amount": "10.00"},
+        headers=user_headers,
+    )
+    assert response.status_code == 201, response.text
+
+    edit = f"/orders/{order['order_id']}/items"
+    response = client.put(edit, json=[{"product_id": product["product_id"], "quantity": 1}], headers=user_headers)
+    assert response.status_code == 409, response.text
+    assert client.get(f"/products/{product['product_id']}").json()["stock"] == 96
+
+    response = client.put(edit, json=[{"product_id": product["product_id"], "quantity": 2}], headers=user_headers)
+    assert response.status_code == 200, response.text
+    assert client.get(f"/orders/{order['order_id']}", headers=user_headers).json()["status"] == "paid"
+
+
+def orders_for(product_id: int) -> int:
+    with SessionLocal() as db:
+        return db.exec(select(func.count()).select_from(OrderItem).where(OrderItem.product_id == product_id)).one()
+
+
+def test_retried_checkout_is_replayed(client, user_headers, make_product):
+    product = make_product(stock=10)
+    body = {"order_items": [{"product_id": product["product_id"], "quantity": 2}]}
+    headers = {**user_headers, "Idempotency-Key": "checkout-1"}
+
+    first = client.post("/orders/", json=body, headers=headers)
+    assert first.status_code == 201, first.text
+    assert "Idempotent-Replayed" not in first.headers
+    retry = client.post("/orders/", json=body, headers=headers)
+    assert retry.status_code == 201, retry.text
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    assert orders_for(product["product_id"]) == 1
+    assert client.get(f"/products/{product['product_id']}").json()["stock"] == 8
+
+
+def test_idempotency_key_cannot_be_reused_for_another_body(client, user_headers, make_product):
+    product = make_product()
+    headers = {**user_headers, "Idempotency-Key": "checkout-1"}
+    response = place_order(client, headers, product["product_id"], quantity=1)
+    assert response.status_code == 201, response.text
+
+    response = place_order(client, headers, product["product_id"], quantity=2)
+    assert response.status_code == 422, response.text
+    assert orders_for(product["product_id"]) == 1
+
+
+def test_concurrent_duplicate_checkout_replays_the_winner(client, user_headers, make_product, monkeypatch):
+    product = make_product(stock=10)
+    headers = {**user_headers, "Idempotency-Key": "checkout-1"}
+    first = place_order(client, headers, product["product_id"])
+    assert first.status_code == 201, first.text
+
+    # The duplicate checks for a stored response before the original has
+    # committed, so it runs the checkout and only collides on commit
+    lookups = []
+    stored_response = idempotency_service.stored_response
+
+    def racing_lookup(db, request, model):
+        lookups.append(request)
+        if len(lookups) == 1:
+            return None
+        return stored_response(db, request, model)
+
+    monkeypatch.setattr(idempotency_service, "stored_response", racing_lookup)
+    retry = place_order(client, headers, product["product_id"])
+    assert len(lookups) == 2, "the duplicate did not fail on the unique constraint"
+    assert retry.status_code == 201, retry.text
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    assert orders_for(product["product_id"]) == 1
+    assert client.get(f"/products/{product['product_id']}").json()["stock"] == 9
@@ -0,0 +1,49 @@
+def pay(client, headers, order_id: int, amount: str):
+    return client.post("/payments/", json={"order_id": order_id, "payment_method": "card", "amount": amount}, headers=headers)
+
+
+def test_payments_cannot_exceed_the_outstanding_balance(client, user_headers, make_product):
+    product = make_product(price="10.00")
+    order = client.post(
+        "/orders/", json={"order_items": [{"product_id": product["product_id"], "quantity": 1}]}, headers=user_headers
+    ).json()
+
+    assert pay(client, user_headers, order["order_id"], "8.00").status_code == 201
+    assert pay(client, user_headers, order["order_id"], "8.00").status_code == 400
+    assert client.get(f"/orders/{order['order_id']}", headers=user_headers).json()["status"] == "pending"
+
+    assert pay(client, user_headers, order["order_id"], "2.00").status_code == 201
+    assert client.get(f"/orders/{order['order_id']}", headers=user_headers).json()["status"] == "paid"
+    assert pay(client, user_headers, order["order_id"], "0.01").status_code == 400
+
+
+def new_order(client, headers, make_product, price="10.00"):
+    product = make_product(price=price)
+    return client.post(
+        "/orders/", json={"order_items": [{"product_id": product["product_id"], "quantity": 1}]}, headers=headers
+    ).json()
+
+
+def order_status(client, headers, order_id: int) -> str:
+    return client.get(f"/orders/{order_id}", headers=headers).json()["status"]
+
+
+def test_payment_amounts_must_be_positive(client, user_headers, make_product):
+    order = new_order(client, user_headers, make_product)
+    for amount in ("0", "-5"):
+        assert pay(client, user_headers, order["order_id"], amount).status_code == 422
+
+
+def test_reinstating_a_payment_cannot_overpay(client, user_headers, make_product):
+    order = new_order(client, user_headers, make_product)
+    first = pay(client, user_headers, order["order_id"], "10.00").json()
+
+    response = client.put(f"/payments/{first['payment_id']}/status", params={"status": "failed"}, headers=user_headers)
+    assert response.status_code == 200, response.text
+    assert order_status(client, user_headers, order["order_id"]) == "pending"
+
+    assert pay(client, user_headers, order["order_id"], "10.00").status_code == 201
+    assert order_status(client, user_headers, order["order_id"]) == "paid"
+
+    response = client.put(f"/payments/{first['payment_id']}/status", params={"status": "completed"}, headers=user_headers)
+    assert response.status_code == 400, response.text
@@ -0,0 +1,151 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app.db import database
+from app.services.pagination import encode_cursor
+
+def money(value) -> Decimal:
+    """Prices are JSON numbers; compare them as the cents they stand for."""
+    return Decimal(str(value))
+
+
+SORTS = ["product_id", "-product_id", "price", "-price", "created_at", "-created_at"]
+
+
+@pytest.fixture
+def catalog(client, admin_headers, category_id):
+    """Seven products created back to back, so several share a created_at second and a price."""
+    products = []
+    for i in range(7):
+        response = client.post(
+            "/products/",
+            json={"name": f"product {i}", "price": str(10 + i % 3), "stock": 5, "category_id": category_id},
+            headers=admin_headers,
+        )
+        assert response.status_code == 201, response.text
+        products.append(response.json())
+    return category_id, products
+
+
+def walk(client, path: str, params: dict, headers=None) -> list:
+    items, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+        assert len(items) < 1000, "pagination does not terminate"
+
+
+@pytest.mark.parametrize("sort", SORTS)
+def test_product_pages_cover_catalog_once(client, catalog, sort):
+    category_id, products = catalog
+    items = walk(client, "/products/", {"category_id": category_id, "sort": sort, "limit": 2})
+
+    ids = [item["product_id"] for item in items]
+    assert sorted(ids) == sorted(p["product_id"] for p in products)
+
+    # Products were created in id order, so created_at (ties broken by id) follows product_id
+    if sort.lstrip("-") == "price":
+        keys = [(Decimal(item["price"]), item["product_id"]) for item in items]
+    else:
+        keys = ids
+    assert keys == sorted(keys, reverse=sort.startswith("-"))
+
+
+def test_product_page_statement_count_does_not_grow_with_page_size(client, catalog):
+    category_id, products = catalog
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # In async mode the routes run on the async engine, whose events fire on its sync_engine
+    engine = database.async_engine.sync_engine if database.DATABASE_ASYNC else database.engine
+    counts = {}
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for limit in (1, len(products)):
+            statements.clear()
+            response = client.get("/products/", params={"category_id": category_id, "limit": limit})
+            assert response.status_code == 200, response.text
+            assert len(response.json()["items"]) == limit
+            counts[limit] = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert 0 < counts[1] == counts[len(products)], counts
+
+
+@pytest.mark.parametrize("position", [
+    {"sort": "product_id", "id": {"a": 1}},
+    {"sort": "product_id", "id": "abc"},
+    {"sort": "product_id", "id": None},
+    {"sort": "price", "id": 1, "value": "NaN"},
+    {"sort": "created_at", "id": 1, "value": "yesterday"},
+])
+def test_malformed_cursors_are_rejected(client, position):
+    cursor = encode_cursor(position)
+    response = client.get("/products/", params={"sort": position["sort"], "cursor": cursor})
+    assert response.status_code == 400, response.text
+
+
+def test_bulk_update_reports_each_line(client, admin_headers, make_product):
+    repriced, short, restocked = make_product(stock=5), make_product(stock=2), make_product(stock=9)
+    missing = restocked["product_id"] + 10_000
+    updates = [
+        {"product_id": repriced["product_id"], "price": "12.34", "stock_delta": -3},
+        {"product_id": short["product_id"], "price": "1.00", "stock_delta": -3},
+        {"product_id": missing, "stock": 1},
+        {"product_id": restocked["product_id"], "stock": 40},
+    ]
+    response = client.post("/products/bulk-update", json={"updates": updates}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    assert (report["updated"], report["failed"]) == (2, 2)
+    results = {r["product_id"]: (r["status"], r["price"] and money(r["price"]), r["stock"]) for r in report["results"]}
+    assert results == {
+        repriced["product_id"]: ("updated", Decimal("12.34"), 2),
+        short["product_id"]: ("insufficient_stock", Decimal("10.00"), 2),
+        missing: ("not_found", None, None),
+        restocked["product_id"]: ("updated", Decimal("10.00"), 40),
+    }
+    # Failed lines are skipped, the rest are written
+    for product_id, (_, price, stock) in results.items():
+        if product_id != missing:
+            current = client.get(f"/products/{product_id}").json()
+            assert (money(current["price"]), current["stock"]) == (price, stock)
+
+
+def test_bulk_update_rejects_repeated_products(client, admin_headers, make_product):
+    product = make_product()
+    updates = [{"product_id": product["product_id"], "stock": 1}, {"product_id": product["product_id"], "stock": 2}]
+    response = client.post("/products/bulk-update", json={"updates": updates}, headers=admin_headers)
+    assert response.status_code == 400, response.text
+    assert client.get(f"/products/{product['product_id']}").json()["stock"] == 100
+
+
+@pytest.mark.parametrize("percent, prices", [
+    ("15.5", {"1.99": "2.30", "3.33": "3.85", "10.00": "11.55"}),
+    ("-33.33", {"1.99": "1.33", "3.33": "2.22", "10.00": "6.67"}),
+    ("-99.99", {"1.99": "0.01", "3.33": "0.01", "10.00": "0.01"}),
+])
+def test_reprice_rounds_to_the_cent(client, admin_headers, category_id, make_product, percent, prices):
+    products = {price: make_product(price=price)["product_id"] for price in prices}
+    # Cached product pages must not keep the old price
+    for product_id in products.values():
+        client.get(f"/products/{product_id}")
+
+    response = client.post(f"/categories/{category_id}/reprice", json={"percent": percent}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["updated"] == len(prices)
+
+    for old, product_id in products.items():
+        price = client.get(f"/products/{product_id}").json()["price"]
+        assert money(price) == Decimal(prices[old]), (old, price)
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+from tests.conftest import unique
+
+
+@pytest.fixture
+def term():
+    """A word no other product contains, so results only hold this test's products."""
+    return f"w{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def add_product(client, admin_headers, category_id):
+    def add_product(name: str, description: str = None, price: str = "10.00", category: int = category_id) -> int:
+        response = client.post(
+            "/products/",
+            json={"name": name, "description": description, "price": price, "stock": 5, "category_id": category},
+            headers=admin_headers,
+        )
+        assert response.status_code == 201, response.text
+        return response.json()["product_id"]
+
+    return add_product
+
+
+def search(client, **params):
+    response = client.get("/products/search", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_name_hits_rank_above_description_hits(client, term, add_product):
+    in_description = add_product("plain gadget", description=f"pairs well with {term}")
+    in_name = add_product(f"{term} deluxe")
+    in_both = add_product(f"{term} basic", description=f"the {term} you know")
+
+    page = search(client, q=term)
+    assert page["total"] == 3
+    ids = [hit["product_id"] for hit in page["items"]]
+    # A word's score is its best field, so a name hit ties regardless of the description
+    assert ids == [in_name, in_both, in_description]
+    scores = [hit["score"] for hit in page["items"]]
+    assert scores[0] == scores[1] > scores[2] > 0
+
+    # Every word has to match
+    assert [hit["product_id"] for hit in search(client, q=f"{term} deluxe")["items"]] == [in_name]
+    assert search(client, q=f"{term} missing")["total"] == 0
+
+
+def test_words_match_as_prefixes(client, term, add_product):
+    product_id = add_product(f"{term}berry jam", description="Strawberries")
+
+    for q in (term, f"{term}ber", f"{term}berry", f"{term[:12]} straw"):
+        assert [hit["product_id"] for hit in search(client, q=q)["items"]] == [product_id], q
+    assert search(client, q=f"{term}berryx")["total"] == 0
+    assert search(client, q=term[1:])["total"] == 0, "matched in the middle of a word"
+
+
+def test_facets_ignore_their_own_filter(client, admin_headers, category_id, term, add_product):
+    response = client.post("/categories/", json={"name": unique("category")}, headers=admin_headers)
+    other_category = response.json()["category_id"]
+    add_product(f"{term} cheap", price="5.00")
+    expensive = add_product(f"{term} pricey", price="30.00")
+    add_product(f"{term} elsewhere", price="60.00", category=other_category)
+
+    page = search(client, q=term, category_id=category_id, min_price="20")
+    assert [hit["product_id"] for hit in page["items"]] == [expensive]
+    assert page["total"] == 1
+
+    # Categories are counted under the price filter but across every category
+    categories = {facet["category_id"]: facet["count"] for facet in page["facets"]["categories"]}
+    assert categories == {category_id: 1, other_category: 1}
+    # Price buckets are counted in the selected category but across every price
+    prices = [(facet["min"], facet["max"], facet["count"]) for facet in page["facets"]["prices"]]
+    assert prices == [(None, 10, 1), (25, 50, 1)]